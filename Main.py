@@ -9,30 +9,21 @@ from typing import TYPE_CHECKING, Literal
 
 from colorama import Fore, Style
 from colorama import init as color_init
-from steam.client import SteamClient  # type: ignore
 
-from InquirerPy import inquirer
-from smd.prompts import prompt_confirm, prompt_select
-from smd.steam_client import SteamInfoProvider
-from smd.steam_path import init_steam_path
-from smd.storage.settings import resolve_advanced_mode
 from smd.strings import VERSION
 from smd.structs import GAME_SPECIFIC_CHOICES, MainMenu, MainReturnCode, OSType
-from smd.ui import UI
+from smd.tracing import DEFAULT_TRACE_FILE, span, start_tracing
 from smd.utils import root_folder
 
+# Everything else is imported once it's needed, so `--version` returns
+# instantly and the menu shows up without waiting on every subsystem.
+# See startup_check.py for the budget.
+if TYPE_CHECKING:
+    from smd.ui import UI
+
 logger = logging.getLogger("smd")
 logger.setLevel(logging.DEBUG)
 
-fh = logging.FileHandler("debug.log")
-fh.setFormatter(
-    logging.Formatter(
-        "%(asctime)s::%(name)s::%(levelname)s::%(message)s",
-        datefmt="%m/%d/%Y %I:%M:%S %p",
-    )
-)
-logger.addHandler(fh)
-
 
 def dump_crash():
     print("There was an error. You can also find this in crash.log:\n" + Fore.RED)
@@ -43,7 +34,10 @@ def dump_crash():
     print(Style.RESET_ALL, end="")
 
 
-def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
+def main(ui: "UI", args: argparse.Namespace) -> MainReturnCode:
+    from smd.profiling import profile_action
+    from smd.prompts import prompt_select
+    from smd.storage.settings import resolve_advanced_mode
 
     logger.debug(f"Root folder is {root_folder()}")
 
@@ -62,7 +56,14 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
     
     # Handle --batch flag
     if args.batch:
-        return ui.process_batch_lua_files(args.batch, args.dry_run)
+        return ui.process_batch_lua_files(
+            args.batch,
+            args.dry_run,
+            library=args.library,
+            overwrite_acf=args.overwrite_acf,
+            restart_steam=args.restart_steam,
+            report_path=args.report,
+        )
     
     # Handle --auto-update flag
     if args.auto_update:
@@ -99,6 +100,13 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
     if menu_choice == MainMenu.EXIT:
         return MainReturnCode.EXIT
 
+    with span(f"menu:{menu_choice.name}"), profile_action(menu_choice.name, args.profile):
+        return run_action(ui, args, menu_choice)
+
+
+def run_action(
+    ui: "UI", args: argparse.Namespace, menu_choice: MainMenu
+) -> MainReturnCode:
     if menu_choice == MainMenu.SETTINGS:
         return ui.edit_settings_menu()
     
@@ -107,6 +115,9 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
     
     if menu_choice == MainMenu.SCAN_LIBRARY:
         return ui.scan_library_menu()
+
+    if menu_choice == MainMenu.VERIFY_DEPOTCACHE:
+        return ui.verify_depotcache_menu()
     
     if menu_choice == MainMenu.ANALYTICS:
         return ui.analytics_dashboard_menu()
@@ -157,8 +168,6 @@ def main(ui: UI, args: argparse.Namespace) -> MainReturnCode:
 
 if __name__ == "__main__":
     os.chdir(root_folder(outside_internal=True))
-    logger.debug(f"CWD is {str(Path.cwd().resolve())}")
-    logger.debug(f"exe is {sys.executable}")
     start_time = time.time()
     parser = argparse.ArgumentParser(
                         prog='SMD',
@@ -185,14 +194,67 @@ if __name__ == "__main__":
     parser.add_argument(
         "--dry-run", action="store_true", help="Preview operations without executing them"
     )
+    parser.add_argument(
+        "--library", help="(Batch mode) Steam library to install to. Defaults to the first one"
+    )
+    parser.add_argument(
+        "--overwrite-acf",
+        action="store_true",
+        help="(Batch mode) Overwrite existing .acf files instead of keeping them",
+    )
+    parser.add_argument(
+        "--restart-steam",
+        action="store_true",
+        help="(Batch mode) Restart Steam once when done. Steam is left alone by default",
+    )
+    parser.add_argument(
+        "--report", help="(Batch mode) Where to write the JSON report (default: batch_report.json)"
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const=DEFAULT_TRACE_FILE,
+        help="Record where time goes and write it on exit as a Chrome trace "
+        f"(open in chrome://tracing or ui.perfetto.dev). Default: {DEFAULT_TRACE_FILE}",
+    )
+    parser.add_argument(
+        "--log-json",
+        action="store_true",
+        help="Write debug.log as JSON lines instead of plain text",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Save a CPU and memory profile of every menu action to the profiles folder",
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write timings and counters to this file on exit "
+        "(JSON if it ends in .json, Prometheus text otherwise)",
+    )
     args = parser.parse_args()
     
     # Handle --version flag
     if args.version:
         print(f"SMD (Steam Manifest Downloader) version {VERSION}")
         sys.exit(0)
-    
-    logger.debug(f"Received args: {args}")
+
+    from smd.logs import setup_logging
+
+    setup_logging(Path("debug.log"), json_lines=args.log_json)
+    logger.debug("CWD is %s", Path.cwd().resolve())
+    logger.debug("exe is %s", sys.executable)
+    logger.debug("Received args: %s", args)
+
+    if args.trace:
+        start_tracing(Path(args.trace))
+
+    if args.metrics:
+        import atexit
+
+        from smd.metrics import get_metrics
+
+        atexit.register(get_metrics().dump, Path(args.metrics))
     
     # Setup quiet mode if requested
     if args.quiet:
@@ -240,16 +302,24 @@ if __name__ == "__main__":
     )
 
     try:
-        client = SteamClient()
-        logger.debug(f"Steam client init in {time.time() - start_time}s")
-        provider = SteamInfoProvider(client)
+        import smd.ui
+        from smd.steam_client import SteamInfoProvider
+        from smd.steam_path import init_steam_path
+
+        logger.debug(f"Imports done in {time.time() - start_time}s")
+        provider = SteamInfoProvider()
+        if not args.export_ids:
+            # Most actions need Steam, so log in while the user picks one
+            provider.warm_up()
         steam_path = init_steam_path(os_type)
         logger.debug(f"Steam path init in {time.time() - start_time}s")
-        ui = UI(provider, steam_path, os_type)
+        ui = smd.ui.UI(provider, steam_path, os_type)
     except Exception:
         dump_crash()
         input("Press Enter to exit the program...")
         sys.exit()
+    if not (args.export_ids or args.batch or args.auto_update):
+        ui.start_prefetch()
     logger.debug(f"Init finished in {time.time() - start_time}s")
     return_code = None
     first_launch = True
@@ -271,6 +341,8 @@ if __name__ == "__main__":
         elif return_code == MainReturnCode.LOOP_NO_PROMPT:
             continue
         elif return_code == MainReturnCode.LOOP:
+            from InquirerPy import inquirer
+
             # Use native confirm to avoid WNDPROC/WPARAM error (prompt_select cleanup on Windows)
             go_back = inquirer.confirm(
                 message="Go back to the Main Menu?",
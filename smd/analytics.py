@@ -1,18 +1,44 @@
-"""Local Analytics Tracking for SMD"""
+"""Local Analytics Tracking for SMD
 
+Events are folded into rollups as they happen, and a background thread
+appends them to `analytics.log` (one JSON object per line) every few seconds,
+so recording one from a request path never touches the disk. Every so often
+that thread writes the rollups to `analytics.json` and truncates the log, so
+neither file grows with history.
+
+Durations of operations and of individual network calls (endpoints) also go
+into quantile sketches per hour and per day, for p50/p95/p99 views.
+"""
+
+import atexit
+import heapq
 import json
 import logging
+import threading
 import time
-from collections import Counter
-from dataclasses import dataclass, field
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
+from smd.sketch import QuantileSketch
 from smd.utils import root_folder
 
 logger = logging.getLogger(__name__)
 
 ANALYTICS_FILE = root_folder(outside_internal=True) / "analytics.json"
+ANALYTICS_LOG = root_folder(outside_internal=True) / "analytics.log"
+ANALYTICS_VERSION = 2
+
+COMPACT_EVERY = 500
+"Log entries after which the rollups are saved and the log truncated"
+FLUSH_INTERVAL = 2.0
+"Seconds between writes of buffered events to the log"
+RECENT_OPERATIONS = 100
+"Raw operations kept for the export"
+DAILY_RETENTION_DAYS = 90
+HOURLY_RETENTION_HOURS = 48
+PERCENTILES = (0.5, 0.95, 0.99)
 
 
 @dataclass
@@ -26,73 +52,289 @@ class OperationRecord:
     error_message: Optional[str] = None
 
 
+@dataclass
+class OperationRollup:
+    """Running totals for a group of operations"""
+    count: int = 0
+    successes: int = 0
+    failures: int = 0
+    total_duration: float = 0.0
+
+    def add(self, record: OperationRecord) -> None:
+        self.count += 1
+        if record.success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.total_duration += record.duration
+
+    @property
+    def average_duration(self) -> float:
+        return self.total_duration / self.count if self.count else 0.0
+
+
 @dataclass
 class AnalyticsData:
     """Analytics data structure"""
-    operations: List[OperationRecord] = field(default_factory=list)
     total_downloads: int = 0
     total_successes: int = 0
     total_failures: int = 0
     feature_usage: Dict[str, int] = field(default_factory=dict)
+    per_operation: Dict[str, OperationRollup] = field(default_factory=dict)
+    daily: Dict[str, OperationRollup] = field(default_factory=dict)
+    "ISO date -> rollup of that day's operations"
+    app_downloads: Dict[int, int] = field(default_factory=dict)
+    recent: List[OperationRecord] = field(default_factory=list)
+    latency_hourly: Dict[str, Dict[str, QuantileSketch]] = field(default_factory=dict)
+    "Series -> 'YYYY-MM-DDTHH' -> sketch. Series are 'op:<type>' or 'endpoint:<name>'"
+    latency_daily: Dict[str, Dict[str, QuantileSketch]] = field(default_factory=dict)
+    "Series -> ISO date -> sketch"
+    last_seq: int = 0
+    "Sequence number of the last log entry folded into this data"
 
 
 class AnalyticsTracker:
     """Tracks local usage statistics (no network transmission)"""
-    
-    def __init__(self):
+
+    def __init__(
+        self, analytics_file: Path = ANALYTICS_FILE, log_file: Path = ANALYTICS_LOG
+    ):
         """Initialize analytics tracker"""
+        self.analytics_file = analytics_file
+        self.log_file = log_file
         self.data = AnalyticsData()
+        self._log_entries = 0
+        self._lock = threading.RLock()
+        "Guards `data` and the pending events"
+        self._io_lock = threading.RLock()
+        "Serializes log writes, saves and compaction"
+        self._pending: List[Dict[str, Any]] = []
+        "Events applied to `data` but not written to the log yet"
+        self._wake = threading.Event()
+        self._writer: Optional[threading.Thread] = None
         self.load()
-    
+
     def load(self) -> None:
-        """Load analytics from disk"""
-        try:
-            if ANALYTICS_FILE.exists():
-                with ANALYTICS_FILE.open("r", encoding="utf-8") as f:
-                    raw_data = json.load(f)
-                    
-                    # Load operations
-                    self.data.operations = [
-                        OperationRecord(**op) for op in raw_data.get("operations", [])
-                    ]
-                    self.data.total_downloads = raw_data.get("total_downloads", 0)
-                    self.data.total_successes = raw_data.get("total_successes", 0)
-                    self.data.total_failures = raw_data.get("total_failures", 0)
-                    self.data.feature_usage = raw_data.get("feature_usage", {})
-                    
-                logger.debug(f"Loaded analytics: {len(self.data.operations)} operations")
-        except Exception as e:
-            logger.error(f"Failed to load analytics: {e}", exc_info=True)
+        """Load the last compacted rollups, then replay the log on top"""
+        with self._lock:
             self.data = AnalyticsData()
-    
-    def save(self) -> None:
-        """Save analytics to disk"""
+            try:
+                if self.analytics_file.exists():
+                    with self.analytics_file.open("r", encoding="utf-8") as f:
+                        raw_data: Dict[str, Any] = json.load(f)
+                    if raw_data.get("version") == ANALYTICS_VERSION:
+                        self.data = self._from_dict(raw_data)
+                    else:
+                        self._migrate(raw_data)
+            except Exception as e:
+                logger.error(f"Failed to load analytics: {e}", exc_info=True)
+                self.data = AnalyticsData()
+
+            self._log_entries = self._replay_log()
+            logger.debug(
+                f"Loaded analytics: {self.total_operations} operations, "
+                f"{self._log_entries} from the log"
+            )
+            if self._log_entries >= COMPACT_EVERY:
+                # The first caller may be on a request path, so leave it to the writer
+                self._start_writer()
+                self._wake.set()
+
+    def _replay_log(self) -> int:
+        """Folds logged events newer than the rollups. Returns the line count"""
+        if not self.log_file.exists():
+            return 0
+        entries = 0
         try:
-            raw_data = {
-                "operations": [
-                    {
-                        "timestamp": op.timestamp,
-                        "operation_type": op.operation_type,
-                        "app_id": op.app_id,
-                        "success": op.success,
-                        "duration": op.duration,
-                        "error_message": op.error_message
-                    }
-                    for op in self.data.operations
-                ],
-                "total_downloads": self.data.total_downloads,
-                "total_successes": self.data.total_successes,
-                "total_failures": self.data.total_failures,
-                "feature_usage": self.data.feature_usage
-            }
-            
-            with ANALYTICS_FILE.open("w", encoding="utf-8") as f:
-                json.dump(raw_data, f, indent=2)
-            
-            logger.debug("Saved analytics data")
-        except Exception as e:
-            logger.error(f"Failed to save analytics: {e}", exc_info=True)
-    
+            with self.log_file.open("r", encoding="utf-8") as f:
+                for line in f:
+                    entries += 1
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # Most likely a write cut short by a crash
+                        logger.debug(f"Skipping bad analytics log line: {line!r}")
+                        continue
+                    if event.get("seq", 0) > self.data.last_seq:
+                        self._apply(event)
+        except OSError as e:
+            logger.error(f"Failed to read analytics log: {e}", exc_info=True)
+        return entries
+
+    def _migrate(self, raw_data: Dict[str, Any]) -> None:
+        """Folds the old single-file format (every operation in one list)"""
+        for op in raw_data.get("operations", []):
+            self._fold_operation(OperationRecord(**op))
+        # The old counters also counted operations that were never listed
+        self.data.total_downloads = raw_data.get("total_downloads", self.data.total_downloads)
+        self.data.total_successes = raw_data.get("total_successes", self.data.total_successes)
+        self.data.total_failures = raw_data.get("total_failures", self.data.total_failures)
+        self.data.feature_usage = dict(raw_data.get("feature_usage", {}))
+        self.save()
+        logger.info("Migrated analytics to the log format")
+
+    @staticmethod
+    def _from_dict(raw_data: Dict[str, Any]) -> AnalyticsData:
+        return AnalyticsData(
+            total_downloads=raw_data.get("total_downloads", 0),
+            total_successes=raw_data.get("total_successes", 0),
+            total_failures=raw_data.get("total_failures", 0),
+            feature_usage=raw_data.get("feature_usage", {}),
+            per_operation={
+                k: OperationRollup(**v) for k, v in raw_data.get("per_operation", {}).items()
+            },
+            daily={k: OperationRollup(**v) for k, v in raw_data.get("daily", {}).items()},
+            app_downloads={int(k): v for k, v in raw_data.get("app_downloads", {}).items()},
+            recent=[OperationRecord(**x) for x in raw_data.get("recent", [])],
+            latency_hourly=_sketches_from_dict(raw_data.get("latency_hourly", {})),
+            latency_daily=_sketches_from_dict(raw_data.get("latency_daily", {})),
+            last_seq=raw_data.get("last_seq", 0),
+        )
+
+    def _to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": ANALYTICS_VERSION,
+            "last_seq": self.data.last_seq,
+            "total_downloads": self.data.total_downloads,
+            "total_successes": self.data.total_successes,
+            "total_failures": self.data.total_failures,
+            "feature_usage": self.data.feature_usage,
+            "per_operation": {k: asdict(v) for k, v in self.data.per_operation.items()},
+            "daily": {k: asdict(v) for k, v in self.data.daily.items()},
+            "app_downloads": self.data.app_downloads,
+            "recent": [asdict(x) for x in self.data.recent],
+            "latency_hourly": _sketches_to_dict(self.data.latency_hourly),
+            "latency_daily": _sketches_to_dict(self.data.latency_daily),
+        }
+
+    def save(self) -> None:
+        """Save the rollups to disk. The log isn't touched"""
+        with self._io_lock:
+            try:
+                # Only the snapshot holds up threads recording events
+                with self._lock:
+                    snapshot = self._to_dict()
+                temp_file = self.analytics_file.with_suffix(".tmp")
+                with temp_file.open("w", encoding="utf-8") as f:
+                    json.dump(snapshot, f, indent=2)
+                temp_file.replace(self.analytics_file)
+                logger.debug("Saved analytics data")
+            except Exception as e:
+                logger.error(f"Failed to save analytics: {e}", exc_info=True)
+
+    def compact(self) -> None:
+        """Saves the rollups and empties the log they now include.
+        If this gets interrupted in between, `last_seq` keeps the log from
+        being counted twice. Events still pending are in the saved rollups
+        too, and get skipped on replay for the same reason"""
+        with self._io_lock:
+            with self._lock:
+                cutoff = (date.today() - timedelta(days=DAILY_RETENTION_DAYS)).isoformat()
+                self.data.daily = {k: v for k, v in self.data.daily.items() if k >= cutoff}
+                _prune_buckets(self.data.latency_daily, cutoff)
+                hour_cutoff = _hour_bucket(time.time() - HOURLY_RETENTION_HOURS * 3600)
+                _prune_buckets(self.data.latency_hourly, hour_cutoff)
+            self.save()
+            try:
+                self.log_file.open("w", encoding="utf-8").close()
+                self._log_entries = 0
+                logger.debug("Compacted analytics log")
+            except OSError as e:
+                logger.error(f"Failed to truncate analytics log: {e}", exc_info=True)
+
+    def flush(self) -> None:
+        """Writes pending events to the log, compacting it if it's due"""
+        with self._io_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if events:
+                try:
+                    with self.log_file.open("a", encoding="utf-8") as f:
+                        f.writelines(
+                            json.dumps(x, separators=(",", ":")) + "\n" for x in events
+                        )
+                    self._log_entries += len(events)
+                except OSError as e:
+                    logger.error(f"Failed to write analytics log: {e}", exc_info=True)
+            if self._log_entries >= COMPACT_EVERY:
+                self.compact()
+
+    def _run_writer(self) -> None:
+        while True:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def _start_writer(self) -> None:
+        with self._lock:
+            if self._writer is not None:
+                return
+            self._writer = threading.Thread(
+                target=self._run_writer, name="smd-analytics", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.flush)
+
+    def _append(self, event: Dict[str, Any]) -> None:
+        """Applies an event and queues it for the log"""
+        with self._lock:
+            event["seq"] = self.data.last_seq + 1
+            self._apply(event)
+            self._pending.append(event)
+            if len(self._pending) >= COMPACT_EVERY:
+                self._wake.set()
+        self._start_writer()
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        """Folds one log event into the rollups"""
+        kind = event.get("type")
+        if kind == "operation":
+            self._fold_operation(
+                OperationRecord(**{
+                    k: v for k, v in event.items() if k not in ("type", "seq")
+                })
+            )
+        elif kind == "feature":
+            name = event["name"]
+            self.data.feature_usage[name] = self.data.feature_usage.get(name, 0) + 1
+        elif kind == "latency":
+            self._fold_latency(
+                f"endpoint:{event['name']}", event["timestamp"], event["duration"]
+            )
+        self.data.last_seq = max(self.data.last_seq, event.get("seq", 0))
+
+    def _fold_operation(self, record: OperationRecord) -> None:
+        self.data.per_operation.setdefault(
+            record.operation_type, OperationRollup()
+        ).add(record)
+        day = datetime.fromtimestamp(record.timestamp).date().isoformat()
+        self.data.daily.setdefault(day, OperationRollup()).add(record)
+        self._fold_latency(f"op:{record.operation_type}", record.timestamp, record.duration)
+
+        if record.operation_type == "download":
+            self.data.total_downloads += 1
+            if record.app_id is not None:
+                self.data.app_downloads[record.app_id] = (
+                    self.data.app_downloads.get(record.app_id, 0) + 1
+                )
+        if record.success:
+            self.data.total_successes += 1
+        else:
+            self.data.total_failures += 1
+
+        self.data.recent.append(record)
+        if len(self.data.recent) > RECENT_OPERATIONS:
+            del self.data.recent[: len(self.data.recent) - RECENT_OPERATIONS]
+
+    def _fold_latency(self, series: str, timestamp: float, duration: float) -> None:
+        day = datetime.fromtimestamp(timestamp).date().isoformat()
+        self.data.latency_daily.setdefault(series, {}).setdefault(
+            day, QuantileSketch()
+        ).add(duration)
+        self.data.latency_hourly.setdefault(series, {}).setdefault(
+            _hour_bucket(timestamp), QuantileSketch()
+        ).add(duration)
+
     def record_operation(
         self,
         operation_type: str,
@@ -103,7 +345,7 @@ class AnalyticsTracker:
     ) -> None:
         """
         Record an operation
-        
+
         Args:
             operation_type: Type of operation (e.g., 'download', 'process_lua')
             app_id: Steam app ID (if applicable)
@@ -119,57 +361,58 @@ class AnalyticsTracker:
             duration=duration,
             error_message=error_message
         )
-        
-        self.data.operations.append(record)
-        
-        # Update counters
-        if operation_type == "download":
-            self.data.total_downloads += 1
-        
-        if success:
-            self.data.total_successes += 1
-        else:
-            self.data.total_failures += 1
-        
-        self.save()
+        self._append({"type": "operation", **asdict(record)})
         logger.info(f"Recorded operation: {operation_type} (success={success})")
-    
+
     def record_feature_usage(self, feature_name: str) -> None:
         """
         Record usage of a feature
-        
+
         Args:
             feature_name: Name of the feature used
         """
-        if feature_name not in self.data.feature_usage:
-            self.data.feature_usage[feature_name] = 0
-        
-        self.data.feature_usage[feature_name] += 1
-        self.save()
+        self._append({"type": "feature", "name": feature_name, "timestamp": time.time()})
         logger.debug(f"Recorded feature usage: {feature_name}")
-    
+
+    def record_latency(self, endpoint: str, duration: float) -> None:
+        """
+        Record how long a single network call took
+
+        Args:
+            endpoint: Name of what was called (e.g. a host, 'product_info', 'cdn_manifest')
+            duration: Call duration in seconds, failed calls included
+        """
+        self._append({
+            "type": "latency",
+            "name": endpoint,
+            "duration": duration,
+            "timestamp": time.time(),
+        })
+
+    @property
+    def total_operations(self) -> int:
+        with self._lock:
+            return sum(x.count for x in self.data.per_operation.values())
+
     def get_most_downloaded_games(self, limit: int = 10) -> List[tuple]:
         """
         Get most frequently downloaded games
-        
+
         Args:
             limit: Maximum number of results
-            
+
         Returns:
             List of (app_id, count) tuples
         """
-        app_ids = [
-            op.app_id for op in self.data.operations
-            if op.app_id is not None and op.operation_type == "download"
-        ]
-        
-        counter = Counter(app_ids)
-        return counter.most_common(limit)
-    
+        with self._lock:
+            return heapq.nlargest(
+                limit, self.data.app_downloads.items(), key=lambda x: x[1]
+            )
+
     def get_success_rate(self) -> float:
         """
         Calculate overall success rate
-        
+
         Returns:
             Success rate as percentage (0-100)
         """
@@ -177,99 +420,253 @@ class AnalyticsTracker:
         if total == 0:
             return 0.0
         return (self.data.total_successes / total) * 100
-    
+
     def get_average_duration(self, operation_type: Optional[str] = None) -> float:
         """
         Calculate average operation duration
-        
+
         Args:
             operation_type: Filter by operation type (None for all)
-            
+
         Returns:
             Average duration in seconds
         """
-        operations = self.data.operations
-        if operation_type:
-            operations = [op for op in operations if op.operation_type == operation_type]
-        
-        if not operations:
-            return 0.0
-        
-        total_duration = sum(op.duration for op in operations)
-        return total_duration / len(operations)
-    
+        with self._lock:
+            if operation_type:
+                rollup = self.data.per_operation.get(operation_type)
+                return rollup.average_duration if rollup else 0.0
+
+            count = self.total_operations
+            if count == 0:
+                return 0.0
+            return sum(x.total_duration for x in self.data.per_operation.values()) / count
+
+    def get_daily_stats(self, days: int = 7) -> List[tuple]:
+        """
+        Get per-day totals, oldest first
+
+        Args:
+            days: How many days back to include, today included
+
+        Returns:
+            List of (ISO date, OperationRollup) tuples. Days without operations are skipped
+        """
+        today = date.today()
+        result = []
+        with self._lock:
+            for offset in range(days - 1, -1, -1):
+                day = (today - timedelta(days=offset)).isoformat()
+                if day in self.data.daily:
+                    result.append((day, self.data.daily[day]))
+        return result
+
+    def get_latency_series(self) -> List[str]:
+        """
+        Get every series that has latency data
+
+        Returns:
+            Series names ('op:<type>' or 'endpoint:<name>'), operations first
+        """
+        with self._lock:
+            return sorted(self.data.latency_daily, key=lambda x: (not x.startswith("op:"), x))
+
+    def get_latency_sketch(
+        self, series: str, hours: Optional[int] = None, days: Optional[int] = None
+    ) -> QuantileSketch:
+        """
+        Get the merged sketch of a series over a time window
+
+        Args:
+            series: Series name
+            hours: Last N hours, using hourly buckets (at most HOURLY_RETENTION_HOURS)
+            days: Last N days, using daily buckets. Everything kept if both are None
+
+        Returns:
+            A new sketch, empty if there's no data
+        """
+        if hours is not None:
+            cutoff = _hour_bucket(time.time() - (hours - 1) * 3600)
+            series_buckets = self.data.latency_hourly
+        else:
+            cutoff = (
+                (date.today() - timedelta(days=days - 1)).isoformat() if days else ""
+            )
+            series_buckets = self.data.latency_daily
+        # Background threads add buckets and samples while this runs
+        with self._lock:
+            buckets = series_buckets.get(series, {})
+            return QuantileSketch.merged(v for k, v in buckets.items() if k >= cutoff)
+
+    def get_latency_percentiles(
+        self, series: str, hours: Optional[int] = None, days: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Get count, mean and p50/p95/p99 of a series over a time window
+
+        Returns:
+            Dictionary with 'count', 'mean', 'p50', 'p95' and 'p99'. Percentiles are None without data
+        """
+        sketch = self.get_latency_sketch(series, hours, days)
+        result: Dict[str, Any] = {"count": sketch.count, "mean": sketch.mean}
+        for q in PERCENTILES:
+            result[f"p{round(q * 100)}"] = sketch.quantile(q)
+        return result
+
+    def get_daily_percentile(
+        self, series: str, q: float = 0.95, days: int = 7
+    ) -> List[tuple]:
+        """
+        Get one percentile per day, oldest first
+
+        Returns:
+            List of (ISO date, value or None) tuples, one per day
+        """
+        today = date.today()
+        result = []
+        with self._lock:
+            buckets = self.data.latency_daily.get(series, {})
+            for offset in range(days - 1, -1, -1):
+                day = (today - timedelta(days=offset)).isoformat()
+                sketch = buckets.get(day)
+                result.append((day, sketch.quantile(q) if sketch else None))
+        return result
+
     def get_feature_usage_stats(self) -> Dict[str, int]:
         """
         Get feature usage statistics
-        
+
         Returns:
             Dictionary of feature names to usage counts
         """
-        return dict(self.data.feature_usage)
-    
+        with self._lock:
+            return dict(self.data.feature_usage)
+
     def export_to_json(self, output_path: Path) -> bool:
         """
         Export analytics to JSON file
-        
+
         Args:
             output_path: Output file path
-            
+
         Returns:
             True if successful
         """
         try:
-            export_data = {
-                "summary": {
-                    "total_operations": len(self.data.operations),
-                    "total_downloads": self.data.total_downloads,
-                    "total_successes": self.data.total_successes,
-                    "total_failures": self.data.total_failures,
-                    "success_rate": f"{self.get_success_rate():.2f}%",
-                    "average_duration": f"{self.get_average_duration():.2f}s"
-                },
-                "most_downloaded_games": [
-                    {"app_id": app_id, "count": count}
-                    for app_id, count in self.get_most_downloaded_games()
-                ],
-                "feature_usage": self.get_feature_usage_stats(),
-                "operations": [
-                    {
-                        "timestamp": op.timestamp,
-                        "operation_type": op.operation_type,
-                        "app_id": op.app_id,
-                        "success": op.success,
-                        "duration": op.duration
-                    }
-                    for op in self.data.operations
-                ]
-            }
-            
+            with self._lock:
+                export_data = {
+                    "summary": {
+                        "total_operations": self.total_operations,
+                        "total_downloads": self.data.total_downloads,
+                        "total_successes": self.data.total_successes,
+                        "total_failures": self.data.total_failures,
+                        "success_rate": f"{self.get_success_rate():.2f}%",
+                        "average_duration": f"{self.get_average_duration():.2f}s"
+                    },
+                    "most_downloaded_games": [
+                        {"app_id": app_id, "count": count}
+                        for app_id, count in self.get_most_downloaded_games()
+                    ],
+                    "feature_usage": self.get_feature_usage_stats(),
+                    "per_operation": {
+                        k: {**asdict(v), "average_duration": v.average_duration}
+                        for k, v in self.data.per_operation.items()
+                    },
+                    "daily": {k: asdict(v) for k, v in sorted(self.data.daily.items())},
+                    "latency": {
+                        series: {
+                            "last_24h": self.get_latency_percentiles(series, hours=24),
+                            "last_7d": self.get_latency_percentiles(series, days=7),
+                            f"last_{DAILY_RETENTION_DAYS}d": self.get_latency_percentiles(series),
+                        }
+                        for series in self.get_latency_series()
+                    },
+                    "recent_operations": [
+                        {
+                            "timestamp": op.timestamp,
+                            "operation_type": op.operation_type,
+                            "app_id": op.app_id,
+                            "success": op.success,
+                            "duration": op.duration
+                        }
+                        for op in self.data.recent
+                    ]
+                }
+
             with output_path.open("w", encoding="utf-8") as f:
                 json.dump(export_data, f, indent=2)
-            
+
             logger.info(f"Analytics exported to: {output_path}")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to export analytics: {e}", exc_info=True)
             return False
-    
+
     def generate_dashboard_text(self) -> str:
         """
         Generate text-based analytics dashboard
-        
+
         Returns:
             Formatted dashboard text
         """
+        with self._lock:
+            return self._dashboard_text()
+
+    def _dashboard_text(self) -> str:
         lines = []
         lines.append("=" * 80)
         lines.append("SMD Analytics Dashboard")
         lines.append("=" * 80)
-        lines.append(f"\nTotal Operations: {len(self.data.operations)}")
+        lines.append(f"\nTotal Operations: {self.total_operations}")
         lines.append(f"Total Downloads: {self.data.total_downloads}")
         lines.append(f"Success Rate: {self.get_success_rate():.2f}%")
         lines.append(f"Average Duration: {self.get_average_duration():.2f}s")
-        
+
+        # Per operation type
+        if self.data.per_operation:
+            lines.append("\n" + "=" * 80)
+            lines.append("Operations:")
+            lines.append("=" * 80)
+            for name, rollup in sorted(
+                self.data.per_operation.items(), key=lambda x: x[1].count, reverse=True
+            ):
+                lines.append(
+                    f"  {name}: {rollup.count} runs, {rollup.failures} failed, "
+                    f"avg {rollup.average_duration:.2f}s"
+                )
+
+        # Last 7 days
+        daily = self.get_daily_stats(7)
+        if daily:
+            lines.append("\n" + "=" * 80)
+            lines.append("Last 7 Days:")
+            lines.append("=" * 80)
+            for day, rollup in daily:
+                lines.append(f"  {day}: {rollup.count} operations, {rollup.failures} failed")
+
+        # Latency percentiles
+        series_list = self.get_latency_series()
+        if series_list:
+            lines.append("\n" + "=" * 80)
+            lines.append("Latency (p50 / p95 / p99):")
+            lines.append("=" * 80)
+            for series in series_list:
+                lines.append(f"  {series}")
+                for label, window in (("24h", {"hours": 24}), ("7d", {"days": 7})):
+                    stats = self.get_latency_percentiles(series, **window)
+                    if not stats["count"]:
+                        continue
+                    lines.append(
+                        f"    {label:>3}: {_format_seconds(stats['p50'])} / "
+                        f"{_format_seconds(stats['p95'])} / "
+                        f"{_format_seconds(stats['p99'])} ({stats['count']} samples)"
+                    )
+                trend = self.get_daily_percentile(series, 0.95, 7)
+                lines.append(
+                    "    p95 by day: "
+                    + " ".join(_format_seconds(value) for _, value in trend)
+                )
+
         # Most downloaded games
         most_downloaded = self.get_most_downloaded_games(5)
         if most_downloaded:
@@ -278,7 +675,7 @@ class AnalyticsTracker:
             lines.append("=" * 80)
             for app_id, count in most_downloaded:
                 lines.append(f"  App ID {app_id}: {count} downloads")
-        
+
         # Feature usage
         feature_stats = self.get_feature_usage_stats()
         if feature_stats:
@@ -287,10 +684,44 @@ class AnalyticsTracker:
             lines.append("=" * 80)
             for feature, count in sorted(feature_stats.items(), key=lambda x: x[1], reverse=True):
                 lines.append(f"  {feature}: {count} times")
-        
+
         return "\n".join(lines)
 
 
+def _hour_bucket(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%dT%H")
+
+
+def _prune_buckets(series: Dict[str, Dict[str, QuantileSketch]], cutoff: str) -> None:
+    """Drops buckets older than `cutoff`, then series left without any"""
+    for name in list(series):
+        series[name] = {k: v for k, v in series[name].items() if k >= cutoff}
+        if not series[name]:
+            del series[name]
+
+
+def _sketches_to_dict(series: Dict[str, Dict[str, QuantileSketch]]) -> Dict[str, Any]:
+    return {
+        name: {k: v.to_dict() for k, v in buckets.items()}
+        for name, buckets in series.items()
+    }
+
+
+def _sketches_from_dict(raw: Dict[str, Any]) -> Dict[str, Dict[str, QuantileSketch]]:
+    return {
+        name: {k: QuantileSketch.from_dict(v) for k, v in buckets.items()}
+        for name, buckets in raw.items()
+    }
+
+
+def _format_seconds(value: Optional[float]) -> str:
+    if value is None:
+        return "-"
+    if value < 1:
+        return f"{value * 1000:.0f}ms"
+    return f"{value:.2f}s"
+
+
 # Global analytics tracker instance
 _analytics_tracker: Optional[AnalyticsTracker] = None
 
@@ -0,0 +1,269 @@
+"""Local copy of Steam's app list with an in-process fuzzy search.
+
+The list is synced incrementally through `IStoreService/GetAppList`: only apps
+modified since the last sync are requested, and an interrupted sync resumes
+from the last `last_appid` it saw. Everything is kept in one msgpack file.
+Searching doesn't need fzf; names are indexed by word so lookups only
+touch the apps that can match.
+"""
+
+import heapq
+import json
+import logging
+import re
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+
+import msgpack  # type: ignore
+
+from smd.http_utils import download_to_tempfile
+from smd.storage.packed import load_packed
+from smd.utils import enter_path, root_folder
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = root_folder(outside_internal=True) / "app_catalog.bin"
+CATALOG_VERSION = 1
+APP_LIST_URL = "https://api.steampowered.com/IStoreService/GetAppList/v1/"
+PAGE_SIZE = 50000
+
+_WORD_SPLIT = re.compile(r"[\W_]+")
+
+
+class AppMatch(NamedTuple):
+    app_id: int
+    name: str
+    score: float
+
+
+def _normalize(text: str) -> str:
+    return _WORD_SPLIT.sub(" ", text.casefold()).strip()
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class FuzzyIndex:
+    """Word index over app names. Each query word matches every indexed word
+    it's a prefix of, and words with no prefix match fall back to trigram
+    similarity over the vocabulary, which catches typos"""
+
+    def __init__(self, names: list[str]):
+        self.normalized = [_normalize(x) for x in names]
+        postings: dict[str, list[int]] = {}
+        for i, name in enumerate(self.normalized):
+            for word in set(name.split()):
+                postings.setdefault(word, []).append(i)
+        self.vocab = sorted(postings)
+        self.postings = postings
+        self._vocab_trigrams: Optional[dict[str, list[str]]] = None
+
+    def _prefix_words(self, token: str) -> list[str]:
+        start = bisect_left(self.vocab, token)
+        words: list[str] = []
+        for word in self.vocab[start:]:
+            if not word.startswith(token):
+                break
+            words.append(word)
+        return words
+
+    def _similar_words(self, token: str, limit: int = 20) -> list[str]:
+        if self._vocab_trigrams is None:
+            # Built on the first typo only, most searches never need it
+            self._vocab_trigrams = {}
+            for word in self.vocab:
+                for gram in _trigrams(word):
+                    self._vocab_trigrams.setdefault(gram, []).append(word)
+        grams = _trigrams(token)
+        shared: dict[str, int] = {}
+        for gram in grams:
+            for word in self._vocab_trigrams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        scored = (
+            (count / (len(grams) + len(_trigrams(word)) - count), word)
+            for word, count in shared.items()
+        )
+        return [w for s, w in heapq.nlargest(limit, scored) if s >= 0.3]
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[int, float]]:
+        """Returns up to `limit` (position, score) pairs, best first"""
+        query = _normalize(query)
+        tokens = query.split()
+        if not tokens:
+            return []
+        # position -> (tokens matched, tokens matched exactly or by prefix)
+        hits: dict[int, list[int]] = {}
+        for token in tokens:
+            words = self._prefix_words(token)
+            exact = bool(words)
+            if not words:
+                words = self._similar_words(token)
+            seen: set[int] = set()
+            for word in words:
+                seen.update(self.postings[word])
+            for pos in seen:
+                entry = hits.setdefault(pos, [0, 0])
+                entry[0] += 1
+                entry[1] += exact
+
+        def score(pos: int) -> float:
+            matched, exact = hits[pos]
+            name = self.normalized[pos]
+            value = matched * 10.0 + exact * 2.0
+            if name == query:
+                value += 50
+            elif name.startswith(query):
+                value += 20
+            elif query in name:
+                value += 10
+            # Shorter names first, so base games beat their DLCs and soundtracks
+            return value - len(name) / 100
+
+        best = heapq.nlargest(limit, hits, key=score)
+        return [(pos, score(pos)) for pos in best]
+
+
+class AppCatalog:
+    """Steam's app list saved on disk, searchable by name"""
+
+    def __init__(self, catalog_file: Path = CATALOG_FILE):
+        self.catalog_file = catalog_file
+        self.apps: dict[int, str] = {}
+        self.modified_since = 0
+        "Largest `last_modified` seen. The next sync only asks for newer apps"
+        self.resume_appid: Optional[int] = None
+        "Set while a sync is half done, so it can continue from there"
+        self.synced_at: Optional[float] = None
+        self._ids: list[int] = []
+        self._index: Optional[FuzzyIndex] = None
+        self.load()
+
+    def load(self):
+        data = load_packed(self.catalog_file, "App catalog")
+        if data is None:
+            return
+        if data.get("version") != CATALOG_VERSION:
+            logger.info("App catalog version changed, starting over")
+            return
+        self.apps = dict(zip(data.get("ids", []), data.get("names", [])))
+        self.modified_since = data.get("modified_since", 0)
+        self.resume_appid = data.get("resume_appid")
+        self.synced_at = data.get("synced_at")
+        self._index = None
+
+    def save(self):
+        ids = sorted(self.apps)
+        data = {
+            "version": CATALOG_VERSION,
+            "modified_since": self.modified_since,
+            "resume_appid": self.resume_appid,
+            "synced_at": self.synced_at,
+            "ids": ids,
+            "names": [self.apps[x] for x in ids],
+        }
+        temp_file = self.catalog_file.with_suffix(".tmp")
+        with temp_file.open("wb") as f:
+            f.write(msgpack.packb(data))  # type: ignore
+        temp_file.replace(self.catalog_file)
+
+    def sync(
+        self,
+        api_key: str,
+        on_page: Optional[Callable[[int], None]] = None,
+        max_retries: int = 3,
+    ) -> Optional[int]:
+        """Fetches apps added or changed since the last sync.
+        Progress is saved after every page.
+
+        Args:
+            api_key (str): Steam Web API key
+            on_page (Optional[Callable[[int], None]]): Called with the number
+                of apps in each page
+            max_retries (int): Attempts per page before giving up
+
+        Returns:
+            Optional[int]: Number of apps received, None if the sync failed
+        """
+        params: dict[str, str] = {"key": api_key, "max_results": str(PAGE_SIZE)}
+        if self.modified_since:
+            params["if_modified_since"] = str(self.modified_since)
+        newest = self.modified_since
+        received = 0
+        # The resume point only means something for the same modified_since
+        last_appid = self.resume_appid
+        while True:
+            if last_appid is not None:
+                params["last_appid"] = str(last_appid)
+            resp = None
+            for attempt in range(max_retries):
+                with download_to_tempfile(APP_LIST_URL, params=params) as tf:
+                    if tf is not None:
+                        try:
+                            resp = json.load(tf)
+                        except ValueError as e:
+                            logger.warning(f"Bad app list page: {e}")
+                if resp is not None:
+                    break
+                logger.debug(f"App list page failed, attempt {attempt + 1}")
+            if resp is None:
+                self.save()
+                return None
+
+            apps: list[dict[str, Any]] = enter_path(resp, "response", "apps", default=[])
+            for app in apps:
+                if (app_id := app.get("appid")) is None:
+                    continue
+                self.apps[app_id] = app.get("name", "UNKNOWN GAME")
+                newest = max(newest, app.get("last_modified", 0))
+            received += len(apps)
+            if on_page is not None:
+                on_page(len(apps))
+
+            if not enter_path(resp, "response", "have_more_results", default=False):
+                break
+            last_appid = enter_path(resp, "response", "last_appid")
+            self.resume_appid = last_appid
+            self.save()
+
+        self.modified_since = newest
+        self.resume_appid = None
+        self.synced_at = time.time()
+        self._index = None
+        self.save()
+        logger.info(f"App catalog synced, {received} new or changed apps")
+        return received
+
+    @property
+    def index(self) -> FuzzyIndex:
+        if self._index is None:
+            start = time.perf_counter()
+            self._ids = list(self.apps)
+            self._index = FuzzyIndex(list(self.apps.values()))
+            logger.debug(
+                f"Indexed {len(self._ids)} apps in {time.perf_counter() - start:.2f}s"
+            )
+        return self._index
+
+    def search(self, query: str, limit: int = 10) -> list[AppMatch]:
+        """Top `limit` apps whose names best match the query"""
+        index = self.index
+        return [
+            AppMatch(self._ids[pos], self.apps[self._ids[pos]], score)
+            for pos, score in index.search(query, limit)
+        ]
+
+
+# Global catalog instance
+_app_catalog: Optional[AppCatalog] = None
+
+
+def get_app_catalog() -> AppCatalog:
+    """Get or create global app catalog instance"""
+    global _app_catalog
+    if _app_catalog is None:
+        _app_catalog = AppCatalog()
+    return _app_catalog
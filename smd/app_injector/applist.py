@@ -10,8 +10,8 @@ from rich.console import Console
 from rich.table import Column, Table
 
 from smd.app_injector.base import AppInjectionManager
+from smd.backup import backup_before_operation
 from smd.lua.writer import ConfigVDFWriter
-from smd.manifest.downloader import ManifestDownloader
 from smd.prompts import prompt_confirm, prompt_dir, prompt_select, prompt_text
 from smd.steam_client import ParsedDLC, SteamInfoProvider, get_product_info
 from smd.steam_store import get_dlc_list_from_store, get_dlc_names_from_store
@@ -440,6 +440,8 @@ class AppListManager(AppInjectionManager):
 
         paths_to_delete = self._get_paths_from_ids(ids_to_delete, path_and_ids)
         all_paths = [x.path for x in path_and_ids]
+        # Deleting renumbers every file after it, so keep the whole folder
+        backup_before_operation(self.applist_folder, "applist_delete")
         self.delete_paths(paths_to_delete, all_paths)
 
     def _dlc_check_via_store(self, base_id: int) -> None:
@@ -504,6 +506,8 @@ class AppListManager(AppInjectionManager):
                 print("Steam connection failed. Using Steam Store instead (no login)...")
                 self._dlc_check_via_store(base_id)
                 return
+            from smd.manifest.downloader import ManifestDownloader
+
             config = ConfigVDFWriter(self.steam_path)
             manifest = ManifestDownloader(self.provider, self.steam_path)
             if dlc_info:
@@ -10,7 +10,6 @@ from rich.table import Column, Table
 
 from smd.app_injector.base import AppInjectionManager
 from smd.lua.writer import ConfigVDFWriter
-from smd.manifest.downloader import ManifestDownloader
 from smd.prompts import prompt_confirm, prompt_file
 from smd.steam_client import ParsedDLC, SteamInfoProvider
 from smd.steam_store import get_dlc_list_from_store, get_dlc_names_from_store
@@ -142,6 +141,8 @@ class SLSManager(AppInjectionManager):
                 print("Steam connection failed. Using Steam Store instead (no login)...")
                 self._dlc_check_via_store(base_id)
                 return
+            from smd.manifest.downloader import ManifestDownloader
+
             config = ConfigVDFWriter(self.steam_path)
             manifest = ManifestDownloader(self.provider, self.steam_path)
             if dlc_info:
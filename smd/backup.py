@@ -1,10 +1,21 @@
-"""Backup system for critical files and folders"""
+"""Backup system for critical files and folders
 
+Backups are content-addressed snapshots. Every unique file is stored once,
+zlib-compressed, under `objects/` by its SHA-256. A backup is a small JSON
+manifest in `snapshots/` listing the files and their hashes, so backing up
+mostly unchanged data only stores what changed. Restores are checked against
+the hashes, so they're byte-exact.
+"""
+
+import hashlib
+import json
 import logging
+import os
 import shutil
+import zlib
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 from colorama import Fore, Style
 
@@ -16,15 +27,35 @@ logger = logging.getLogger(__name__)
 
 BACKUP_DIR = root_folder(outside_internal=True) / "backups"
 DEFAULT_RETENTION = 5  # Keep last 5 backups
+SNAPSHOT_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_file(path: Path) -> str:
+    sha = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
 
 
 class BackupManager:
     """Manages backups of critical files and folders"""
-    
-    def __init__(self):
-        self.backup_dir = BACKUP_DIR
-        self.backup_dir.mkdir(exist_ok=True)
-    
+
+    def __init__(self, backup_dir: Path = BACKUP_DIR):
+        self.backup_dir = backup_dir
+        self.objects_dir = backup_dir / "objects"
+        self.snapshots_dir = backup_dir / "snapshots"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(exist_ok=True)
+
     def get_retention_count(self) -> int:
         """Get backup retention count from settings"""
         try:
@@ -34,57 +65,166 @@ class BackupManager:
         except (ValueError, TypeError, AttributeError):
             pass
         return DEFAULT_RETENTION
-    
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+
+    def _store_object(self, file: Path, digest: str) -> int:
+        """Compresses a file into the object store unless it's already there.
+        Returns the number of bytes written"""
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            return 0
+        object_path.parent.mkdir(exist_ok=True)
+        temp_path = object_path.with_suffix(".tmp")
+        compressor = zlib.compressobj(6)
+        with file.open("rb") as src, temp_path.open("wb") as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                dst.write(compressor.compress(chunk))
+            dst.write(compressor.flush())
+        temp_path.replace(object_path)
+        return object_path.stat().st_size
+
+    def _read_object(self, digest: str, dest: Path) -> bool:
+        """Decompresses an object to `dest`. Returns False if the content
+        doesn't match its hash"""
+        sha = hashlib.sha256()
+        decompressor = zlib.decompressobj()
+        with self._object_path(digest).open("rb") as src, dest.open("wb") as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                data = decompressor.decompress(chunk)
+                sha.update(data)
+                dst.write(data)
+            data = decompressor.flush()
+            sha.update(data)
+            dst.write(data)
+        return sha.hexdigest() == digest
+
+    def _latest_snapshot_of(self, source: Path) -> Optional[dict[str, Any]]:
+        for snapshot in self.list_backups():
+            if snapshot.suffix != ".json":
+                continue
+            data = self.load_snapshot(snapshot)
+            if data is not None and data.get("source") == str(source):
+                return data
+        return None
+
     def create_backup(self, source: Path, backup_name: Optional[str] = None) -> Optional[Path]:
         """
         Create a backup of a file or folder.
-        
+
+        Files whose size and modification time match the previous backup of
+        the same source aren't read again.
+
         Args:
             source: Path to file or folder to backup
             backup_name: Optional custom backup name
-            
+
         Returns:
-            Path to backup if successful, None otherwise
+            Path to the snapshot manifest if successful, None otherwise
         """
         try:
             if not source.exists():
                 logger.error(f"Source does not exist: {source}")
                 return None
-            
+
             # Generate backup name with timestamp
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if backup_name is None:
-                backup_name = f"{source.name}_{timestamp}"
-            else:
-                backup_name = f"{backup_name}_{timestamp}"
-            
-            backup_path = self.backup_dir / backup_name
-            
-            # Create backup
+            base_name = source.name if backup_name is None else backup_name
+            snapshot_path = self.snapshots_dir / f"{base_name}_{timestamp}.json"
+            counter = 1
+            while snapshot_path.exists():
+                snapshot_path = self.snapshots_dir / f"{base_name}_{timestamp}_{counter}.json"
+                counter += 1
+
+            previous = self._latest_snapshot_of(source)
+            known: dict[str, dict[str, Any]] = (
+                {x["path"]: x for x in previous["files"]} if previous else {}
+            )
+
             if source.is_dir():
-                shutil.copytree(source, backup_path)
-                logger.info(f"Created folder backup: {backup_path}")
+                files = sorted(x for x in source.rglob("*") if x.is_file())
+                dirs = sorted(
+                    x.relative_to(source).as_posix() for x in source.rglob("*")
+                    if x.is_dir() and not any(x.iterdir())
+                )
             else:
-                shutil.copy2(source, backup_path)
-                logger.info(f"Created file backup: {backup_path}")
-            
+                files, dirs = [source], []
+
+            entries: list[dict[str, Any]] = []
+            stored = reused = 0
+            for file in files:
+                rel = file.relative_to(source).as_posix() if source.is_dir() else file.name
+                stat = file.stat()
+                old = known.get(rel)
+                if (
+                    old is not None
+                    and old["size"] == stat.st_size
+                    and old["mtime_ns"] == stat.st_mtime_ns
+                    and self._object_path(old["sha256"]).exists()
+                ):
+                    digest = old["sha256"]
+                    reused += 1
+                else:
+                    digest = _hash_file(file)
+                    stored += self._store_object(file, digest)
+                entries.append({
+                    "path": rel,
+                    "sha256": digest,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                })
+
+            snapshot = {
+                "version": SNAPSHOT_VERSION,
+                "name": base_name,
+                "source": str(source),
+                "kind": "dir" if source.is_dir() else "file",
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "files": entries,
+                "empty_dirs": dirs,
+            }
+            temp_path = snapshot_path.with_suffix(".tmp")
+            with temp_path.open("w", encoding="utf-8") as f:
+                json.dump(snapshot, f, indent=2)
+            temp_path.replace(snapshot_path)
+            logger.info(
+                f"Created backup {snapshot_path.name}: {len(entries)} files, "
+                f"{reused} unchanged, {stored} new bytes stored"
+            )
+
             # Cleanup old backups
-            self._cleanup_old_backups(source.name)
-            
-            return backup_path
-            
+            self._cleanup_old_backups(base_name)
+
+            return snapshot_path
+
         except Exception as e:
             logger.error(f"Failed to create backup of {source}: {e}", exc_info=True)
             return None
-    
+
+    def load_snapshot(self, snapshot_path: Path) -> Optional[dict[str, Any]]:
+        """Reads a snapshot manifest. None if it's unreadable"""
+        try:
+            with snapshot_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                return None
+            return data
+        except (OSError, ValueError) as e:
+            logger.error(f"Could not read snapshot {snapshot_path}: {e}")
+            return None
+
     def restore_backup(self, backup_path: Path, destination: Path) -> bool:
         """
         Restore from a backup.
-        
+
+        Everything is restored next to the destination first and only swapped
+        in once every file matched its hash.
+
         Args:
-            backup_path: Path to backup to restore
+            backup_path: Snapshot manifest (or an old full-copy backup) to restore
             destination: Where to restore the backup
-            
+
         Returns:
             True if successful, False otherwise
         """
@@ -92,96 +232,174 @@ class BackupManager:
             if not backup_path.exists():
                 logger.error(f"Backup does not exist: {backup_path}")
                 return False
-            
-            # Verify backup integrity (basic check)
+
+            # Verify backup integrity
             if not self._verify_backup(backup_path):
                 logger.error(f"Backup integrity check failed: {backup_path}")
                 return False
-            
+
+            if backup_path.parent != self.snapshots_dir:
+                return self._restore_legacy(backup_path, destination)
+
+            snapshot = self.load_snapshot(backup_path)
+            assert snapshot is not None  # checked by _verify_backup
+            staging = destination.with_name(f".{destination.name}.restore")
+            if staging.exists():
+                _remove(staging)
+
+            if snapshot["kind"] == "dir":
+                staging.mkdir(parents=True)
+                for rel in snapshot["empty_dirs"]:
+                    (staging / rel).mkdir(parents=True, exist_ok=True)
+            for entry in snapshot["files"]:
+                target = staging / entry["path"] if snapshot["kind"] == "dir" else staging
+                target.parent.mkdir(parents=True, exist_ok=True)
+                if not self._read_object(entry["sha256"], target):
+                    logger.error(f"Hash mismatch restoring {entry['path']}")
+                    _remove(staging)
+                    return False
+                os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
             # Remove destination if it exists
             if destination.exists():
-                if destination.is_dir():
-                    shutil.rmtree(destination)
-                else:
-                    destination.unlink()
-            
-            # Restore backup
-            if backup_path.is_dir():
-                shutil.copytree(backup_path, destination)
-            else:
-                shutil.copy2(backup_path, destination)
-            
+                _remove(destination)
+            staging.replace(destination)
+
             logger.info(f"Restored backup from {backup_path} to {destination}")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to restore backup: {e}", exc_info=True)
             return False
-    
+
+    def _restore_legacy(self, backup_path: Path, destination: Path) -> bool:
+        """Restores a full-copy backup made before snapshots existed"""
+        if destination.exists():
+            _remove(destination)
+        if backup_path.is_dir():
+            shutil.copytree(backup_path, destination)
+        else:
+            shutil.copy2(backup_path, destination)
+        logger.info(f"Restored backup from {backup_path} to {destination}")
+        return True
+
     def list_backups(self, filter_name: Optional[str] = None) -> list[Path]:
         """
         List available backups.
-        
+
         Args:
             filter_name: Optional filter to show only backups matching this name
-            
+
         Returns:
-            List of backup paths sorted by modification time (newest first)
+            List of backup paths sorted by modification time (newest first).
+            Snapshot manifests, plus full copies made by older versions
         """
         try:
+            backups = list(self.snapshots_dir.glob("*.json"))
+            backups.extend(
+                p for p in self.backup_dir.iterdir()
+                if p not in (self.objects_dir, self.snapshots_dir)
+            )
             if filter_name:
-                backups = [p for p in self.backup_dir.iterdir() if p.name.startswith(filter_name)]
-            else:
-                backups = list(self.backup_dir.iterdir())
-            
+                backups = [p for p in backups if p.name.startswith(filter_name)]
+
             # Sort by modification time, newest first
             backups.sort(key=lambda p: p.stat().st_mtime, reverse=True)
             return backups
-            
+
         except Exception as e:
             logger.error(f"Failed to list backups: {e}", exc_info=True)
             return []
-    
+
     def _verify_backup(self, backup_path: Path) -> bool:
-        """Basic integrity check for backup"""
+        """Checks that a snapshot is readable and all its objects exist.
+        Object contents are checked against their hashes while restoring"""
         try:
-            if backup_path.is_dir():
-                # Check if directory is not empty
-                return any(backup_path.iterdir())
-            else:
-                # Check if file is not empty
+            if backup_path.parent != self.snapshots_dir:
+                # Old full-copy backup, only a basic check is possible
+                if backup_path.is_dir():
+                    return any(backup_path.iterdir())
                 return backup_path.stat().st_size > 0
+            snapshot = self.load_snapshot(backup_path)
+            if snapshot is None:
+                return False
+            missing = [
+                x["path"] for x in snapshot["files"]
+                if not self._object_path(x["sha256"]).exists()
+            ]
+            if missing:
+                logger.error(f"Backup is missing {len(missing)} object(s): {missing[:5]}")
+                return False
+            return True
         except Exception as e:
             logger.error(f"Backup verification failed: {e}", exc_info=True)
             return False
-    
-    def _cleanup_old_backups(self, source_name: str):
-        """Remove old backups beyond retention count"""
+
+    def _cleanup_old_backups(self, backup_name: str):
+        """Remove old backups beyond retention count, then objects no
+        remaining snapshot refers to"""
         try:
             retention = self.get_retention_count()
-            backups = self.list_backups(source_name)
-            
+            backups = [
+                x for x in self.list_backups(backup_name)
+                if x.parent == self.backup_dir
+                or (self.load_snapshot(x) or {}).get("name") == backup_name
+            ]
+
             # Remove backups beyond retention count
+            removed = False
             for backup in backups[retention:]:
                 try:
-                    if backup.is_dir():
-                        shutil.rmtree(backup)
-                    else:
-                        backup.unlink()
+                    _remove(backup)
+                    removed = True
                     logger.info(f"Removed old backup: {backup}")
                 except Exception as e:
                     logger.error(f"Failed to remove old backup {backup}: {e}")
-                    
+            if removed:
+                self.collect_garbage()
+
         except Exception as e:
             logger.error(f"Failed to cleanup old backups: {e}", exc_info=True)
-    
+
+    def collect_garbage(self) -> int:
+        """Deletes objects that no snapshot refers to. Returns bytes freed"""
+        referenced: set[str] = set()
+        for snapshot_path in self.snapshots_dir.glob("*.json"):
+            snapshot = self.load_snapshot(snapshot_path)
+            if snapshot is None:
+                # Can't tell what an unreadable snapshot needs, keep everything
+                logger.warning(f"Skipping garbage collection, {snapshot_path} is unreadable")
+                return 0
+            referenced.update(x["sha256"] for x in snapshot["files"])
+        freed = 0
+        for prefix in os.scandir(self.objects_dir):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name not in referenced:
+                    freed += entry.stat().st_size
+                    os.unlink(entry.path)
+        logger.debug(f"Backup garbage collection freed {freed} bytes")
+        return freed
+
     def get_backup_size(self) -> int:
-        """Get total size of all backups in bytes"""
+        """Get total size of all backups in bytes, as stored on disk"""
         try:
             total_size = 0
-            for backup in self.backup_dir.rglob("*"):
-                if backup.is_file():
-                    total_size += backup.stat().st_size
+            for entry in os.scandir(self.snapshots_dir):
+                total_size += entry.stat().st_size
+            for prefix in os.scandir(self.objects_dir):
+                if prefix.is_dir():
+                    total_size += sum(x.stat().st_size for x in os.scandir(prefix.path))
+            for legacy in self.backup_dir.iterdir():
+                if legacy in (self.objects_dir, self.snapshots_dir):
+                    continue
+                if legacy.is_file():
+                    total_size += legacy.stat().st_size
+                else:
+                    total_size += sum(
+                        x.stat().st_size for x in legacy.rglob("*") if x.is_file()
+                    )
             return total_size
         except Exception as e:
             logger.error(f"Failed to calculate backup size: {e}", exc_info=True)
@@ -203,21 +421,21 @@ def get_backup_manager() -> BackupManager:
 def backup_before_operation(source: Path, operation_name: str) -> Optional[Path]:
     """
     Convenience function to create a backup before a risky operation.
-    
+
     Args:
         source: Path to backup
         operation_name: Name of the operation (for backup naming)
-        
+
     Returns:
         Path to backup if successful, None otherwise
     """
     manager = get_backup_manager()
     print(Fore.YELLOW + f"Creating backup before {operation_name}..." + Style.RESET_ALL)
     backup_path = manager.create_backup(source, f"{operation_name}_{source.name}")
-    
+
     if backup_path:
         print(Fore.GREEN + f"✓ Backup created: {backup_path.name}" + Style.RESET_ALL)
     else:
         print(Fore.RED + "✗ Failed to create backup" + Style.RESET_ALL)
-    
+
     return backup_path
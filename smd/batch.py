@@ -0,0 +1,311 @@
+"""Headless engine behind --batch.
+
+Processes many .lua files without any prompts: every question the interactive
+flow asks is answered up front by a BatchPolicy. All luas are parsed first,
+depots shared between them are only downloaded once, every manifest goes
+through one worker pool and Steam is restarted at most once at the end.
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from colorama import Fore, Style
+from tqdm import tqdm  # type: ignore
+
+from smd.app_injector.base import AppInjectionManager
+from smd.lua.manager import backup_lua_to, parse_lua_contents
+from smd.lua.writer import ACFWriter, ConfigVDFWriter
+from smd.manifest.downloader import ManifestDownloader, get_worker_count
+from smd.manifest.index import get_manifest_index
+from smd.processes import SteamProcess
+from smd.steam_client import SteamInfoProvider
+from smd.steam_tools_compat import install_lua_to_steam
+from smd.storage.vdf import ensure_library_has_app
+from smd.structs import DepotKeyPair, LuaParsedInfo
+from smd.utils import root_folder
+from smd.zip import read_lua_from_zip
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REPORT_FILE = root_folder(outside_internal=True) / "batch_report.json"
+
+
+@dataclass
+class BatchPolicy:
+    """Answers to every question the interactive flow would ask"""
+
+    library: Path
+    "Steam library the games get installed to"
+    overwrite_acf: bool = False
+    "Overwrite existing .acf files (resets the game's status) instead of keeping them"
+    restart_steam: bool = False
+    "Restart Steam once after everything is done"
+    decrypt: bool = False
+    "Also decrypt the downloaded manifests"
+    workers: int = field(default_factory=get_worker_count)
+    "Manifest download workers, shared by all files"
+    report_path: Path = DEFAULT_REPORT_FILE
+    "Where the JSON report gets written"
+
+
+@dataclass
+class BatchFileResult:
+    """What happened to a single file. Ends up in the report as-is"""
+
+    path: str
+    app_id: Optional[str] = None
+    status: str = "pending"
+    "One of: pending, success, partial, failed, dry_run"
+    message: str = ""
+    manifests: list[str] = field(default_factory=list)
+    "Manifest filenames now in depotcache"
+    failed_depots: list[str] = field(default_factory=list)
+    "Depots with a key whose manifest couldn't be resolved or downloaded"
+    duration: float = 0.0
+    "Seconds spent on this file, excluding the shared download pool"
+
+
+def _read_lua(path: Path) -> Optional[str]:
+    """Returns the lua contents of a .lua or .zip file. None if there's none"""
+    if path.suffix == ".zip":
+        return read_lua_from_zip(path)
+    try:
+        return path.read_text(encoding="utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class BatchProcessor:
+    """Runs the full lua processing flow for many files without prompting"""
+
+    def __init__(
+        self,
+        provider: SteamInfoProvider,
+        steam_path: Path,
+        injection_manager: Optional[AppInjectionManager],
+        steam_proc: Optional[SteamProcess],
+        policy: BatchPolicy,
+    ):
+        self.provider = provider
+        self.steam_path = steam_path
+        self.injection_manager = injection_manager
+        self.steam_proc = steam_proc
+        self.policy = policy
+        self.saved_lua = Path.cwd() / "saved_lua"
+        self.downloader = ManifestDownloader(provider, steam_path, interactive=False)
+        self.report_written = False
+        "Whether the last run managed to write its report"
+
+    def run(self, file_paths: list[Path], dry_run: bool = False) -> list[BatchFileResult]:
+        """Processes every file, writes the report and returns the results"""
+        started = datetime.now()
+        results: dict[Path, BatchFileResult] = {}
+        parsed: dict[Path, LuaParsedInfo] = {}
+
+        print(Fore.YELLOW + "\nParsing lua files:" + Style.RESET_ALL)
+        for path in file_paths:
+            result = results[path] = BatchFileResult(str(path))
+            lua = self._parse(path, result)
+            if lua is not None:
+                parsed[path] = lua
+                print(f"{path.name}: App ID {lua.app_id}, {len(lua.depots)} depot(s)")
+            else:
+                print(Fore.RED + f"✗ {path.name}: {result.message}" + Style.RESET_ALL)
+
+        if dry_run:
+            for path, lua in parsed.items():
+                results[path].status = "dry_run"
+                results[path].message = (
+                    f"Would install app {lua.app_id} with "
+                    f"{sum(1 for x in lua.depots if x.decryption_key)} key(s)"
+                )
+        elif parsed:
+            self._install_all(parsed, results)
+            self._download_all(parsed, results)
+            for path in parsed:
+                result = results[path]
+                if result.status != "pending":
+                    continue
+                if not result.failed_depots:
+                    result.status = "success"
+                elif result.manifests:
+                    result.status = "partial"
+                else:
+                    result.status = "failed"
+                    result.message = (
+                        f"No manifest could be downloaded (depots {', '.join(result.failed_depots)})"
+                    )
+            if self.policy.restart_steam and self.steam_proc is not None:
+                print(Fore.YELLOW + "\nRestarting Steam:" + Style.RESET_ALL)
+                self.steam_proc.launch_or_restart(interactive=False)
+
+        ordered = [results[x] for x in file_paths]
+        self.report_written = self.write_report(ordered, started, dry_run)
+        return ordered
+
+    def _parse(self, path: Path, result: BatchFileResult) -> Optional[LuaParsedInfo]:
+        if not path.exists():
+            result.status, result.message = "failed", "File not found"
+            return None
+        contents = _read_lua(path)
+        if contents is None:
+            result.status, result.message = "failed", "No readable lua in file"
+            return None
+        lua = parse_lua_contents(contents, path)
+        if lua is None:
+            result.status, result.message = "failed", "App ID or decryption keys not found"
+            return None
+        result.app_id = lua.app_id
+        return lua
+
+    def _install_all(
+        self, parsed: dict[Path, LuaParsedInfo], results: dict[Path, BatchFileResult]
+    ):
+        """Every step before the manifest downloads. config.vdf is written once"""
+        print(Fore.YELLOW + "\nAdding Decryption Keys:" + Style.RESET_ALL)
+        unique_pairs: dict[str, DepotKeyPair] = {}
+        for lua in parsed.values():
+            for pair in lua.depots:
+                if pair.decryption_key:
+                    unique_pairs.setdefault(pair.depot_id, pair)
+        try:
+            ConfigVDFWriter(self.steam_path).add_decryption_keys(
+                list(unique_pairs.values())
+            )
+        except Exception as e:
+            logger.error(f"Could not write decryption keys: {e}", exc_info=True)
+            for path in parsed:
+                results[path].status = "failed"
+                results[path].message = f"config.vdf: {e}"
+            return
+
+        acf = ACFWriter(self.policy.library)
+        for path, lua in parsed.items():
+            result = results[path]
+            start = time.time()
+            print(Fore.CYAN + f"\n{path.name} (App ID {lua.app_id}):" + Style.RESET_ALL)
+            try:
+                if self.injection_manager is not None:
+                    self.injection_manager.add_ids(lua)
+                backup_lua_to(self.saved_lua, lua)
+                install_lua_to_steam(
+                    self.steam_path, lua.app_id, self.saved_lua / f"{lua.app_id}.lua"
+                )
+                acf.write_acf(lua, overwrite=self.policy.overwrite_acf)
+                ensure_library_has_app(self.steam_path, self.policy.library, lua.app_id)
+            except Exception as e:
+                logger.error(f"Batch install failed for {path}: {e}", exc_info=True)
+                result.status, result.message = "failed", str(e)
+            result.duration += time.time() - start
+
+    def _download_all(
+        self, parsed: dict[Path, LuaParsedInfo], results: dict[Path, BatchFileResult]
+    ):
+        """Resolves manifest IDs for every lua, then downloads each unique
+        depot/manifest pair once through a single pool"""
+        print(Fore.YELLOW + "\nResolving manifest IDs:" + Style.RESET_ALL)
+        installable = {
+            path: lua for path, lua in parsed.items()
+            if results[path].status != "failed"
+        }
+        # One product info request for every base app instead of one per lua
+        try:
+            self.provider.get_app_info(sorted({
+                int(x.app_id) for x in installable.values()
+                if self.downloader.unpinned_depots(x)
+            }))
+        except Exception as e:
+            logger.warning(f"Could not prefetch product info: {e}")
+
+        # (depot ID, manifest ID) -> decryption key, and which files need it
+        tasks: dict[tuple[str, str], str] = {}
+        users: dict[tuple[str, str], list[Path]] = {}
+        for path, lua in installable.items():
+            start = time.time()
+            try:
+                manifest_ids = self.downloader.get_manifest_ids(lua, auto=True)
+            except Exception as e:
+                logger.error(f"Could not resolve manifests for {path}: {e}", exc_info=True)
+                manifest_ids = {}
+            for pair in lua.depots:
+                if not pair.decryption_key:
+                    continue
+                manifest_id = manifest_ids.get(pair.depot_id)
+                if manifest_id is None:
+                    # A base app ID with a key usually has no manifest of its own
+                    if pair.depot_id != lua.app_id:
+                        results[path].failed_depots.append(pair.depot_id)
+                    continue
+                key = (pair.depot_id, manifest_id)
+                tasks.setdefault(key, pair.decryption_key)
+                users.setdefault(key, []).append(path)
+            results[path].duration += time.time() - start
+
+        if not tasks:
+            print(Fore.YELLOW + "No manifests to download" + Style.RESET_ALL)
+            return
+
+        self.downloader.prefetch_gmrcs([manifest_id for _, manifest_id in tasks])
+        cdn = self.downloader.get_cdn_client()
+        print(
+            Fore.CYAN
+            + f"\nDownloading {len(tasks)} unique manifests for {len(installable)} "
+            f"file(s) with {self.policy.workers} workers..."
+            + Style.RESET_ALL
+        )
+        with ThreadPoolExecutor(max_workers=self.policy.workers) as executor:
+            futures = [
+                executor.submit(
+                    self.downloader.download_one,
+                    depot_id, manifest_id, dec_key, self.policy.decrypt, cdn,
+                )
+                for (depot_id, manifest_id), dec_key in tasks.items()
+            ]
+            with tqdm(total=len(futures), desc="Downloading", unit="manifest") as pbar:
+                for future in as_completed(futures):
+                    success, depot_id, manifest_id, manifest_path, status = future.result()
+                    for path in users[(depot_id, manifest_id)]:
+                        if success and manifest_path is not None:
+                            results[path].manifests.append(manifest_path.name)
+                        else:
+                            results[path].failed_depots.append(depot_id)
+                    if not success:
+                        logger.warning(f"Batch download {depot_id}_{manifest_id}: {status}")
+                    pbar.update(1)
+        get_manifest_index(self.steam_path).save()
+
+    def write_report(
+        self, results: list[BatchFileResult], started: datetime, dry_run: bool
+    ) -> bool:
+        """Writes the machine-readable report. Returns True if successful"""
+        report = {
+            "started": started.isoformat(timespec="seconds"),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+            "dry_run": dry_run,
+            "policy": {
+                "library": str(self.policy.library),
+                "overwrite_acf": self.policy.overwrite_acf,
+                "restart_steam": self.policy.restart_steam,
+                "decrypt": self.policy.decrypt,
+                "workers": self.policy.workers,
+            },
+            "summary": {
+                status: sum(1 for x in results if x.status == status)
+                for status in ("success", "partial", "failed", "dry_run")
+            },
+            "files": [asdict(x) for x in results],
+        }
+        try:
+            with self.policy.report_path.open("w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            logger.info(f"Batch report written to {self.policy.report_path}")
+            return True
+        except OSError as e:
+            logger.error(f"Failed to write batch report: {e}", exc_info=True)
+            return False
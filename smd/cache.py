@@ -2,10 +2,12 @@
 
 import json
 import logging
+import threading
 import time
 from pathlib import Path
 from typing import Any, Optional
 
+from smd.metrics import get_metrics
 from smd.storage.settings import get_setting
 from smd.structs import Settings
 from smd.utils import root_folder
@@ -16,11 +18,18 @@ CACHE_FILE = root_folder(outside_internal=True) / "api_cache.json"
 DEFAULT_TTL = 3600  # 1 hour in seconds
 
 
+def _key_kind(key: str) -> str:
+    """Metrics label for a key, e.g. app_info_730 -> app_info"""
+    return key.rstrip("0123456789").rstrip("_") or key
+
+
 class APICache:
     """Simple file-based cache for API responses"""
     
     def __init__(self):
         self.cache: dict[str, dict[str, Any]] = {}
+        # Manifest downloads read and write the cache from worker threads
+        self._lock = threading.RLock()
         self.load()
     
     def load(self):
@@ -36,28 +45,45 @@ class APICache:
     
     def save(self):
         """Save cache to disk"""
+        metrics = get_metrics()
         try:
-            with CACHE_FILE.open("w", encoding="utf-8") as f:
+            with self._lock, metrics.histogram(
+                "smd_cache_save_seconds", "Duration of writing the API cache to disk"
+            ).time(), CACHE_FILE.open("w", encoding="utf-8") as f:
                 json.dump(self.cache, f)
+                metrics.gauge("smd_cache_entries", "Entries in the API cache").set(
+                    len(self.cache)
+                )
             logger.debug(f"Saved cache with {len(self.cache)} entries")
         except Exception as e:
             logger.error(f"Failed to save cache: {e}", exc_info=True)
     
-    def get(self, key: str) -> Optional[Any]:
-        """Get cached value if not expired"""
-        if key not in self.cache:
-            return None
-        
-        entry = self.cache[key]
-        timestamp = entry.get("timestamp", 0)
-        ttl = entry.get("ttl", DEFAULT_TTL)
-        
-        # Check if expired
-        if time.time() - timestamp > ttl:
-            logger.debug(f"Cache expired for key: {key}")
-            del self.cache[key]
-            return None
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """Get cached value if not expired. With `max_age`, entries older than
+        that many seconds are treated as missing too, but kept"""
+        requests = get_metrics().counter(
+            "smd_cache_requests_total", "API cache lookups by result"
+        )
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                requests.inc(kind=_key_kind(key), result="miss")
+                return None
+
+            timestamp = entry.get("timestamp", 0)
+            ttl = entry.get("ttl", DEFAULT_TTL)
+
+            # Check if expired
+            if time.time() - timestamp > ttl:
+                logger.debug(f"Cache expired for key: {key}")
+                del self.cache[key]
+                requests.inc(kind=_key_kind(key), result="expired")
+                return None
+            if max_age is not None and time.time() - timestamp > max_age:
+                requests.inc(kind=_key_kind(key), result="too_old")
+                return None
         
+        requests.inc(kind=_key_kind(key), result="hit")
         logger.debug(f"Cache hit for key: {key}")
         return entry.get("data")
     
@@ -66,38 +92,76 @@ class APICache:
         if ttl is None:
             ttl = DEFAULT_TTL
         
-        self.cache[key] = {
-            "data": data,
-            "timestamp": time.time(),
-            "ttl": ttl
-        }
+        with self._lock:
+            self.cache[key] = {
+                "data": data,
+                "timestamp": time.time(),
+                "ttl": ttl
+            }
         logger.debug(f"Cached data for key: {key} (TTL: {ttl}s)")
         self.save()
+
+    def set_many(
+        self, items: dict[str, Any], ttl: Optional[int] = None, save: bool = True
+    ):
+        """Set several cached values with the same TTL, saving only once.
+        With `save=False` the caller is expected to call `save` later"""
+        if ttl is None:
+            ttl = DEFAULT_TTL
+
+        now = time.time()
+        with self._lock:
+            for key, data in items.items():
+                self.cache[key] = {"data": data, "timestamp": now, "ttl": ttl}
+        logger.debug(f"Cached data for {len(items)} keys (TTL: {ttl}s)")
+        if save:
+            self.save()
     
     def invalidate(self, key: Optional[str] = None):
         """Invalidate cache entry or entire cache"""
-        if key is None:
-            # Clear entire cache
-            self.cache = {}
-            logger.info("Invalidated entire cache")
-        elif key in self.cache:
-            del self.cache[key]
-            logger.info(f"Invalidated cache for key: {key}")
+        with self._lock:
+            if key is None:
+                # Clear entire cache
+                self.cache = {}
+                logger.info("Invalidated entire cache")
+            elif key in self.cache:
+                del self.cache[key]
+                logger.info(f"Invalidated cache for key: {key}")
         self.save()
     
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Invalidate every entry whose key starts with `prefix`. Returns how many"""
+        with self._lock:
+            keys = [x for x in self.cache if x.startswith(prefix)]
+            for key in keys:
+                del self.cache[key]
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cache entries starting with {prefix}")
+            self.save()
+        return len(keys)
+
+    def invalidate_many(self, keys: list[str]):
+        """Invalidate several entries, saving only once"""
+        with self._lock:
+            removed = [x for x in keys if self.cache.pop(x, None) is not None]
+        if removed:
+            logger.debug(f"Invalidated {len(removed)} cache entries")
+            self.save()
+    
     def cleanup_expired(self):
         """Remove all expired entries"""
         current_time = time.time()
         expired_keys = []
-        
-        for key, entry in self.cache.items():
-            timestamp = entry.get("timestamp", 0)
-            ttl = entry.get("ttl", DEFAULT_TTL)
-            if current_time - timestamp > ttl:
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            del self.cache[key]
+
+        with self._lock:
+            for key, entry in self.cache.items():
+                timestamp = entry.get("timestamp", 0)
+                ttl = entry.get("ttl", DEFAULT_TTL)
+                if current_time - timestamp > ttl:
+                    expired_keys.append(key)
+
+            for key in expired_keys:
+                del self.cache[key]
         
         if expired_keys:
             logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
@@ -125,7 +125,15 @@ class GitHubReleaseDownloader:
         cache_subdir = self.cache_dir / unlocker_type.value / version
         cache_subdir.mkdir(parents=True, exist_ok=True)
         
-        # Download to temp file and extract
+        # Blocking download and extraction, kept off the shared event loop
+        return await asyncio.to_thread(
+            self._download_and_extract, download_url, cache_subdir, unlocker_type
+        )
+
+    def _download_and_extract(
+        self, download_url: str, cache_subdir: Path, unlocker_type: UnlockerType
+    ) -> Optional[Path]:
+        """Download the release ZIP and extract it into `cache_subdir`"""
         with download_to_tempfile(download_url) as temp_file:
             if temp_file is None:
                 logger.error(f"Failed to download {unlocker_type.value}")
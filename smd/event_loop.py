@@ -0,0 +1,139 @@
+"""A single asyncio loop that lives on a background thread.
+
+Sync code submits coroutines to it instead of calling `asyncio.run` every time,
+so connections get reused and several requests can be in flight at once.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+
+class BackgroundLoop:
+    """Runs an event loop forever on a daemon thread, started on first use"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The running loop. Starts the thread if it isn't running yet"""
+        with self._lock:
+            if self._loop is None or self._thread is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._loop,), name="smd-event-loop", daemon=True
+                )
+                self._thread.start()
+                logger.debug("Started background event loop")
+            return self._loop
+
+    @staticmethod
+    def _run(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def in_loop(self) -> bool:
+        """Whether the caller is running on the background loop"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def client(self) -> Optional[httpx.AsyncClient]:
+        """The pooled client shared by coroutines on this loop.
+        None when called from any other loop, since clients can't cross loops"""
+        if not self.in_loop():
+            return None
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=10)
+        return self._client
+
+    def submit(self, coro: Coroutine[Any, Any, _T]) -> "concurrent.futures.Future[_T]":
+        """Schedules a coroutine and returns a future right away"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Coroutine[Any, Any, _T], timeout: Optional[float] = None) -> _T:
+        """Submits a coroutine and blocks until it's done.
+        Drop-in replacement for `asyncio.run`"""
+        if self.in_loop():
+            coro.close()
+            raise RuntimeError("Can't block on the background loop from inside it")
+        future = self.submit(coro)
+        try:
+            return wait_for_future(future, timeout)
+        except BaseException:
+            # Includes KeyboardInterrupt, so the coroutine doesn't keep running
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Closes the shared client and stops the loop"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or thread is None or not thread.is_alive():
+            return
+
+        async def close_client():
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_client(), loop).result(timeout=2)
+        except Exception as e:
+            logger.debug(f"Could not close shared client: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=2)
+        logger.debug("Stopped background event loop")
+
+
+def wait_for_future(
+    future: "concurrent.futures.Future[_T]", timeout: Optional[float] = None
+) -> _T:
+    """Like `future.result()` but wakes up regularly so Ctrl+C still works
+    (a plain untimed wait can't be interrupted on Windows)"""
+    waited = 0.0
+    while True:
+        try:
+            return future.result(timeout=0.1)
+        except concurrent.futures.TimeoutError:
+            waited += 0.1
+            if timeout is not None and waited >= timeout:
+                raise
+
+
+# Global loop instance
+_background_loop: Optional[BackgroundLoop] = None
+
+
+def get_background_loop() -> BackgroundLoop:
+    """Get or create global background loop instance"""
+    global _background_loop
+    if _background_loop is None:
+        _background_loop = BackgroundLoop()
+        atexit.register(_background_loop.stop)
+    return _background_loop
+
+
+def submit(coro: Coroutine[Any, Any, _T]) -> "concurrent.futures.Future[_T]":
+    """Schedules a coroutine on the background loop and returns its future"""
+    return get_background_loop().submit(coro)
+
+
+def run_sync(coro: Coroutine[Any, Any, _T], timeout: Optional[float] = None) -> _T:
+    """Runs a coroutine on the background loop and waits for the result"""
+    return get_background_loop().run(coro, timeout)
@@ -0,0 +1,223 @@
+"""One-way folder sync that only copies what changed.
+
+A file is up to date when the target has the same size and mtime (copy2 keeps
+the mtime), or failing that, the same SHA-256. Hashes are cached by path, size
+and mtime between runs, so a file is only hashed again after it changes.
+Files are compared and copied on a thread pool.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+import msgpack  # type: ignore
+
+from smd.storage.packed import load_packed
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+HASH_CACHE_FILE = root_folder(outside_internal=True) / "sync_hashes.bin"
+HASH_CACHE_VERSION = 1
+READ_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class SyncResult:
+    copied: int = 0
+    skipped: int = 0
+    "Already up to date"
+    removed: int = 0
+    "Orphans deleted from the target"
+    failed: list[tuple[Path, str]] = field(default_factory=list)
+    "(file, error)"
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.copied or self.removed)
+
+
+class HashCache:
+    """SHA-256 of files, keyed by path and invalidated by size and mtime"""
+
+    def __init__(self, cache_file: Path = HASH_CACHE_FILE):
+        self.cache_file = cache_file
+        self._hashes: dict[str, tuple[int, int, str]] = {}
+        "Path -> (size, mtime_ns, sha256)"
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        "Manifest workers save concurrently"
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        data = load_packed(self.cache_file, "Sync hash cache")
+        if data is None:
+            return
+        if data.get("version") != HASH_CACHE_VERSION:
+            return
+        self._hashes = {k: tuple(v) for k, v in data.get("hashes", {}).items()}  # type: ignore
+
+    def save(self):
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {"version": HASH_CACHE_VERSION, "hashes": dict(self._hashes)}
+                self._dirty = False
+            try:
+                temp_file = self.cache_file.with_suffix(".tmp")
+                with temp_file.open("wb") as f:
+                    f.write(msgpack.packb(data))  # type: ignore
+                temp_file.replace(self.cache_file)
+            except OSError as e:
+                logger.error(f"Failed to save sync hash cache: {e}", exc_info=True)
+
+    def digest(self, path: Path, stat: Optional[os.stat_result] = None) -> str:
+        if stat is None:
+            stat = path.stat()
+        key = str(path)
+        cached = self._hashes.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached[2]
+        sha256 = hashlib.sha256()
+        with path.open("rb") as f:
+            while chunk := f.read(READ_SIZE):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        with self._lock:
+            self._hashes[key] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._dirty = True
+        return digest
+
+    def forget(self, path: Path):
+        with self._lock:
+            if self._hashes.pop(str(path), None) is not None:
+                self._dirty = True
+
+    def prune(self, folder: Path, names: set[str]):
+        """Forgets the files directly in `folder` that aren't in `names`,
+        so hashes of deleted files don't pile up"""
+        with self._lock:
+            stale = [
+                x for x in self._hashes
+                if os.path.dirname(x) == str(folder)
+                and os.path.basename(x) not in names
+            ]
+            for key in stale:
+                del self._hashes[key]
+            if stale:
+                self._dirty = True
+
+
+def is_up_to_date(src: Path, dest: Path, hashes: HashCache) -> bool:
+    """Whether `dest` already has the contents of `src`"""
+    try:
+        dest_stat = dest.stat()
+    except FileNotFoundError:
+        return False
+    src_stat = src.stat()
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if src_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    return hashes.digest(src, src_stat) == hashes.digest(dest, dest_stat)
+
+
+def copy_if_changed(src: Path, dest: Path, hashes: Optional[HashCache] = None) -> bool:
+    """Copies `src` to `dest` unless it's already there.
+    Returns True if it copied. OSError is raised"""
+    if hashes is None:
+        hashes = get_hash_cache()
+    if is_up_to_date(src, dest, hashes):
+        return False
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = dest.with_name(dest.name + ".tmp")
+    shutil.copy2(src, temp_file)
+    temp_file.replace(dest)
+    hashes.forget(dest)
+    return True
+
+
+def sync_folder(
+    src_dir: Path,
+    dest_dir: Path,
+    pattern: str = "*",
+    include: Optional[Callable[[Path], bool]] = None,
+    remove_orphans: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> SyncResult:
+    """
+    Copies the files of `src_dir` matching `pattern` to `dest_dir`,
+    skipping the ones that are already up to date
+
+    Args:
+        include: Extra filter on the source files
+        remove_orphans: Delete files in `dest_dir` matching `pattern` (and
+            `include`) that `src_dir` doesn't have
+    """
+    result = SyncResult()
+    if not src_dir.exists():
+        return result
+    sources = [
+        x for x in src_dir.glob(pattern)
+        if x.is_file() and (include is None or include(x))
+    ]
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    hashes = get_hash_cache()
+
+    def sync_one(src: Path) -> Optional[bool]:
+        try:
+            return copy_if_changed(src, dest_dir / src.name, hashes)
+        except OSError as e:
+            result.failed.append((src, str(e)))
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for copied in executor.map(sync_one, sources):
+            if copied:
+                result.copied += 1
+            elif copied is not None:
+                result.skipped += 1
+
+    if remove_orphans:
+        names = {x.name for x in sources}
+        for dest in dest_dir.glob(pattern):
+            if dest.name in names or not dest.is_file():
+                continue
+            if include is not None and not include(dest):
+                continue
+            try:
+                dest.unlink()
+                hashes.forget(dest)
+                result.removed += 1
+            except OSError as e:
+                result.failed.append((dest, str(e)))
+
+    hashes.prune(src_dir, {x.name for x in src_dir.iterdir()})
+    hashes.prune(dest_dir, {x.name for x in dest_dir.iterdir()})
+    hashes.save()
+    logger.debug(
+        f"Synced {src_dir} -> {dest_dir}: {result.copied} copied, "
+        f"{result.skipped} skipped, {result.removed} removed, {len(result.failed)} failed"
+    )
+    return result
+
+
+# Global cache instance
+_hash_cache: Optional[HashCache] = None
+
+
+def get_hash_cache() -> HashCache:
+    """Get or create global hash cache instance"""
+    global _hash_cache
+    if _hash_cache is None:
+        _hash_cache = HashCache()
+    return _hash_cache
@@ -410,8 +410,9 @@ class GameHandler:
             validator=validate,
             filter=filter
         )
-        ctx = WorkshopItemContext(self.provider.client, workshop_id)
-        content, method = ugc_resolver.resolve(ctx)
+        content, method = self.provider.call(
+            lambda client: ugc_resolver.resolve(WorkshopItemContext(client, workshop_id))
+        )
         if isinstance(content, DirectDownloadUrl):
             print("This is a legacy workshop item. "
                   "It can be directly downloaded through"
@@ -479,7 +480,7 @@ class GameHandler:
         from smd.dlc_unlockers.downloader import GitHubReleaseDownloader
         from smd.dlc_unlockers.base import Platform, UnlockerType
         from smd.storage.settings import get_setting, set_setting
-        import asyncio
+        from smd.event_loop import run_sync
         
         # Resolve settings with defaults (CreamInstaller: UseSmokeAPI=True, Proxy=optional)
         use_smokeapi = get_setting(Settings.USE_SMOKEAPI)
@@ -581,7 +582,7 @@ class GameHandler:
                 continue
             print(f"  {utype.value}...", end=" ")
             try:
-                dll_dir = asyncio.run(downloader.download_latest(utype))
+                dll_dir = run_sync(downloader.download_latest(utype))
                 if dll_dir:
                     unlocker_dirs[utype] = dll_dir
                     print(Fore.GREEN + "✓" + Style.RESET_ALL)
@@ -1,17 +1,34 @@
 import asyncio
+import hashlib
+import json
 import logging
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from tempfile import TemporaryFile
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Generator, Literal, Optional, Union, overload
+from typing import (
+    Any,
+    BinaryIO,
+    Generator,
+    Iterable,
+    Literal,
+    NamedTuple,
+    Optional,
+    Union,
+    overload,
+)
 from urllib.parse import urlparse
 
 import httpx
 from tqdm import tqdm  # type: ignore
 
+from smd.event_loop import get_background_loop, run_sync
+from smd.metrics import get_metrics, record_latency
 from smd.prompts import prompt_confirm, prompt_text
 from smd.secret_store import b64_decrypt
+from smd.utils import root_folder
 
 if sys.platform == "win32":
     import msvcrt
@@ -25,9 +42,6 @@ else:
         def getch():
             return None
 
-if TYPE_CHECKING:
-    from tempfile import _TemporaryFileWrapper  # pyright: ignore[reportPrivateUsage]
-
 logger = logging.getLogger(__name__)
 
 
@@ -37,6 +51,7 @@ async def get_request(
     type: Literal["text"] = "text",
     timeout: int = 10,
     headers: Optional[dict[str, str]] = None,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> Union[str, None]: ...
 
 
@@ -46,6 +61,7 @@ async def get_request(
     type: Literal["json"],
     timeout: int = 10,
     headers: Optional[dict[str, str]] = None,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> Union[dict[Any, Any], None]: ...
 
 
@@ -54,15 +70,28 @@ async def get_request(
     type: Literal["text", "json"] = "text",
     timeout: int = 10,
     headers: Optional[dict[str, str]] = None,
+    client: Optional[httpx.AsyncClient] = None,
 ) -> Union[str, dict[Any, Any], None]:
+    """Pass `client` to reuse its connections. On the background loop the
+    shared client is used, otherwise a new one is made"""
+    start = time.perf_counter()
+    status = "error"
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            logger.debug(f"Making request to {url}")
-            response = await client.get(url, headers=headers)
+        logger.debug("Making request to %s", url)
+        if client is None:
+            client = get_background_loop().client()
+        if client is None:
+            async with httpx.AsyncClient(timeout=timeout) as new_client:
+                response = await new_client.get(url, headers=headers)
+        else:
+            response = await client.get(url, headers=headers, timeout=timeout)
+        status = str(response.status_code)
 
         if response.status_code == 200:
             try:
-                logger.debug(f"Received {response.content}")
+                logger.debug(
+                    "Received %d bytes: %.500r", len(response.content), response.content
+                )
                 return response.text if type == "text" else response.json()
             except ValueError:
                 return
@@ -72,20 +101,40 @@ async def get_request(
 
     except httpx.RequestError as e:
         print(f"An error occurred: {repr(e)}")
+    finally:
+        host = urlparse(url).netloc
+        record_latency(
+            host,
+            time.perf_counter() - start,
+            "smd_http_request_seconds",
+            "Duration of get_request calls",
+            host=host,
+        )
+        get_metrics().counter(
+            "smd_http_requests_total", "get_request calls by status code"
+        ).inc(host=host, status=status)
 
 
-def get_request_raw(url: str):
+def get_request_raw(url: str, interactive: bool = True):
+    """Returns None for error statuses, so e.g. the body of a 401 isn't taken
+    for a manifest. When not interactive, network errors return None instead
+    of prompting"""
     resp = None
     while True:
         try:
             resp = httpx.get(url, timeout=None)
         except httpx.HTTPError as e:
             print(f"Network error: {repr(e)}")
-            if prompt_confirm("Try again?"):
+            if interactive and prompt_confirm("Try again?"):
                 continue
         break
-    if resp:
-        return resp.content
+    if resp is None:
+        return None
+    if not resp.is_success:
+        print(f"Request failed with status {resp.status_code}")
+        logger.debug(f"{url} returned {resp.status_code}: {resp.text[:500]!r}")
+        return None
+    return resp.content
 
 
 async def _wait_for_enter():
@@ -105,6 +154,16 @@ def get_base_domain(url: str):
     return base_url
 
 
+def _gmrc_url(manifest_id: Union[str, int]) -> str:
+    # Yes, I'm aware it's not actually "encrypted" since I included the password
+    # Shut up.
+    template_url = b64_decrypt(
+        b'gzTYiUdY7dR2oFPM+cUEUpSnLYn17uq09F8PATpFKT8=',
+        b'rok2PaPQ2T0CF3RZXe+AfytF7i+Yo/kEykq4hnPSSrhRDeESOARdQD4+SzqZqeG5C5U4fAiuEUuPpr1CaXl9V/Xv9EcZdWk1BbyUqCXP8FHkqdGm',
+    )
+    return template_url.format(manifest_id=manifest_id)
+
+
 # Lowkey don't remember why i wrote it like this.
 # It uses a default timeout of 10s but i think it still got stuck?
 async def get_gmrc(manifest_id: Union[str, int]) -> Union[str, None]:
@@ -116,13 +175,7 @@ async def get_gmrc(manifest_id: Union[str, int]) -> Union[str, None]:
     Returns:
         str: The request code
     """
-    # Yes, I'm aware it's not actually "encrypted" since I included the password
-    # Shut up.
-    template_url = b64_decrypt(
-        b'gzTYiUdY7dR2oFPM+cUEUpSnLYn17uq09F8PATpFKT8=',
-        b'rok2PaPQ2T0CF3RZXe+AfytF7i+Yo/kEykq4hnPSSrhRDeESOARdQD4+SzqZqeG5C5U4fAiuEUuPpr1CaXl9V/Xv9EcZdWk1BbyUqCXP8FHkqdGm',
-    )
-    url = template_url.format(manifest_id=manifest_id)
+    url = _gmrc_url(manifest_id)
     print("Getting request code...")
 
     headers = {
@@ -161,105 +214,450 @@ async def get_gmrc(manifest_id: Union[str, int]) -> Union[str, None]:
     return result
 
 
-def get_game_name(app_id: str) -> str:
-    """Converts an App ID to a game name"""
-    official_info = asyncio.run(
-        get_request(
-            f"https://store.steampowered.com/api/appdetails/?appids={app_id}",
-            "json",
-        )
-    )
+async def get_gmrc_batch(
+    manifest_ids: Iterable[Union[str, int]], max_concurrency: int = 8
+) -> dict[str, Optional[str]]:
+    """Gets request codes for several manifests concurrently over one client.
+    Never prompts, so failed codes are None and the caller decides what to do
+
+    Args:
+        manifest_ids (Iterable[Union[str, int]]): The manifest IDs
+        max_concurrency (int): Max requests in flight at once
+
+    Returns:
+        dict[str, Optional[str]]: Manifest IDs mapped to request codes
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(client: httpx.AsyncClient, manifest_id: str):
+        url = _gmrc_url(manifest_id)
+        async with semaphore:
+            code = await get_request(
+                url, headers={"Referer": get_base_domain(url)}, client=client
+            )
+        code = code.strip() if code else None
+        # Anything that isn't a number would just get us a 401 from the CDN
+        return manifest_id, code if code and code.isdigit() else None
+
+    ids = list(dict.fromkeys(str(x) for x in manifest_ids))
+    if (shared := get_background_loop().client()) is not None:
+        results = await asyncio.gather(*(fetch(shared, x) for x in ids))
+    else:
+        async with httpx.AsyncClient(timeout=10) as client:
+            results = await asyncio.gather(*(fetch(client, x) for x in ids))
+    return dict(results)
+
+
+def _appdetails_url(app_id: str) -> str:
+    return f"https://store.steampowered.com/api/appdetails/?appids={app_id}"
+
+
+async def get_game_names(
+    app_ids: Iterable[str], max_concurrency: int = 4, min_interval: float = 0.3
+) -> dict[str, Optional[str]]:
+    """Converts many App IDs to game names concurrently. The store API rate
+    limits hard, so requests are also spaced at least `min_interval` apart.
+    Never prompts, so names that can't be found are None
+
+    Args:
+        app_ids (Iterable[str]): The App IDs
+        max_concurrency (int): Max requests in flight at once
+        min_interval (float): Min seconds between two requests starting
+
+    Returns:
+        dict[str, Optional[str]]: App IDs mapped to game names
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    spacing = asyncio.Lock()
+    loop = asyncio.get_running_loop()
+    last_start = 0.0
+
+    async def fetch(app_id: str):
+        nonlocal last_start
+        async with semaphore:
+            async with spacing:
+                if (wait := last_start + min_interval - loop.time()) > 0:
+                    await asyncio.sleep(wait)
+                last_start = loop.time()
+            info = await get_request(_appdetails_url(app_id), "json")
+        name = info.get(app_id, {}).get("data", {}).get("name") if info else None
+        return app_id, name
+
+    ids = list(dict.fromkeys(app_ids))
+    return dict(await asyncio.gather(*(fetch(x) for x in ids)))
+
+
+def get_game_name(app_id: str, interactive: bool = True) -> str:
+    """Converts an App ID to a game name.
+    When not interactive, failures give a placeholder name instead of a prompt"""
+    official_info = run_sync(get_request(_appdetails_url(app_id), "json"))
     if official_info:
         app_name = official_info.get(app_id, {}).get("data", {}).get("name")
         if app_name is None:
+            if not interactive:
+                return placeholder_game_name(app_id)
             app_name = prompt_text(
                 "Request succeeded but couldn't find the game name. "
                 "Type the name of it: "
             )
     else:
+        if not interactive:
+            return placeholder_game_name(app_id)
         app_name = prompt_text("Request failed. Type the name of the game: ")
     return app_name
 
 
-@contextmanager
-def download_to_tempfile(
+def placeholder_game_name(app_id: Union[str, int]) -> str:
+    """Name used when the real one can't be found without asking the user"""
+    return f"App {app_id}"
+
+
+DOWNLOAD_CHUNK_SIZE = (1024**2) // 2
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+"Files smaller than this are fetched in one stream"
+MAX_SEGMENTS = 4
+SEGMENT_RETRIES = 5
+"Tries per segment. Each one resumes where the last stopped"
+STATE_SAVE_INTERVAL = 4 * 1024 * 1024
+"Bytes written between saves of the .part state, which is what resuming uses"
+DOWNLOAD_TIMEOUT = httpx.Timeout(30.0, read=60.0)
+"Not None, so a stalled connection fails and gets resumed instead of hanging"
+DOWNLOAD_CACHE_DIR = root_folder(outside_internal=True) / "downloads"
+"Where download_to_tempfile keeps .part files, so a retry resumes them"
+DOWNLOAD_CACHE_MAX_AGE = 7 * 24 * 3600
+"Seconds before an abandoned .part file there is deleted"
+_download_locks: dict[Path, threading.Lock] = {}
+"One per path in DOWNLOAD_CACHE_DIR. Background syncs fetch the same URLs"
+_download_locks_guard = threading.Lock()
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _RangeNotSupported(Exception):
+    pass
+
+
+class _ShortSegment(Exception):
+    "The server closed a segment's stream before sending all of it"
+
+
+class _RemoteFile(NamedTuple):
+    size: Optional[int]
+    ranges: bool
+    "Whether the server answers Range requests with 206"
+    validator: Optional[str]
+    "ETag or Last-Modified, to tell if a .part file is of the same file"
+
+
+def _remote_file(response: httpx.Response) -> _RemoteFile:
+    """Reads the answer to a request for the first byte. Servers with Range
+    support say the full size in Content-Range, others send the whole file"""
+    validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return _RemoteFile(int(total), True, validator)
+    length = response.headers.get("Content-Length", "")
+    return _RemoteFile(int(length) if length.isdigit() else None, False, validator)
+
+
+def _write_response(response: httpx.Response, part_file: Path, pbar: tqdm) -> bool:
+    """Writes the whole body to `part_file`. Returns False if the connection
+    dropped, so the caller can retry"""
+    try:
+        with part_file.open("wb") as f:
+            for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                f.write(chunk)
+                pbar.update(len(chunk))
+        return True
+    except httpx.HTTPError as e:
+        logger.debug(f"Download failed, retrying: {e!r}")
+        pbar.reset()
+        return False
+
+
+def _split(size: int, segments: int) -> list[list[int]]:
+    """[start, end (inclusive), bytes done] per segment"""
+    count = max(1, min(segments, size // SEGMENT_MIN_SIZE))
+    step = -(-size // count)
+    return [[x, min(x + step, size) - 1, 0] for x in range(0, size, step)]
+
+
+def _load_state(state_file: Path, part_file: Path, url: str, remote: _RemoteFile) -> Optional[list[list[int]]]:
+    """The segments of a previous attempt, if it was of the same file"""
+    try:
+        state = json.loads(state_file.read_text(encoding="utf-8"))
+        if (
+            state.get("url") == url
+            and state.get("size") == remote.size
+            and state.get("validator") == remote.validator
+            and part_file.stat().st_size == remote.size
+        ):
+            return state["segments"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def download_file(
     url: str,
+    path: Path,
     headers: Optional[dict[str, str]] = None,
     params: Optional[dict[str, str]] = None,
-    chunk_size: int = (1024**2) // 2,
-) -> Generator[Union["_TemporaryFileWrapper[bytes]", None], None, None]:
-    """Downloads and yields a tempfile, Defaults to 0.5MiB for chunk size"""
-    temp_f = TemporaryFile()
+    sha256: Optional[str] = None,
+    segments: int = MAX_SEGMENTS,
+    quiet: bool = False,
+) -> Path:
+    """
+    Downloads `url` to `path`. Large files are fetched in parallel Range
+    segments into `path.part`, which survives interruptions and is resumed by
+    the next call. The length and `sha256` (if given) are checked before the
+    file is renamed into place. Servers without Range support get a single
+    stream that restarts from zero on a drop.
+
+    Raises:
+        DownloadError: If the download failed, didn't verify, or couldn't be
+            written. The .part file is kept to resume from, unless it's what
+            failed to verify
+    """
     try:
-        with httpx.stream(
-            "GET",
-            url,
-            headers=headers,
-            params=params,
-            follow_redirects=True,
-            timeout=None,
-        ) as response:
+        return _download_file(url, path, headers, params, sha256, segments, quiet)
+    except OSError as e:
+        raise DownloadError(f"Couldn't write {path.name}: {e!r}") from e
 
+
+def _download_file(
+    url: str,
+    path: Path,
+    headers: Optional[dict[str, str]],
+    params: Optional[dict[str, str]],
+    sha256: Optional[str],
+    segments: int,
+    quiet: bool,
+) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part_file = path.with_name(path.name + ".part")
+    state_file = path.with_name(path.name + ".part.json")
+    with httpx.Client(
+        headers=headers, follow_redirects=True, timeout=DOWNLOAD_TIMEOUT
+    ) as client, tqdm(
+        desc="Downloading",
+        unit="B",
+        unit_scale=True,
+        unit_divisor=1024,
+        miniters=1,
+        disable=quiet,
+    ) as pbar:
+        try:
+            with client.stream(
+                "GET", url, params=params, headers={"Range": "bytes=0-0"}
+            ) as response:
+                response.raise_for_status()
+                remote = _remote_file(response)
+                logger.debug(f"Downloading {url}: {remote}")
+                pbar.total = remote.size
+                pbar.refresh()
+                # Without Range support this is already the whole file, so
+                # read it instead of asking again
+                done = response.status_code == 200 and _write_response(
+                    response, part_file, pbar
+                )
+        except httpx.HTTPError as e:
+            raise DownloadError(f"Couldn't reach {url}: {e!r}") from e
+        if not done:
+            if remote.ranges and remote.size:
+                try:
+                    _download_segments(
+                        client, url, params, part_file, state_file, remote, segments, pbar
+                    )
+                    done = True
+                except _RangeNotSupported:
+                    logger.debug("Server stopped honoring Range, downloading in one stream")
+                    pbar.reset()
+        if not done:
+            _download_stream(client, url, params, part_file, pbar)
+
+    size = part_file.stat().st_size
+    if remote.size is not None and size != remote.size:
+        part_file.unlink(missing_ok=True)
+        state_file.unlink(missing_ok=True)
+        raise DownloadError(f"Expected {remote.size} bytes, got {size}")
+    if sha256:
+        digest = hashlib.sha256()
+        with part_file.open("rb") as f:
+            while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+        if digest.hexdigest().lower() != sha256.lower():
+            part_file.unlink(missing_ok=True)
+            state_file.unlink(missing_ok=True)
+            raise DownloadError(f"SHA-256 mismatch for {path.name}")
+    part_file.replace(path)
+    state_file.unlink(missing_ok=True)
+    return path
+
+
+def _download_segments(
+    client: httpx.Client,
+    url: str,
+    params: Optional[dict[str, str]],
+    part_file: Path,
+    state_file: Path,
+    remote: _RemoteFile,
+    segments: int,
+    pbar: tqdm,
+):
+    assert remote.size is not None
+    ranges = _load_state(state_file, part_file, url, remote)
+    if ranges is None:
+        ranges = _split(remote.size, segments)
+        with part_file.open("wb") as f:
+            f.truncate(remote.size)
+    else:
+        logger.debug(f"Resuming {part_file.name}")
+    pbar.update(sum(x[2] for x in ranges))
+    lock = threading.Lock()
+    unsaved = 0
+
+    def save_state():
+        state = {"url": url, "size": remote.size, "validator": remote.validator, "segments": ranges}
+        temp_file = state_file.with_suffix(".tmp")
+        temp_file.write_text(json.dumps(state), encoding="utf-8")
+        temp_file.replace(state_file)
+
+    def fetch(segment: list[int]):
+        nonlocal unsaved
+        start, end, _ = segment
+        for attempt in range(1, SEGMENT_RETRIES + 1):
+            offset = start + segment[2]
+            if offset > end:
+                return
+            request_headers = {"Range": f"bytes={offset}-{end}"}
+            if remote.validator:
+                request_headers["If-Range"] = remote.validator
             try:
-                total = int(response.headers.get("Content-Length", "0"))
-            except Exception as e:
-                print(f"Could not parse Content-Length header: {e}")
-                total = 0
-            logger.debug(f"Total size is {total}")
-            with tqdm(
-                desc="Downloading",
-                total=total,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                miniters=1,
-            ) as pbar:
-                for chunk in response.iter_bytes(chunk_size=chunk_size):
-                    temp_f.write(chunk)
-                    pbar.update(len(chunk))
-        temp_f.seek(0)
-        yield temp_f
-    except httpx.HTTPError as e:
-        print(f"Network error: {repr(e)}")
-        yield None
+                with client.stream(
+                    "GET", url, params=params, headers=request_headers
+                ) as response, part_file.open("r+b", buffering=0) as f:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise _RangeNotSupported()
+                    f.seek(offset)
+                    for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        chunk = chunk[: end + 1 - start - segment[2]]
+                        f.write(chunk)
+                        with lock:
+                            segment[2] += len(chunk)
+                            pbar.update(len(chunk))
+                            unsaved += len(chunk)
+                            if unsaved >= STATE_SAVE_INTERVAL:
+                                # Unbuffered, so what's counted is in the file
+                                save_state()
+                                unsaved = 0
+                if start + segment[2] > end:
+                    return
+                raise _ShortSegment(f"{end + 1 - start - segment[2]} bytes missing")
+            except (httpx.HTTPError, _ShortSegment) as e:
+                logger.debug(f"Segment {start}-{end} failed ({attempt}/{SEGMENT_RETRIES}): {e!r}")
+                if attempt == SEGMENT_RETRIES:
+                    raise
+                time.sleep(min(2**attempt, 30))
+
+    save_state()
+    try:
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            for future in [executor.submit(fetch, x) for x in ranges]:
+                future.result()
+    except (httpx.HTTPError, _ShortSegment) as e:
+        raise DownloadError(f"Download failed, it will resume from here next time: {e!r}") from e
     finally:
-        temp_f.close()
+        with lock:
+            save_state()
+    # The .part is preallocated, so its size says nothing about holes
+    incomplete = [x for x in ranges if x[2] != x[1] - x[0] + 1]
+    if incomplete:
+        raise DownloadError(f"{len(incomplete)} segment(s) incomplete, it will resume next time")
+
+
+def _download_stream(
+    client: httpx.Client,
+    url: str,
+    params: Optional[dict[str, str]],
+    part_file: Path,
+    pbar: tqdm,
+):
+    for attempt in range(1, SEGMENT_RETRIES + 1):
+        try:
+            with client.stream("GET", url, params=params) as response, part_file.open("wb") as f:
+                response.raise_for_status()
+                for chunk in response.iter_bytes(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    f.write(chunk)
+                    pbar.update(len(chunk))
+            return
+        except httpx.HTTPError as e:
+            logger.debug(f"Download failed ({attempt}/{SEGMENT_RETRIES}): {e!r}")
+            if attempt == SEGMENT_RETRIES or (
+                isinstance(e, httpx.HTTPStatusError) and e.response.status_code < 500
+            ):
+                raise DownloadError(f"Download failed: {e!r}") from e
+            pbar.reset()
+            time.sleep(min(2**attempt, 30))
+
+
+@contextmanager
+def download_to_tempfile(
+    url: str,
+    headers: Optional[dict[str, str]] = None,
+    params: Optional[dict[str, str]] = None,
+) -> Generator[Union[BinaryIO, None], None, None]:
+    """Downloads (see download_file) and yields the file, or None on error.
+    The file is deleted afterwards. A failed download leaves its .part in
+    DOWNLOAD_CACHE_DIR, named after the URL, for the next call to resume"""
+    _prune_download_cache()
+    key = json.dumps([url, sorted((params or {}).items())])
+    path = DOWNLOAD_CACHE_DIR / hashlib.sha256(key.encode()).hexdigest()[:32]
+    with _download_locks_guard:
+        lock = _download_locks.setdefault(path, threading.Lock())
+    # Held until the file is deleted, so a second caller never writes into
+    # the .part or the file the first one is still reading
+    with lock:
+        try:
+            download_file(url, path, headers, params)
+        except DownloadError as e:
+            print(f"Network error: {e}")
+            yield None
+            return
+        try:
+            with path.open("rb") as f:
+                yield f
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def _prune_download_cache():
+    """Deletes .part files nobody came back for"""
+    cutoff = time.time() - DOWNLOAD_CACHE_MAX_AGE
+    try:
+        for file in DOWNLOAD_CACHE_DIR.iterdir():
+            if file.stat().st_mtime < cutoff:
+                file.unlink(missing_ok=True)
+    except OSError:
+        pass
 
 
 def download_to_path(
     url: str,
     path: Path,
     headers: Optional[dict[str, str]] = None,
-    chunk_size: int = (1024**2) // 2,
+    sha256: Optional[str] = None,
 ) -> bool:
-    """Download url to the given path. Shows progress with tqdm. Returns True on success."""
+    """Download url to the given path (see download_file). Shows progress
+    with tqdm. Returns True on success."""
     try:
-        path = Path(path)
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with httpx.stream(
-            "GET",
-            url,
-            headers=headers or {},
-            follow_redirects=True,
-            timeout=None,
-        ) as response:
-            response.raise_for_status()
-            try:
-                total = int(response.headers.get("Content-Length", "0"))
-            except (ValueError, TypeError):
-                total = 0
-            with path.open("wb") as f, tqdm(
-                desc="Downloading",
-                total=total or None,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                miniters=1,
-            ) as pbar:
-                for chunk in response.iter_bytes(chunk_size=chunk_size):
-                    f.write(chunk)
-                    pbar.update(len(chunk))
+        download_file(url, Path(path), headers, sha256=sha256)
         return True
-    except httpx.HTTPError as e:
-        print(f"Download error: {repr(e)}")
+    except DownloadError as e:
+        print(f"Download error: {e}")
         return False
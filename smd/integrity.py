@@ -1,15 +1,30 @@
 """Integrity Verification for SMD"""
 
 import hashlib
+import json
 import logging
+import mmap
+import os
 import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Optional, Tuple
+
+from smd.manifest.format import PROTOBUF_PAYLOAD_MAGIC, read_layout, read_metadata
+from smd.steam_tools_compat import CONFIG_DEPOTCACHE_SUBDIR
+from smd.utils import root_folder
 
 logger = logging.getLogger(__name__)
 
-# Steam manifest magic bytes
-MANIFEST_MAGIC = b'\x27\x44\x56\x01'  # Steam depot manifest signature
+# Every depotcache manifest starts with the payload section header
+MANIFEST_MAGIC = struct.pack("<I", PROTOBUF_PAYLOAD_MAGIC)
+
+VERIFY_CACHE_FILE = root_folder(outside_internal=True) / "depotcache_verify.json"
+MMAP_THRESHOLD = 4 * 1024 * 1024
+"Payloads at least this big are checksummed through mmap instead of read()"
+READ_SIZE = 1024 * 1024
 
 
 class IntegrityVerifier:
@@ -83,7 +98,7 @@ class IntegrityVerifier:
         try:
             hash_obj = hashlib.new(algorithm)
             with file_path.open("rb") as f:
-                while chunk := f.read(8192):
+                while chunk := f.read(READ_SIZE):
                     hash_obj.update(chunk)
             return hash_obj.hexdigest()
         except Exception as e:
@@ -133,19 +148,12 @@ class IntegrityVerifier:
         """
         try:
             with file_path.open("rb") as f:
-                # Check magic bytes
-                magic = f.read(4)
-                if magic != MANIFEST_MAGIC:
-                    return False
-                
-                # Try to read some basic structure
-                # This is a simplified check - full parsing would be more complex
-                data = f.read(100)
-                if len(data) < 20:
-                    logger.error(f"Manifest file too small: {file_path.name}")
-                    return False
-            
+                # Walks every section header, seeking past the contents
+                read_layout(f)
             return True
+        except ValueError as e:
+            logger.error(f"Invalid manifest structure in {file_path.name}: {e}")
+            return False
         except Exception as e:
             logger.error(f"Failed to parse manifest: {e}")
             return False
@@ -207,3 +215,147 @@ class IntegrityVerifier:
                 logger.warning(f"Deleted corrupted file: {file_path.name}")
             except Exception as e:
                 logger.error(f"Failed to delete corrupted file: {e}")
+
+
+@dataclass
+class ManifestCheck:
+    """Result of verifying one manifest file"""
+    path: Path
+    ok: bool
+    message: str
+    cached: bool = False
+    "True if the file hadn't changed and the previous result was reused"
+
+
+def verify_manifest_crc(file_path: Path) -> Tuple[bool, str]:
+    """
+    Checks a manifest's section headers, then its payload against the
+    CRC-32 stored in the metadata (over the length field + payload)
+
+    Args:
+        file_path: Path to manifest file
+
+    Returns:
+        Tuple of (success, message)
+    """
+    try:
+        with file_path.open("rb") as f:
+            layout = read_layout(f)
+            metadata = read_metadata(f, layout)
+            # The CRC covers the payload's 4-byte length field too
+            start, end = layout.payload_offset - 4, layout.payload_offset + layout.payload_length
+            if layout.payload_length >= MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    view = memoryview(mm)
+                    try:
+                        crc = zlib.crc32(view[start:end])
+                    finally:
+                        view.release()
+            else:
+                f.seek(start)
+                crc = zlib.crc32(f.read(end - start))
+    except ValueError as e:
+        return False, str(e)
+    except OSError as e:
+        return False, f"Could not read file: {e}"
+    except Exception as e:
+        return False, f"Metadata doesn't parse: {e}"
+
+    if metadata.filenames_encrypted:
+        # Encrypted payloads carry their own CRC. Accepting crc_clear too
+        # covers manifests written by tools that only fill that one in
+        expected = {metadata.crc_encrypted, metadata.crc_clear}
+    else:
+        expected = {metadata.crc_clear}
+    if crc not in expected:
+        return False, (
+            f"CRC mismatch: payload is {crc:08x}, metadata says "
+            f"{', '.join(f'{x:08x}' for x in sorted(expected))}"
+        )
+    return True, "OK"
+
+
+class DepotcacheVerifier:
+    """Verifies every manifest in depotcache and config/depotcache.
+    Results are remembered by (size, mtime, inode), so repeat runs only
+    read files that changed"""
+
+    def __init__(self, steam_path: Path, cache_file: Path = VERIFY_CACHE_FILE):
+        self.steam_path = steam_path
+        self.cache_file = cache_file
+        self._cache: dict[str, list[Any]] = self._load_cache()
+
+    @property
+    def folders(self) -> list[Path]:
+        return [
+            self.steam_path / "depotcache",
+            self.steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR),
+        ]
+
+    def _load_cache(self) -> dict[str, list[Any]]:
+        try:
+            if self.cache_file.exists():
+                with self.cache_file.open("r", encoding="utf-8") as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Verification cache is unreadable, starting over: {e}")
+        return {}
+
+    def _save_cache(self):
+        try:
+            temp_file = self.cache_file.with_suffix(".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump(self._cache, f)
+            temp_file.replace(self.cache_file)
+        except OSError as e:
+            logger.error(f"Failed to save verification cache: {e}", exc_info=True)
+
+    @staticmethod
+    def _file_key(stat: os.stat_result) -> list[int]:
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def verify_all(self, workers: Optional[int] = None) -> list[ManifestCheck]:
+        """
+        Verifies every .manifest in both depotcache folders
+
+        Args:
+            workers: Threads used for checksumming (zlib releases the GIL)
+
+        Returns:
+            One ManifestCheck per file, sorted by path
+        """
+        files = [
+            file for folder in self.folders if folder.exists()
+            for file in folder.glob("*.manifest")
+        ]
+        results: list[ManifestCheck] = []
+        to_check: list[tuple[Path, list[int]]] = []
+        for file in files:
+            try:
+                key = self._file_key(file.stat())
+            except OSError as e:
+                results.append(ManifestCheck(file, False, f"Could not stat file: {e}"))
+                continue
+            cached = self._cache.get(str(file))
+            if cached is not None and cached[:3] == key:
+                results.append(ManifestCheck(file, cached[3], cached[4], cached=True))
+            else:
+                to_check.append((file, key))
+
+        logger.debug(
+            f"Verifying {len(to_check)} manifest(s), "
+            f"{len(results)} unchanged since last time"
+        )
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            checked = executor.map(lambda x: verify_manifest_crc(x[0]), to_check)
+            for (file, key), (ok, message) in zip(to_check, checked):
+                results.append(ManifestCheck(file, ok, message))
+                self._cache[str(file)] = [*key, ok, message]
+
+        # Forget files that are gone
+        present = {str(x) for x in files}
+        self._cache = {k: v for k, v in self._cache.items() if k in present}
+        self._save_cache()
+
+        results.sort(key=lambda x: str(x.path))
+        return results
@@ -5,7 +5,7 @@ import logging
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Set
+from typing import TYPE_CHECKING, List, Optional, Set
 
 from colorama import Fore, Style
 
@@ -13,6 +13,9 @@ from smd.storage.acf import ACFParser
 from smd.storage.vdf import get_steam_libs
 from smd.progress import create_progress_bar
 
+if TYPE_CHECKING:
+    from smd.lua.catalog import LuaCatalog
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,7 +35,13 @@ class GameInfo:
 class LibraryScanner:
     """Scans Steam library for installed games and manifest status"""
     
-    def __init__(self, steam_path: Path, lua_backup_path: Path, applist_folder: Optional[Path] = None):
+    def __init__(
+        self,
+        steam_path: Path,
+        lua_backup_path: Path,
+        applist_folder: Optional[Path] = None,
+        lua_catalog: Optional["LuaCatalog"] = None,
+    ):
         """
         Initialize library scanner
         
@@ -40,10 +49,18 @@ class LibraryScanner:
             steam_path: Path to Steam installation
             lua_backup_path: Path to lua backup directory
             applist_folder: Path to GreenLuma AppList folder (optional)
+            lua_catalog: Catalog of the lua backup directory (optional)
         """
         self.steam_path = steam_path
         self.lua_backup_path = lua_backup_path
         self.applist_folder = applist_folder
+        self.lua_catalog = lua_catalog
+    
+    def _has_lua_backup(self, app_id: int) -> bool:
+        """Whether there's a usable lua backup for the app"""
+        if self.lua_catalog is not None:
+            return self.lua_catalog.for_app(app_id) is not None
+        return (self.lua_backup_path / f"{app_id}.lua").exists()
     
     def _get_applist_ids(self) -> Set[int]:
         """
@@ -209,8 +226,7 @@ class LibraryScanner:
                     continue
                 
                 # Check if lua backup exists
-                lua_backup_file = self.lua_backup_path / f"{app_id}.lua"
-                has_lua_backup = lua_backup_file.exists()
+                has_lua_backup = self._has_lua_backup(app_id)
                 
                 # Check if in AppList
                 in_applist = app_id in applist_ids
@@ -254,8 +270,7 @@ class LibraryScanner:
             
             for app_id in orphaned_ids:
                 # Check if lua backup exists
-                lua_backup_file = self.lua_backup_path / f"{app_id}.lua"
-                has_lua_backup = lua_backup_file.exists()
+                has_lua_backup = self._has_lua_backup(app_id)
                 
                 game_info = GameInfo(
                     app_id=app_id,
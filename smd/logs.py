@@ -0,0 +1,122 @@
+"""Logging setup for the smd logger.
+
+Records go through a queue to a background thread that formats and writes
+them, so a log call on a hot path costs an enqueue, not a disk write. The
+file rotates by size, and messages longer than MAX_MESSAGE_CHARS are cut,
+so a multi-megabyte response can't bloat the log. Records are formatted on
+the writer thread, which means `logger.debug("... %s", big_thing)` never
+builds the string if nobody writes it. JSON lines (`--log-json`) are for
+feeding logs into other tools.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+from pathlib import Path
+from typing import Any, Optional
+
+LOG_FORMAT = "%(asctime)s::%(name)s::%(levelname)s::%(message)s"
+DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+"Rotated files kept, as debug.log.1 to debug.log.3"
+MAX_MESSAGE_CHARS = 4000
+
+
+def truncate(text: str, limit: int = MAX_MESSAGE_CHARS, keep_end: bool = False) -> str:
+    """
+    Args:
+        keep_end: Cut the start instead, for tracebacks, where the
+            exception itself is on the last line
+    """
+    if len(text) <= limit:
+        return text
+    if keep_end:
+        return f"({len(text) - limit} more chars) ...{text[-limit:]}"
+    return f"{text[:limit]}... ({len(text) - limit} more chars)"
+
+
+class TruncatingFormatter(logging.Formatter):
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = truncate(record.message)
+        return super().formatMessage(record)
+
+    def formatException(self, ei: Any) -> str:
+        return truncate(super().formatException(ei), keep_end=True)
+
+    def formatStack(self, stack_info: str) -> str:
+        return truncate(super().formatStack(stack_info), keep_end=True)
+
+    def format(self, record: logging.LogRecord) -> str:
+        # format() caches the traceback on the record, and another handler's
+        # formatter may have cached the full one already
+        cached = record.exc_text
+        if cached:
+            record.exc_text = None if record.exc_info else truncate(cached, keep_end=True)
+        try:
+            return super().format(record)
+        finally:
+            record.exc_text = cached
+
+
+class JSONLinesFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": truncate(record.getMessage()),
+        }
+        if record.exc_info:
+            entry["exception"] = truncate(
+                self.formatException(record.exc_info), keep_end=True
+            )
+        elif record.exc_text:
+            entry["exception"] = truncate(record.exc_text, keep_end=True)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler formats records before queueing them, so they can be
+    pickled. This queue never leaves the process, so formatting is left to
+    the writer thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop(listener: logging.handlers.QueueListener):
+    try:
+        listener.stop()
+    except AttributeError:
+        pass  # Already stopped
+
+
+def setup_logging(
+    log_file: Path,
+    json_lines: bool = False,
+    logger_name: str = "smd",
+    max_bytes: int = MAX_LOG_BYTES,
+    backups: int = LOG_BACKUPS,
+) -> logging.handlers.QueueListener:
+    """Sends the logger's records to a size-rotated file through a
+    background thread, which is flushed and stopped at exit"""
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backups, encoding="utf-8"
+    )
+    file_handler.setFormatter(
+        JSONLinesFormatter() if json_lines else TruncatingFormatter(LOG_FORMAT, DATE_FORMAT)
+    )
+    log_queue: "queue.SimpleQueue[Optional[logging.LogRecord]]" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(LazyQueueHandler(log_queue))
+    listener.start()
+    atexit.register(_stop, listener)
+    return listener
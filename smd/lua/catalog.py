@@ -0,0 +1,259 @@
+"""Catalog of the luas in saved_lua, with what each one provides.
+
+Every lua's hash, app ID, depot keys and pinned manifests are kept in a table
+that's saved between runs. Refreshing only stats the folder: files whose size
+and mtime didn't change aren't read, and files that were touched but hash the
+same aren't parsed again. Lookups by app, depot or key need no file I/O: they
+don't refresh (except the first), so call `refresh` once per operation.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple, Optional, Union
+
+import msgpack  # type: ignore
+
+from smd.lua.parser import LuaDirectives, parse_directives, to_parsed_info
+from smd.storage.packed import load_packed
+from smd.structs import LuaParsedInfo
+from smd.utils import root_folder
+
+if TYPE_CHECKING:
+    from smd.manifest.index import ManifestIndex
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = root_folder(outside_internal=True) / "lua_catalog.bin"
+CATALOG_VERSION = 2
+"Bump when parsing changes, so records are parsed again"
+
+
+class LuaRecord(NamedTuple):
+    path: str
+    file_size: int
+    mtime_ns: int
+    sha256: str
+    app_ids: list[str]
+    "Every addappid ID, in order. The first one is the app"
+    keys: dict[str, str]
+    "Depot ID -> decryption key"
+    manifests: dict[str, str]
+    "Depot ID -> pinned manifest ID"
+
+    @property
+    def app_id(self) -> Optional[str]:
+        return self.app_ids[0] if self.app_ids else None
+
+    @property
+    def usable(self) -> bool:
+        """Whether SMD can download with it (has an app ID and a key)"""
+        return bool(self.app_ids and self.keys)
+
+    def directives(self) -> LuaDirectives:
+        return LuaDirectives(self.app_ids, self.keys, self.manifests, {}, [])
+
+
+class LuaCatalog:
+    """In-memory table of every lua in one folder"""
+
+    def __init__(self, folder: Path, catalog_file: Path = CATALOG_FILE):
+        self.folder = folder
+        self.catalog_file = catalog_file
+        self.records: dict[str, LuaRecord] = {}
+        "Path -> record"
+        self._by_app: dict[str, list[LuaRecord]] = {}
+        self._by_depot: dict[str, list[LuaRecord]] = {}
+        self._by_key: dict[str, list[LuaRecord]] = {}
+        self._lock = threading.RLock()
+        self._refreshed = False
+        self.load()
+
+    def load(self):
+        data = load_packed(self.catalog_file, "Lua catalog")
+        if data is None:
+            return
+        if data.get("version") != CATALOG_VERSION or data.get("folder") != str(self.folder):
+            return
+        with self._lock:
+            self.records = {x[0]: LuaRecord(*x) for x in data.get("rows", [])}
+            self._rebuild_lookup()
+
+    def save(self):
+        data = {
+            "version": CATALOG_VERSION,
+            "folder": str(self.folder),
+            "rows": [list(x) for x in self.records.values()],
+        }
+        try:
+            temp_file = self.catalog_file.with_suffix(".tmp")
+            with temp_file.open("wb") as f:
+                f.write(msgpack.packb(data))  # type: ignore
+            temp_file.replace(self.catalog_file)
+        except OSError as e:
+            logger.error(f"Failed to save lua catalog: {e}", exc_info=True)
+
+    def _rebuild_lookup(self):
+        # Built aside and swapped in, so lookups never see them half-built
+        by_app: dict[str, list[LuaRecord]] = {}
+        by_depot: dict[str, list[LuaRecord]] = {}
+        by_key: dict[str, list[LuaRecord]] = {}
+        for record in self.records.values():
+            if record.app_id is not None:
+                by_app.setdefault(record.app_id, []).append(record)
+            for depot_id in record.app_ids:
+                by_depot.setdefault(depot_id, []).append(record)
+            for key in record.keys.values():
+                by_key.setdefault(key.lower(), []).append(record)
+        # {app_id}.lua is the backup SMD itself keeps, prefer it
+        for app_id, records in by_app.items():
+            records.sort(key=lambda x: Path(x.path).stem != app_id)
+        self._by_app, self._by_depot, self._by_key = by_app, by_depot, by_key
+
+    @staticmethod
+    def read_record(
+        path: Path, stat: os.stat_result, cached: Optional[LuaRecord] = None
+    ) -> Optional[LuaRecord]:
+        """Builds a record from the file. Reuses `cached` if the hash is the
+        same instead of parsing again. None if it can't be read"""
+        try:
+            data = path.read_bytes()
+        except OSError as e:
+            logger.debug(f"Not cataloging {path.name}: {e}")
+            return None
+        sha256 = hashlib.sha256(data).hexdigest()
+        if cached is not None and cached.sha256 == sha256:
+            return cached._replace(file_size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        try:
+            directives = parse_directives(data.decode("utf-8"))
+        except UnicodeDecodeError:
+            directives = LuaDirectives([], {}, {}, {}, [])
+        return LuaRecord(
+            str(path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            sha256,
+            directives.app_ids,
+            directives.keys,
+            directives.manifests,
+        )
+
+    def refresh(self) -> bool:
+        """Brings the catalog up to date. Returns True if anything changed"""
+        with self._lock:
+            self._refreshed = True
+            seen: set[str] = set()
+            changed = 0
+            if self.folder.exists():
+                for dir_entry in os.scandir(self.folder):
+                    if not dir_entry.name.endswith(".lua") or not dir_entry.is_file():
+                        continue
+                    path = str(self.folder / dir_entry.name)
+                    seen.add(path)
+                    if self._update(path, dir_entry.stat()):
+                        changed += 1
+            removed = [x for x in self.records if x not in seen]
+            for path in removed:
+                del self.records[path]
+            if not changed and not removed:
+                return False
+            logger.debug(
+                f"Cataloged {self.folder}: {changed} new or changed, {len(removed)} removed"
+            )
+            self._rebuild_lookup()
+            self.save()
+            return True
+
+    def _update(self, path: str, stat: os.stat_result) -> bool:
+        """Returns True if the record changed"""
+        cached = self.records.get(path)
+        if (
+            cached is not None
+            and cached.file_size == stat.st_size
+            and cached.mtime_ns == stat.st_mtime_ns
+        ):
+            return False
+        record = self.read_record(Path(path), stat, cached)
+        if record is None:
+            return self.records.pop(path, None) is not None
+        self.records[path] = record
+        return True
+
+    def get(self, path: Path) -> Optional[LuaRecord]:
+        """The up-to-date record of a lua in the folder. None if it isn't one"""
+        if path.suffix != ".lua" or path.parent.resolve() != self.folder.resolve():
+            return None
+        key = str(self.folder / path.name)
+        with self._lock:
+            try:
+                stat = os.stat(key)
+            except OSError:
+                if self.records.pop(key, None) is not None:
+                    self._rebuild_lookup()
+                    self.save()
+                return None
+            if self._update(key, stat):
+                self._rebuild_lookup()
+                self.save()
+            return self.records.get(key)
+
+    def parse(self, contents: str, path: Path) -> Optional[LuaParsedInfo]:
+        """Like parse_lua_contents, but uses the catalog for luas in the
+        folder, which are only parsed if they changed"""
+        record = self.get(path)
+        if record is None:
+            return to_parsed_info(parse_directives(contents), path, contents)
+        return to_parsed_info(record.directives(), path, contents)
+
+    def _ensure_loaded(self):
+        """Lookups only refresh if nothing did yet. Callers looping over many
+        lookups refresh once up front instead"""
+        if not self._refreshed:
+            self.refresh()
+
+    def for_app(self, app_id: Union[int, str]) -> Optional[LuaRecord]:
+        """The usable lua of an app, preferring `{app_id}.lua`"""
+        self._ensure_loaded()
+        for record in self._by_app.get(str(app_id), []):
+            if record.usable:
+                return record
+        return None
+
+    def providers_of(self, depot_id: Union[int, str]) -> list[LuaRecord]:
+        """Luas that add this depot, keyed ones first"""
+        self._ensure_loaded()
+        depot_id = str(depot_id)
+        records = self._by_depot.get(depot_id, [])
+        return sorted(records, key=lambda x: depot_id not in x.keys)
+
+    def sharing_key(self, key: str) -> list[LuaRecord]:
+        """Luas that have this depot decryption key"""
+        self._ensure_loaded()
+        return list(self._by_key.get(key.lower(), []))
+
+    def stale(self, manifest_index: "ManifestIndex") -> list[LuaRecord]:
+        """Luas with a pinned manifest that isn't in depotcache"""
+        self._ensure_loaded()
+        return [
+            x for x in self.records.values()
+            if x.manifests and manifest_index.stale_depots(x.manifests)  # type: ignore
+        ]
+
+    def app_ids(self) -> list[str]:
+        """Apps that have a usable lua"""
+        self._ensure_loaded()
+        return [k for k, v in self._by_app.items() if any(x.usable for x in v)]
+
+
+# Global catalog instance
+_lua_catalog: Optional[LuaCatalog] = None
+
+
+def get_lua_catalog(folder: Path) -> LuaCatalog:
+    """Get or create the global catalog for this folder"""
+    global _lua_catalog
+    if _lua_catalog is None or _lua_catalog.folder != folder:
+        _lua_catalog = LuaCatalog(folder)
+    return _lua_catalog
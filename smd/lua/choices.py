@@ -1,13 +1,11 @@
-import json
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Optional
+from typing import Optional
 
 from colorama import Fore, Style
 
-from smd.fzf import run_fzf
-from smd.http_utils import download_to_tempfile
+from smd.app_catalog import get_app_catalog
 from smd.lua.endpoints import get_morrenus, get_oureverday
 from smd.prompts import prompt_confirm, prompt_file, prompt_select, prompt_text
 from smd.storage.settings import get_setting, set_setting
@@ -21,7 +19,6 @@ from smd.structs import (
     OSType,
     Settings,
 )
-from smd.utils import enter_path, root_folder
 from smd.zip import read_lua_from_zip
 
 
@@ -76,16 +73,19 @@ def add_new_lua(file: Optional[Path] = None) -> LuaResult:
     return LuaResult(lua_path, None, LuaChoiceReturnCode.LOOP)
 
 
-def search_game(os_type: OSType) -> Optional[str]:
-    """Using fzf, lets a user search for a game, then returns game ID"""
-    all_games_file = (root_folder() / "all_games.txt")
-    if all_games_file.exists():
-        mtime = all_games_file.stat().st_mtime
-        mtime_str = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %I:%M %p")
+def search_game() -> Optional[str]:
+    """Lets a user search the local app catalog for a game, then returns game ID"""
+    catalog = get_app_catalog()
+    if catalog.apps:
+        synced = (
+            datetime.fromtimestamp(catalog.synced_at).strftime("%Y-%m-%d %I:%M %p")
+            if catalog.synced_at
+            else "never finished"
+        )
         download = prompt_confirm(
             "Do you want to update the list of every Game ID? "
-            f"(Last Modified: {mtime_str})",
-            default=False,
+            f"(Last Updated: {synced})",
+            default=catalog.resume_appid is not None,
         )
     else:
         download = True
@@ -97,37 +97,37 @@ def search_game(os_type: OSType) -> Optional[str]:
                   "You can change this later with your own in settings if you'd like.")
             api_key = STEAM_WEB_API_KEY
             set_setting(Settings.STEAM_WEB_API_KEY, api_key)
-        params: dict[str, str] = {"key": api_key, "max_results": "50000"}
-        games: list[dict[str, Any]] = []
-        print("Steam has limited this endpoint to 50k IDs per requests, so "
-              "it'll be downloading a couple times. Don't be alarmed.")
-        while True:
-            with download_to_tempfile(
-                "https://api.steampowered.com/IStoreService/GetAppList/v1/",
-                params=params
-            ) as tf:
-                if tf is None:
-                    continue
-                resp = json.load(tf)
-            games.extend(enter_path(resp, "response", "apps"))
-            more = enter_path(resp, "response", "have_more_results")
-            if not more:
-                break
-            params['last_appid'] = enter_path(resp, "response", "last_appid")
-        games_str = [
-            x.get("name", "UNKNOWN GAME") + f" [ID={x.get('appid')}]" for x in games
-        ]
-        with all_games_file.open("w", encoding="utf=-8") as f:
-            f.write('\n'.join(games_str))
-    else:
-        games_str = all_games_file
-    selection = run_fzf(games_str, os_type)
-    if selection:
-        match = re.search(r"(?<=\[ID=)\d+(?=\]$)", selection)
-        assert match is not None
-        res = match.group()
-        print(f"{Fore.YELLOW + selection + Style.RESET_ALL} has been selected")
-        return res
+        if not catalog.apps:
+            print("Steam has limited this endpoint to 50k IDs per requests, so "
+                  "it'll be downloading a couple times. Don't be alarmed. "
+                  "Later updates only download what changed.")
+        received = catalog.sync(api_key)
+        if received is None:
+            print(Fore.RED + "Could not update the list of games." + Style.RESET_ALL)
+            if not catalog.apps:
+                return None
+        else:
+            print(f"{received} new or updated games.")
+
+    while True:
+        query = prompt_text("Search for a game. Leave it blank to go back:")
+        if not query.strip():
+            return None
+        matches = catalog.search(query, limit=15)
+        if not matches:
+            print("No games found. Try something else.")
+            continue
+        app_id: Optional[int] = prompt_select(
+            "Choose a game:",
+            [(f"{x.name} [ID={x.app_id}]", x.app_id) for x in matches],
+            cancellable=True,
+        )
+        if app_id is None:
+            continue
+        print(
+            f"{Fore.YELLOW + catalog.apps[app_id] + Style.RESET_ALL} has been selected"
+        )
+        return str(app_id)
 
 
 def download_lua(dest: Path, os_type: OSType) -> LuaResult:
@@ -159,7 +159,7 @@ def download_lua(dest: Path, os_type: OSType) -> LuaResult:
     )
 
     if not app_id:
-        if x := search_game(os_type):
+        if x := search_game():
             app_id = x
         else:
             return LuaResult(None, None, LuaChoiceReturnCode.LOOP)
@@ -1,6 +1,5 @@
 """API endpoints are in here"""
 
-import asyncio
 import io
 import json
 import logging
@@ -9,6 +8,7 @@ from typing import Optional
 
 from colorama import Fore, Style
 
+from smd.event_loop import run_sync
 from smd.http_utils import download_to_tempfile, get_request
 from smd.prompts import prompt_confirm, prompt_secret
 from smd.storage.settings import get_setting, set_setting
@@ -19,7 +19,7 @@ logger = logging.getLogger(__name__)
 
 
 def get_oureverday(dest: Path, app_id: str):
-    lua_contents = asyncio.run(
+    lua_contents = run_sync(
         get_request(
             f"https://raw.githubusercontent.com/SteamAutoCracks/ManifestHub/refs/heads/{app_id}/{app_id}.lua"
         )
@@ -52,7 +52,7 @@ def get_morrenus(dest: Path, app_id: str) -> Optional[Path]:
             "Authorization": f"Bearer {morrenus_key}",
         }
 
-        data = asyncio.run(
+        data = run_sync(
             get_request(
                 "https://manifest.morrenus.xyz/api/v1/user/stats",
                 type="json",
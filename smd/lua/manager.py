@@ -1,16 +1,16 @@
 import logging
-import re
 import shutil
 from pathlib import Path
 from typing import Optional
 
 from colorama import Fore, Style
 
+from smd.lua.catalog import get_lua_catalog
 from smd.lua.choices import add_new_lua, download_lua, select_from_saved_luas
+from smd.lua.parser import parse_directives, to_parsed_info
 from smd.prompts import prompt_select
 from smd.storage.named_ids import get_named_ids
 from smd.structs import (
-    DepotKeyPair,
     LuaChoice,
     LuaChoiceReturnCode,
     LuaParsedInfo,
@@ -20,41 +20,40 @@ from smd.structs import (
 
 logger = logging.getLogger(__name__)
 
-# Compiled regexes for Lua parsing (reused across calls)
-_DEPOT_NO_KEY_REGEX = re.compile(
-    r"^\s*addappid\s*\(\s*(\d+)\s*\)", flags=re.MULTILINE
-)
-_DEPOT_DEC_KEY_REGEX = re.compile(
-    r"^\s*addappid\s*\(\s*(\d+)\s*,\s*\d\s*,\s*(?:\"|\')(\S+)(?:\"|\')\s*\)",
-    flags=re.MULTILINE,
-)
-_GENERAL_ADDAPPID_REGEX = re.compile(r"^\s*addappid\s*\(\s*(\d+)", flags=re.MULTILINE)
-
-
 def parse_lua_contents(contents: str, path: Path) -> Optional[LuaParsedInfo]:
     """
     Parse Lua contents into LuaParsedInfo without prompts.
     Returns None if parsing fails (no app ID or no decryption keys).
     """
-    if not (any_addappid := _GENERAL_ADDAPPID_REGEX.search(contents)):
-        return None
-    app_id = any_addappid.group(1)
-    ids_with_no_key = _DEPOT_NO_KEY_REGEX.findall(contents)
-    depot_dec_key = _DEPOT_DEC_KEY_REGEX.findall(contents)
-    if not depot_dec_key:
-        return None
-    depot_pairs = [DepotKeyPair(*x) for x in depot_dec_key]
-    depot_pairs.extend([DepotKeyPair(x, "") for x in ids_with_no_key])
-    return LuaParsedInfo(path, contents, app_id, depot_pairs)
+    return to_parsed_info(parse_directives(contents), path, contents)
+
+
+def backup_lua_to(saved_lua: Path, lua: LuaParsedInfo):
+    """Saves the lua file to the given folder as {app_id}.lua"""
+    saved_lua.mkdir(exist_ok=True)
+    target = saved_lua / f"{lua.app_id}.lua"
+    if lua.path.suffix == ".zip":
+        with target.open("w", encoding="utf-8") as f:
+            f.write(lua.contents)
+    else:
+        try:
+            shutil.copyfile(lua.path, target)
+        except shutil.SameFileError:
+            logger.debug("Skipped backup because it's the same file")
+            pass
 
 
 class LuaManager:
     def __init__(
-        self, os_type: OSType
+        self,
+        os_type: OSType,
+        steam_path: Optional[Path] = None,
+        interactive: bool = True,
     ):
         """Might need refactor. Does I/O on init"""
         self.saved_lua = Path().cwd() / "saved_lua"
-        self.named_ids = get_named_ids(self.saved_lua)
+        self.named_ids = get_named_ids(self.saved_lua, steam_path, interactive)
+        self.catalog = get_lua_catalog(self.saved_lua)
         self.os_type = os_type
 
     def get_raw_lua(
@@ -108,9 +107,9 @@ class LuaManager:
             lua = self.get_raw_lua(choice, override_path)
             if lua is None:
                 continue
-            parsed = parse_lua_contents(lua.contents, lua.path)
+            parsed = self.catalog.parse(lua.contents, lua.path)
             if parsed is None:
-                if not _GENERAL_ADDAPPID_REGEX.search(lua.contents):
+                if not parse_directives(lua.contents).app_ids:
                     print("App ID not found. Try again.")
                 else:
                     print("Decryption keys not found. Try again.")
@@ -120,13 +119,5 @@ class LuaManager:
 
     def backup_lua(self, lua: LuaParsedInfo):
         """Saves the lua file for later use"""
-        target = self.saved_lua / f"{lua.app_id}.lua"
-        if lua.path.suffix == ".zip":
-            with target.open("w", encoding="utf-8") as f:
-                f.write(lua.contents)
-        else:
-            try:
-                shutil.copyfile(lua.path, target)
-            except shutil.SameFileError:
-                logger.debug("Skipped backup because it's the same file")
-                pass
+        backup_lua_to(self.saved_lua, lua)
+        self.catalog.get(self.saved_lua / f"{lua.app_id}.lua")
@@ -0,0 +1,153 @@
+"""Tokenizer for the directives in SteamTools .lua files.
+
+One regex scans the whole file once for calls like `addappid(...)`,
+`setManifestid(...)` or `addtoken(...)`. Arguments may be numbers, single or
+double quoted strings, or bare words. `--` comments, strings, and several
+calls on one line are handled.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+from smd.structs import DepotKeyPair, LuaParsedInfo
+
+logger = logging.getLogger(__name__)
+
+
+class BareWord(str):
+    """An unquoted argument that isn't a number, like `nil` or a variable"""
+
+
+LuaArg = Union[int, str, BareWord]
+
+
+class LuaDirective(NamedTuple):
+    name: str
+    "Lowercased function name, e.g. addappid"
+    args: tuple[LuaArg, ...]
+    """Numbers are ints, quoted strings are the string without quotes,
+    anything else is a BareWord"""
+    line: int
+    "1-based line number"
+
+
+class LuaDirectives(NamedTuple):
+    """The directives of a lua, grouped by what SMD does with them"""
+
+    app_ids: list[str]
+    "Every addappid ID, in order of appearance"
+    keys: dict[str, str]
+    "Depot ID -> decryption key"
+    manifests: dict[str, str]
+    "Depot ID -> manifest ID from setManifestid"
+    tokens: dict[str, str]
+    "App ID -> access token from addtoken"
+    other: list[LuaDirective]
+    "Calls SMD doesn't use"
+
+
+_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*)
+    | "[^"\n]*" | '[^'\n]*'
+    | (?P<name>[A-Za-z_]\w*)\s*\(
+      (?P<args>(?:[^()"'\n]|"[^"\n]*"|'[^'\n]*')*)
+      \)
+    """,
+    re.VERBOSE,
+)
+"One scan finds comments and strings (to skip them) and calls"
+_ARG_RE = re.compile(r"""\s*(?:"([^"]*)"|'([^']*)'|([^,]*?))\s*(?:,|$)""")
+_DEPOT_KEY_RE = re.compile(r"[0-9a-fA-F]{64}")
+"Depot decryption keys are 32 bytes in hex"
+
+
+def _bare(word: str) -> LuaArg:
+    return int(word) if word.isdigit() else BareWord(word)
+
+
+def _parse_args(raw: str) -> tuple[LuaArg, ...]:
+    if not raw.strip():
+        return ()
+    if '"' not in raw and "'" not in raw:
+        return tuple(_bare(x.strip()) for x in raw.split(","))
+    args: list[LuaArg] = []
+    for match in _ARG_RE.finditer(raw):
+        double, single, bare = match.groups()
+        if bare is not None:
+            args.append(_bare(bare))
+        else:
+            args.append(double if double is not None else single)
+        if match.end() == len(raw):
+            break
+    return tuple(args)
+
+
+def tokenize(contents: str) -> list[LuaDirective]:
+    """Every function call in the lua, in order"""
+    directives: list[LuaDirective] = []
+    line = 1
+    last = 0
+    for match in _TOKEN_RE.finditer(contents):
+        name = match.group("name")
+        if name is None:
+            continue
+        line += contents.count("\n", last, match.start())
+        last = match.start()
+        directives.append(
+            LuaDirective(name.lower(), _parse_args(match.group("args")), line)
+        )
+    return directives
+
+
+def parse_directives(contents: str) -> LuaDirectives:
+    """Tokenizes a lua and groups what's in it"""
+    result = LuaDirectives([], {}, {}, {}, [])
+    app_ids: dict[str, None] = {}
+    "Ordered set"
+    for directive in tokenize(contents):
+        args = directive.args
+        if not args or not isinstance(args[0], int):
+            result.other.append(directive)
+            continue
+        target = str(args[0])
+        if directive.name == "addappid":
+            app_ids[target] = None
+            # addappid(id, flag, "key"). Flag can be any number, or missing.
+            # A bare word (nil, a variable) means there's no key
+            key = args[-1] if len(args) >= 2 else None
+            if isinstance(key, str) and not isinstance(key, BareWord):
+                if _DEPOT_KEY_RE.fullmatch(key):
+                    result.keys[target] = key
+                else:
+                    logger.debug(f"Ignoring malformed key of {target} on line {directive.line}")
+        elif directive.name == "setmanifestid" and len(args) >= 2:
+            # setManifestid(depot, "manifest"[, size])
+            manifest_id = str(args[1])
+            if manifest_id.isdigit():
+                result.manifests[target] = manifest_id
+            else:
+                result.other.append(directive)
+        elif directive.name == "addtoken" and len(args) >= 2:
+            result.tokens[target] = str(args[1])
+        else:
+            result.other.append(directive)
+    result.app_ids.extend(app_ids)
+    return result
+
+
+def to_parsed_info(
+    directives: LuaDirectives, path: Path, contents: str
+) -> Optional[LuaParsedInfo]:
+    """None if there's no app ID or no decryption key"""
+    if not directives.app_ids or not directives.keys:
+        return None
+    depot_pairs = [DepotKeyPair(k, v) for k, v in directives.keys.items()]
+    depot_pairs.extend(
+        [DepotKeyPair(x, "") for x in directives.app_ids if x not in directives.keys]
+    )
+    return LuaParsedInfo(
+        path, contents, directives.app_ids[0], depot_pairs, directives.manifests
+    )
@@ -1,13 +1,15 @@
 import shutil
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional
 
 from pathvalidate import sanitize_filename
 
+from smd.backup import get_backup_manager
 from smd.http_utils import get_game_name
 from smd.prompts import prompt_confirm
 from smd.storage.vdf import VDFLoadAndDumper, vdf_dump, vdf_load
-from smd.structs import LuaParsedInfo
+from smd.structs import DepotKeyPair, LuaParsedInfo
 from smd.utils import enter_path
 import logging
 
@@ -18,11 +20,13 @@ logger = logging.getLogger(__name__)
 class ACFWriter:
     steam_lib_path: Path
 
-    def write_acf(self, lua: LuaParsedInfo):
+    def write_acf(self, lua: LuaParsedInfo, overwrite: Optional[bool] = None):
+        """Writes the .acf file. If one already exists, `overwrite` decides
+        what to do with it, or the user gets asked if it's None"""
         acf_file = self.steam_lib_path / f"steamapps/appmanifest_{lua.app_id}.acf"
         do_write_acf = True
         if acf_file.exists():
-            do_write_acf = not prompt_confirm(
+            do_write_acf = overwrite if overwrite is not None else not prompt_confirm(
                 ".acf file found. Are you updating a game you already have installed"
                 " or is this a new installation?",
                 true_msg="I'm updating a game",
@@ -31,7 +35,7 @@ class ACFWriter:
             )
 
         if do_write_acf:
-            app_name = get_game_name(lua.app_id)
+            app_name = get_game_name(lua.app_id, interactive=overwrite is None)
             app_id_str = str(lua.app_id)
             installdir = sanitize_filename(app_name).replace("'", "")
             acf_contents: dict[str, dict[str, str]] = {
@@ -60,10 +64,16 @@ class ConfigVDFWriter:
 
     def add_decryption_keys_to_config(self, lua: LuaParsedInfo):
         """Adds decryption keys from parsed lua to config.vdf"""
+        self.add_decryption_keys(lua.depots)
+
+    def add_decryption_keys(self, depot_pairs: list[DepotKeyPair]):
+        """Adds decryption keys to config.vdf in a single load and dump"""
         vdf_file = self.steam_path / "config/config.vdf"
         shutil.copyfile(vdf_file, (self.steam_path / "config/config.vdf.backup"))
+        # The .backup copy only goes one write back, snapshots keep a few
+        get_backup_manager().create_backup(vdf_file, "config_vdf")
         with VDFLoadAndDumper(vdf_file) as vdf_data:
-            for pair in lua.depots:
+            for pair in depot_pairs:
                 depot_id = pair.depot_id
                 dec_key = pair.decryption_key
                 if dec_key == "":
@@ -0,0 +1,242 @@
+"""Diffs two manifests of the same depot.
+
+Files are matched by their filename hash and compared by content hash.
+Chunks are matched by SHA, so the result includes exactly how many bytes an
+update would download. Mappings are streamed, and only 8-byte hash prefixes
+are kept in memory, so even manifests with hundreds of thousands of files
+diff in bounded memory.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional
+
+from smd.manifest.crypto import decrypt_filename
+from smd.manifest.format import iter_mappings, read_layout, read_metadata
+
+if TYPE_CHECKING:
+    from smd.manifest.index import ManifestIndex
+
+logger = logging.getLogger(__name__)
+
+
+class FileChange(NamedTuple):
+    status: str
+    "One of: added, removed, changed"
+    filename: str
+    old_size: Optional[int]
+    new_size: Optional[int]
+
+
+@dataclass
+class ManifestDiff:
+    """Totals of a diff. Individual files go to the `on_change` callback"""
+
+    depot_id: int
+    old_manifest_id: int
+    new_manifest_id: int
+    added: int = 0
+    removed: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    new_chunks: int = 0
+    "Chunks in the new manifest that the old one doesn't have"
+    download_bytes: int = 0
+    "Compressed size of the new chunks, i.e. what an update downloads"
+    new_chunk_bytes: int = 0
+    "Uncompressed size of the new chunks"
+    old_size: int = 0
+    new_size: int = 0
+
+
+def _prefix(digest: bytes) -> int:
+    """SHA-1 prefixes as ints are far smaller in a set than full digests.
+    64 bits is plenty to keep collisions out of the counts"""
+    return int.from_bytes(digest[:8], "little")
+
+
+def _file_key(mapping) -> int:
+    if mapping.sha_filename:
+        return _prefix(mapping.sha_filename)
+    # Steam hashes the lowercase, backslash-separated name
+    name = mapping.filename.lower().replace("/", "\\").encode("utf-8")
+    return _prefix(hashlib.sha1(name).digest())
+
+
+def _mappings(path: Path) -> Iterator:
+    with path.open("rb") as f:
+        yield from iter_mappings(f, read_layout(f))
+
+
+def diff_manifests(
+    old_path: Path,
+    new_path: Path,
+    on_change: Optional[Callable[[FileChange], None]] = None,
+    dec_key: Optional[str] = None,
+) -> ManifestDiff:
+    """
+    Compares two manifests of the same depot
+
+    Args:
+        old_path: The manifest currently installed
+        new_path: The manifest being updated to
+        on_change: Called with every added, removed or changed file, as found
+        dec_key: Depot decryption key (hex), to report readable filenames
+            for manifests whose filenames are still encrypted
+
+    Returns:
+        ManifestDiff: Counts and byte totals
+
+    Raises:
+        ValueError: If either file isn't a manifest, or they're different depots
+    """
+    with old_path.open("rb") as f:
+        old_meta = read_metadata(f, read_layout(f))
+    with new_path.open("rb") as f:
+        new_meta = read_metadata(f, read_layout(f))
+    if old_meta.depot_id != new_meta.depot_id:
+        raise ValueError(
+            f"Different depots: {old_meta.depot_id} and {new_meta.depot_id}"
+        )
+    key_bytes = bytes.fromhex(dec_key) if dec_key else None
+
+    def name_of(mapping, encrypted: bool) -> str:
+        if encrypted and key_bytes is not None:
+            return decrypt_filename(mapping.filename, key_bytes)
+        return mapping.filename
+
+    result = ManifestDiff(
+        old_meta.depot_id, old_meta.gid_manifest, new_meta.gid_manifest
+    )
+
+    # Pass 1: old files and chunks
+    old_files: dict[int, tuple[int, int]] = {}
+    "File key -> (size, content hash)"
+    old_chunks: set[int] = set()
+    for mapping in _mappings(old_path):
+        old_files[_file_key(mapping)] = (mapping.size, _prefix(mapping.sha_content))
+        result.old_size += mapping.size
+        old_chunks.update(_prefix(chunk.sha) for chunk in mapping.chunks)
+
+    # Pass 2: new files against them
+    new_keys: set[int] = set()
+    counted_chunks: set[int] = set()
+    for mapping in _mappings(new_path):
+        key = _file_key(mapping)
+        new_keys.add(key)
+        result.new_size += mapping.size
+        old = old_files.get(key)
+        if old is None:
+            result.added += 1
+            status = "added"
+        elif old != (mapping.size, _prefix(mapping.sha_content)):
+            result.changed += 1
+            status = "changed"
+        else:
+            result.unchanged += 1
+            status = None
+        if status is not None and on_change is not None:
+            on_change(FileChange(
+                status,
+                name_of(mapping, new_meta.filenames_encrypted),
+                old[0] if old else None,
+                mapping.size,
+            ))
+
+        for chunk in mapping.chunks:
+            sha = _prefix(chunk.sha)
+            if sha in old_chunks or sha in counted_chunks:
+                continue
+            counted_chunks.add(sha)
+            result.new_chunks += 1
+            result.download_bytes += chunk.cb_compressed
+            result.new_chunk_bytes += chunk.cb_original
+
+    # Pass 3: old files the new manifest doesn't have
+    for mapping in _mappings(old_path):
+        if _file_key(mapping) in new_keys:
+            continue
+        result.removed += 1
+        if on_change is not None:
+            on_change(FileChange(
+                "removed",
+                name_of(mapping, old_meta.filenames_encrypted),
+                mapping.size,
+                None,
+            ))
+
+    logger.debug(f"Diffed {old_path.name} -> {new_path.name}: {result}")
+    return result
+
+
+def diff_update(
+    index: "ManifestIndex", installed: dict[str, str], new_manifests: list[Path]
+) -> list[ManifestDiff]:
+    """
+    Diffs downloaded manifests against the installed ones of their depots
+
+    Args:
+        index: Where to find the installed manifests
+        installed: Depot IDs mapped to their installed manifest IDs (see
+            ACFParser.installed_manifests)
+        new_manifests: Paths named {depot ID}_{manifest ID}.manifest
+
+    Returns:
+        list[ManifestDiff]: One per depot whose installed manifest is still
+        in depotcache. Others can't be estimated and are left out
+    """
+    diffs: list[ManifestDiff] = []
+    for path in new_manifests:
+        depot_id, _, manifest_id = path.stem.partition("_")
+        old_id = installed.get(depot_id)
+        if not old_id or old_id == manifest_id:
+            continue
+        old = index.find(depot_id, old_id)
+        if old is None:
+            logger.debug(f"Installed manifest {depot_id}_{old_id} isn't in depotcache")
+            continue
+        try:
+            diffs.append(diff_manifests(Path(old.path), path))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't diff {path.name} against {old_id}: {e}")
+    return diffs
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def format_diff(diff: ManifestDiff) -> str:
+    """Short human-readable summary of a diff"""
+    return "\n".join([
+        f"Depot {diff.depot_id}: {diff.old_manifest_id} -> {diff.new_manifest_id}",
+        f"  Files: {diff.added} added, {diff.removed} removed, "
+        f"{diff.changed} changed, {diff.unchanged} unchanged",
+        f"  Download: {format_bytes(diff.download_bytes)} in {diff.new_chunks} new chunks "
+        f"({format_bytes(diff.new_chunk_bytes)} uncompressed)",
+        f"  Size on disk: {format_bytes(diff.old_size)} -> {format_bytes(diff.new_size)}",
+    ])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Diff two manifests of one depot")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--key", help="Depot decryption key, for encrypted filenames")
+    parser.add_argument("--files", action="store_true", help="List changed files")
+    args = parser.parse_args()
+
+    def print_change(change: FileChange):
+        print(f"{change.status:>8}  {change.filename}")
+
+    print(format_diff(diff_manifests(
+        args.old, args.new, print_change if args.files else None, args.key
+    )))
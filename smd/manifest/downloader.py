@@ -1,18 +1,20 @@
-import asyncio
 import logging
 import shutil
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Optional, cast
+from typing import TYPE_CHECKING, Any, Optional, cast
 from urllib.parse import urljoin
 
-import gevent
 from colorama import Fore, Style
-from steam.client.cdn import CDNClient, ContentServer  # type: ignore
 from tqdm import tqdm  # type: ignore
 
-from smd.http_utils import get_gmrc, get_request_raw
+from smd.cache import get_cache
+from smd.event_loop import run_sync
+from smd.http_utils import get_gmrc, get_gmrc_batch, get_request_raw
+from smd.metrics import get_metrics, record_latency
 from smd.manifest.crypto import decrypt_and_save_manifest
+from smd.manifest.index import get_manifest_index
 from smd.manifest.id_resolver import (
     IManifestStrategy,
     InnerDepotManifestStrategy,
@@ -26,25 +28,55 @@ from smd.prompts import prompt_confirm, prompt_select, prompt_text
 from smd.steam_client import SteamInfoProvider, get_product_info
 from smd.storage.settings import get_setting
 from smd.structs import (  # type: ignore
+    DepotKeyPair,
     DepotManifestMap,
     LuaParsedInfo,
     ManifestGetModes,
     Settings,
 )
+from smd.tracing import span, traced
 from smd.zip import read_nth_file_from_zip_bytes
-from smd.steam_tools_compat import sync_manifest_to_config_depotcache
+from smd.steam_tools_compat import (
+    CONFIG_DEPOTCACHE_SUBDIR,
+    sync_manifest_to_config_depotcache,
+)
+
+if TYPE_CHECKING:
+    from steam.client.cdn import CDNClient, ContentServer  # type: ignore
 
 logger = logging.getLogger(__name__)
 
+GMRC_TTL = 300
+"""Manifest request codes rotate every few minutes, so don't keep them longer"""
+
+
+def get_worker_count() -> int:
+    """Parallel download workers from settings, default to 4"""
+    worker_count_str = get_setting(Settings.PARALLEL_DOWNLOADS)
+    try:
+        worker_count = int(worker_count_str) if worker_count_str else 4
+        return max(1, min(worker_count, 10))  # Clamp between 1-10
+    except (ValueError, TypeError):
+        return 4
+
+
+def _gmrc_cache_key(manifest_id: str):
+    return f"gmrc_{manifest_id}"
+
 
 class ManifestDownloader:
-    def __init__(self, provider: SteamInfoProvider, steam_path: Path):
+    def __init__(
+        self, provider: SteamInfoProvider, steam_path: Path, interactive: bool = True
+    ):
         self.steam_path = steam_path
         self.provider = provider
+        self.interactive = interactive
+        """When False, anything that would prompt fails or gets skipped instead"""
 
     def get_dlc_manifest_status(self, depot_ids: list[int]):
-        # A dict of Depot IDs mapped to Manifest IDs
+        # A dict of Depot IDs mapped to whether their manifest is in depotcache
         manifest_ids: dict[int, bool] = {}
+        index = get_manifest_index(self.steam_path)
 
         while True:
             app_info = get_product_info(self.provider, depot_ids)  # type: ignore
@@ -61,20 +93,45 @@ class ManifestDownloader:
                 )
                 if manifest is not None:
                     print(f"Depot {depot_id} has manifest {manifest}")
-                manifest_file = (
-                    self.steam_path / f"depotcache/{depot_id}_{manifest}.manifest"
+                manifest_ids[depot_id] = (
+                    manifest is not None and index.has(depot_id, manifest)
                 )
-                manifest_ids[depot_id] = manifest_file.exists()
             break
         return manifest_ids
 
+    @staticmethod
+    def unpinned_depots(lua: LuaParsedInfo, use_pinned: bool = True) -> list[DepotKeyPair]:
+        """Depots with keys whose manifest ID has to be looked up"""
+        pinned = lua.manifests if use_pinned else {}
+        # A keyed base app ID is resolved too. If it's just the app, the
+        # resolver returns "" and get_manifest_ids skips it
+        return [
+            x for x in lua.depots
+            if x.decryption_key and x.depot_id not in pinned
+        ]
+
+    @traced()
     def get_manifest_ids(
-        self, lua: LuaParsedInfo, auto: bool = False
+        self, lua: LuaParsedInfo, auto: bool = False, use_pinned: bool = True
     ) -> DepotManifestMap:
-        """Returns a dict of depot IDs mapped to manifest IDs"""
+        """Returns a dict of depot IDs mapped to manifest IDs
+
+        Args:
+            use_pinned: Take manifest IDs the lua pins with setManifestid as is,
+                instead of looking up the latest ones
+        """
         # A dict of Depot IDs mapped to Manifest IDs
         manifest_ids: dict[str, str] = {}
         app_id = int(lua.app_id)
+        pinned = lua.manifests if use_pinned else {}
+        unpinned = self.unpinned_depots(lua, use_pinned)
+        for pair in lua.depots:
+            if pair.decryption_key and pair.depot_id in pinned:
+                manifest_ids[pair.depot_id] = pinned[pair.depot_id]
+                print(f"Depot {pair.depot_id} has manifest {pinned[pair.depot_id]} (pinned in lua)")
+        if not unpinned:
+            return DepotManifestMap(manifest_ids)
+
         if not auto:
             mode = prompt_select(
                 "How would you like to obtain the manifest ID?",
@@ -101,18 +158,20 @@ class ManifestDownloader:
             strats.append(StandardManifestStrategy())
             strats.append(SharedDepotManifestStrategy())
             strats.append(InnerDepotManifestStrategy())
-        strats.append(ManualManifestStrategy())
+        if self.interactive:
+            strats.append(ManualManifestStrategy())
 
         resolver = ManifestIDResolver(strats)
 
-        for pair in lua.depots:
+        for pair in unpinned:
             depot_id = str(pair.depot_id)
-
-            if not pair.decryption_key:
-                logger.debug(f"Skipping {depot_id} because it has no decryption key")
+            try:
+                manifest, strat = resolver.resolve(context, depot_id)
+            except Exception:
+                if self.interactive:
+                    raise
+                print(f"Depot {depot_id} has no manifest ID that can be found. Skipping")
                 continue
-
-            manifest, strat = resolver.resolve(context, depot_id)
             if manifest == "":
                 # Skip, probably because lua file had a base app ID
                 # that also had a decryption key
@@ -122,11 +181,42 @@ class ManifestDownloader:
 
         return DepotManifestMap(manifest_ids)
 
+    def _pending_manifest_ids(
+        self, lua: LuaParsedInfo, manifest_ids: DepotManifestMap
+    ) -> list[str]:
+        """Manifest IDs that aren't in depotcache or the manifests folder yet"""
+        pending: list[str] = []
+        index = get_manifest_index(self.steam_path)
+        for pair in lua.depots:
+            manifest_id = manifest_ids.get(pair.depot_id)
+            if pair.decryption_key == "" or manifest_id is None:
+                continue
+            filename = f"{pair.depot_id}_{manifest_id}.manifest"
+            if index.has(pair.depot_id, manifest_id):
+                continue
+            if (Path.cwd() / "manifests" / filename).exists():
+                continue
+            pending.append(manifest_id)
+        return pending
+
+    def _store(self, manifest_path: Path):
+        """Copies a manifest now in depotcache to config/depotcache and adds
+        both to the index, so the writes don't make it rescan"""
+        sync_manifest_to_config_depotcache(self.steam_path, manifest_path)
+        get_manifest_index(self.steam_path).add(
+            manifest_path,
+            self.steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR) / manifest_path.name,
+        )
+
+    @traced()
     def get_cdn_client(self, max_retries: int = 5):
         """Obtain CDN client with retry on timeout."""
+        import gevent
+        from steam.client.cdn import CDNClient  # type: ignore
+
         for attempt in range(max_retries):
             try:
-                cdn = CDNClient(self.provider.client)
+                cdn = self.provider.call(CDNClient)
                 return cdn
             except gevent.Timeout:
                 if attempt < max_retries - 1:
@@ -135,26 +225,79 @@ class ManifestDownloader:
                     raise RuntimeError("CDN Client timed out after maximum retries.") from None
 
     def download_single_manifest(
-        self, depot_id: str, manifest_id: str, cdn_client: Optional[CDNClient] = None
+        self, depot_id: str, manifest_id: str, cdn_client: Optional["CDNClient"] = None
     ):
         """Returns an encrypted manifest file as bytes"""
         if cdn_client is None:
             cdn_client = self.get_cdn_client()
-        req_code = self.resolve_gmrc(manifest_id)
-        cdn_server = cast(ContentServer, cdn_client.get_content_server())
+        with span("resolve_gmrc", manifest_id=manifest_id):
+            req_code = self.resolve_gmrc(manifest_id)
+        cdn_server = cast("ContentServer", cdn_client.get_content_server())
         cdn_server_name = f"http{'s' if cdn_server.https else ''}://{cdn_server.host}"
         manifest_url = urljoin(
             cdn_server_name, f"depot/{depot_id}/manifest/{manifest_id}/5/{req_code}"
         )
 
         logger.debug(f"Download manifest from {manifest_url}")
-        return get_request_raw(manifest_url)
+        start = time.perf_counter()
+        manifest = get_request_raw(manifest_url, self.interactive)
+        record_latency(
+            "cdn_manifest",
+            time.perf_counter() - start,
+            "smd_manifest_download_seconds",
+            "Duration of manifest downloads from the CDN",
+            result="ok" if manifest else "failed",
+        )
+        if manifest:
+            get_metrics().counter(
+                "smd_manifest_download_bytes_total", "Bytes of manifests downloaded"
+            ).inc(len(manifest))
+        else:
+            # The code might have expired, so don't reuse it on retry
+            get_cache().invalidate(_gmrc_cache_key(manifest_id))
+        return manifest
+
+    @traced()
+    def prefetch_gmrcs(self, manifest_ids: list[str]):
+        """Gets request codes for all uncached manifests concurrently, so
+        `resolve_gmrc` only has to hit the network for the ones that failed"""
+        cache = get_cache()
+        missing = [
+            x for x in dict.fromkeys(manifest_ids)
+            if cache.get(_gmrc_cache_key(x)) is None
+        ]
+        if not missing:
+            return
+        print(f"Getting request codes for {len(missing)} manifest(s)...")
+        codes = run_sync(get_gmrc_batch(missing))
+        found = {
+            _gmrc_cache_key(manifest_id): code
+            for manifest_id, code in codes.items()
+            if code is not None
+        }
+        if found:
+            cache.set_many(found, GMRC_TTL)
+        logger.debug(f"Prefetched {len(found)}/{len(missing)} request codes")
 
     def resolve_gmrc(self, manifest_id: str):
+        cache = get_cache()
+        if (req_code := cache.get(_gmrc_cache_key(manifest_id))) is not None:
+            print(f"Request code is: {req_code} (cached)")
+            return req_code
+        if not self.interactive:
+            req_code = run_sync(get_gmrc_batch([manifest_id])).get(manifest_id)
+            if req_code is None:
+                raise RuntimeError(f"Could not get request code for {manifest_id}")
+            cache.set(_gmrc_cache_key(manifest_id), req_code, GMRC_TTL)
+            return req_code
         while True:
-            req_code = asyncio.run(get_gmrc(manifest_id))
+            req_code = run_sync(get_gmrc(manifest_id))
             if req_code is not None:
+                req_code = req_code.strip()
                 print(f"Request code is: {req_code}")
+                # Same check as get_gmrc_batch, anything else would get a 401
+                if req_code.isdigit():
+                    cache.set(_gmrc_cache_key(manifest_id), req_code, GMRC_TTL)
                 break
             if prompt_confirm(
                 "Request code endpoint died. Would you like to try again?",
@@ -184,11 +327,16 @@ class ManifestDownloader:
                 f.write(extracted.read())
 
     def download_manifests(
-        self, lua: LuaParsedInfo, decrypt: bool = False, auto_manifest: bool = False
+        self,
+        lua: LuaParsedInfo,
+        decrypt: bool = False,
+        auto_manifest: bool = False,
+        use_pinned: bool = True,
     ):
         """Gets latest manifest IDs and downloads respective manifests"""
         cdn = self.get_cdn_client()
-        manifest_ids = self.get_manifest_ids(lua, auto_manifest)
+        manifest_ids = self.get_manifest_ids(lua, auto_manifest, use_pinned)
+        self.prefetch_gmrcs(self._pending_manifest_ids(lua, manifest_ids))
 
         manifest_paths: list[Path] = []
         # Download and decrypt manifests
@@ -220,7 +368,7 @@ class ManifestDownloader:
                 print("One of the endpoints had a manifest. Skipping download...")
                 if not final_manifest_loc.exists():
                     shutil.move(possible_saved_manifest, final_manifest_loc)
-                sync_manifest_to_config_depotcache(self.steam_path, final_manifest_loc)
+                self._store(final_manifest_loc)
                 continue
             manifest = self.download_single_manifest(depot_id, manifest_id, cdn)
 
@@ -235,26 +383,87 @@ class ManifestDownloader:
                         f.write(extracted.read())
 
                 manifest_paths.append(final_manifest_loc)
-                sync_manifest_to_config_depotcache(self.steam_path, final_manifest_loc)
+                self._store(final_manifest_loc)
+        get_manifest_index(self.steam_path).save()
         return manifest_paths
     
+    def download_one(
+        self,
+        depot_id: str,
+        manifest_id: str,
+        dec_key: str,
+        decrypt: bool,
+        cdn: Optional["CDNClient"] = None,
+    ) -> tuple[bool, str, str, Optional[Path], str]:
+        """Downloads one manifest into depotcache, skipping it if it's already there.
+        Safe to run from worker threads. Never raises.
+
+        Returns:
+            tuple: (success, depot ID, manifest ID, manifest path, status message)
+        """
+        with span("download_one", depot_id=depot_id, manifest_id=manifest_id):
+            return self._download_one(depot_id, manifest_id, dec_key, decrypt, cdn)
+
+    def _download_one(
+        self,
+        depot_id: str,
+        manifest_id: str,
+        dec_key: str,
+        decrypt: bool,
+        cdn: Optional["CDNClient"],
+    ) -> tuple[bool, str, str, Optional[Path], str]:
+        depotcache = self.steam_path / "depotcache"
+        try:
+            depotcache.mkdir(exist_ok=True)
+            final_manifest_loc = depotcache / f"{depot_id}_{manifest_id}.manifest"
+
+            # Check if already exists
+            if get_manifest_index(self.steam_path).has(depot_id, manifest_id):
+                self._store(final_manifest_loc)
+                return (True, depot_id, manifest_id, final_manifest_loc, "Already exists")
+
+            # Check for saved manifest
+            possible_saved_manifest = Path.cwd() / f"manifests/{depot_id}_{manifest_id}.manifest"
+            if possible_saved_manifest.exists():
+                shutil.move(possible_saved_manifest, final_manifest_loc)
+                self._store(final_manifest_loc)
+                return (True, depot_id, manifest_id, final_manifest_loc, "Moved from saved")
+
+            # Download manifest
+            manifest = self.download_single_manifest(depot_id, manifest_id, cdn)
+
+            if manifest:
+                if decrypt:
+                    decrypt_and_save_manifest(manifest, final_manifest_loc, dec_key)
+                else:
+                    extracted = read_nth_file_from_zip_bytes(0, manifest)
+                    if not extracted:
+                        return (False, depot_id, manifest_id, None, "Not a ZIP file")
+                    with final_manifest_loc.open("wb") as f:
+                        f.write(extracted.read())
+                self._store(final_manifest_loc)
+                return (True, depot_id, manifest_id, final_manifest_loc, "Downloaded")
+            else:
+                return (False, depot_id, manifest_id, None, "Download failed")
+
+        except Exception as e:
+            logger.error(f"Error downloading {depot_id}_{manifest_id}: {e}", exc_info=True)
+            return (False, depot_id, manifest_id, None, str(e))
+
     def download_manifests_parallel(
-        self, lua: LuaParsedInfo, decrypt: bool = False, auto_manifest: bool = False
+        self,
+        lua: LuaParsedInfo,
+        decrypt: bool = False,
+        auto_manifest: bool = False,
+        use_pinned: bool = True,
     ):
         """Downloads manifests in parallel using ThreadPoolExecutor"""
-        import time
-        start_time = time.time()
-        
-        # Get worker count from settings, default to 4
-        worker_count_str = get_setting(Settings.PARALLEL_DOWNLOADS)
-        try:
-            worker_count = int(worker_count_str) if worker_count_str else 4
-            worker_count = max(1, min(worker_count, 10))  # Clamp between 1-10
-        except (ValueError, TypeError):
-            worker_count = 4
+        start_time = time.perf_counter()
         
+        worker_count = get_worker_count()
+
         cdn = self.get_cdn_client()
-        manifest_ids = self.get_manifest_ids(lua, auto_manifest)
+        manifest_ids = self.get_manifest_ids(lua, auto_manifest, use_pinned)
         
         # Prepare download tasks
         download_tasks = []
@@ -278,6 +487,9 @@ class ManifestDownloader:
         if not download_tasks:
             print(Fore.YELLOW + "No manifests to download" + Style.RESET_ALL)
             return []
+
+        # Resolve every request code up front instead of one by one in the workers
+        self.prefetch_gmrcs(self._pending_manifest_ids(lua, manifest_ids))
         
         print(Fore.CYAN + f"\nDownloading {len(download_tasks)} manifests with {worker_count} workers..." + Style.RESET_ALL)
         
@@ -287,47 +499,10 @@ class ManifestDownloader:
         
         def download_task(task):
             """Worker function for downloading a single manifest"""
-            depot_id = task['depot_id']
-            manifest_id = task['manifest_id']
-            dec_key = task['dec_key']
-            decrypt_flag = task['decrypt']
-            
-            try:
-                final_manifest_loc = depotcache / f"{depot_id}_{manifest_id}.manifest"
-                
-                # Check if already exists
-                if final_manifest_loc.exists():
-                    sync_manifest_to_config_depotcache(self.steam_path, final_manifest_loc)
-                    return (True, depot_id, manifest_id, final_manifest_loc, "Already exists")
-                
-                # Check for saved manifest
-                possible_saved_manifest = Path.cwd() / f"manifests/{depot_id}_{manifest_id}.manifest"
-                if possible_saved_manifest.exists():
-                    shutil.move(possible_saved_manifest, final_manifest_loc)
-                    sync_manifest_to_config_depotcache(self.steam_path, final_manifest_loc)
-                    return (True, depot_id, manifest_id, final_manifest_loc, "Moved from saved")
-                
-                # Download manifest
-                manifest = self.download_single_manifest(depot_id, manifest_id, cdn)
-                
-                if manifest:
-                    if decrypt_flag:
-                        decrypt_and_save_manifest(manifest, final_manifest_loc, dec_key)
-                    else:
-                        extracted = read_nth_file_from_zip_bytes(0, manifest)
-                        if not extracted:
-                            return (False, depot_id, manifest_id, None, "Not a ZIP file")
-                        with final_manifest_loc.open("wb") as f:
-                            f.write(extracted.read())
-                    sync_manifest_to_config_depotcache(self.steam_path, final_manifest_loc)
-                    return (True, depot_id, manifest_id, final_manifest_loc, "Downloaded")
-                else:
-                    return (False, depot_id, manifest_id, None, "Download failed")
-                    
-            except Exception as e:
-                logger.error(f"Error downloading {depot_id}_{manifest_id}: {e}", exc_info=True)
-                return (False, depot_id, manifest_id, None, str(e))
-        
+            return self.download_one(
+                task['depot_id'], task['manifest_id'], task['dec_key'], task['decrypt'], cdn
+            )
+
         # Execute downloads in parallel with progress bar
         with ThreadPoolExecutor(max_workers=worker_count) as executor:
             futures = {executor.submit(download_task, task): task for task in download_tasks}
@@ -344,8 +519,12 @@ class ManifestDownloader:
                         print(Fore.RED + f"✗ Depot {depot_id} - Manifest {manifest_id}: {status}" + Style.RESET_ALL)
                     
                     pbar.update(1)
+        get_manifest_index(self.steam_path).save()
         
-        elapsed = time.time() - start_time
+        elapsed = time.perf_counter() - start_time
+        get_metrics().histogram(
+            "smd_manifest_batch_seconds", "Duration of parallel manifest downloads"
+        ).observe(elapsed, workers=worker_count)
         print(Fore.CYAN + f"\nCompleted {len(manifest_paths)}/{len(download_tasks)} downloads in {elapsed:.2f}s" + Style.RESET_ALL)
         
         return manifest_paths
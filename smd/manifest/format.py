@@ -0,0 +1,134 @@
+"""Layout of .manifest files as found in depotcache.
+
+A manifest is a list of sections, each starting with a `<II` header of
+(magic, length): the payload (file mappings), the metadata, the signature,
+then a lone end-of-manifest magic. Knowing the lengths up front means any
+section can be reached without reading the ones before it.
+"""
+
+import mmap
+import struct
+from typing import BinaryIO, Iterator, NamedTuple
+
+from steam.protobufs.content_manifest_pb2 import (  # type: ignore
+    ContentManifestMetadata,
+    ContentManifestPayload,
+)
+
+# Magic numbers
+PROTOBUF_PAYLOAD_MAGIC = 0x71F617D0
+PROTOBUF_METADATA_MAGIC = 0x1F4812BE
+PROTOBUF_SIGNATURE_MAGIC = 0x1B81B817
+PROTOBUF_ENDOFMANIFEST_MAGIC = 0x32C415AB
+
+SECTION_HEADER = struct.Struct("<II")
+_MAPPINGS_FIELD = 1
+"Field number of `mappings` in ContentManifestPayload"
+
+
+class ManifestLayout(NamedTuple):
+    """Where each section of a manifest file is. Offsets point past the header"""
+
+    payload_offset: int
+    payload_length: int
+    metadata_offset: int
+    metadata_length: int
+    signature_offset: int
+    signature_length: int
+    file_size: int
+
+
+def _read_header(f: BinaryIO, expected_magic: int, name: str) -> int:
+    header = f.read(SECTION_HEADER.size)
+    if len(header) < SECTION_HEADER.size:
+        raise ValueError(f"Truncated before {name} section")
+    magic, length = SECTION_HEADER.unpack(header)
+    if magic != expected_magic:
+        raise ValueError(f"Bad {name} magic: {magic:#010x}")
+    return length
+
+
+def read_layout(f: BinaryIO) -> ManifestLayout:
+    """Reads the section headers of a manifest, seeking past each section.
+    Only 28 bytes are actually read.
+
+    Raises:
+        ValueError: If a magic is wrong or a section is cut off
+    """
+    file_size = f.seek(0, 2)
+    f.seek(0)
+    payload_length = _read_header(f, PROTOBUF_PAYLOAD_MAGIC, "payload")
+    payload_offset = f.tell()
+
+    f.seek(payload_offset + payload_length)
+    metadata_length = _read_header(f, PROTOBUF_METADATA_MAGIC, "metadata")
+    metadata_offset = f.tell()
+
+    f.seek(metadata_offset + metadata_length)
+    signature_length = _read_header(f, PROTOBUF_SIGNATURE_MAGIC, "signature")
+    signature_offset = f.tell()
+
+    f.seek(signature_offset + signature_length)
+    end = f.read(4)
+    if len(end) < 4:
+        raise ValueError("Truncated before end of manifest")
+    if struct.unpack("<I", end)[0] != PROTOBUF_ENDOFMANIFEST_MAGIC:
+        raise ValueError("Bad end of manifest magic")
+
+    return ManifestLayout(
+        payload_offset,
+        payload_length,
+        metadata_offset,
+        metadata_length,
+        signature_offset,
+        signature_length,
+        file_size,
+    )
+
+
+def read_metadata(f: BinaryIO, layout: ManifestLayout) -> ContentManifestMetadata:
+    """Parses only the metadata section"""
+    f.seek(layout.metadata_offset)
+    metadata = ContentManifestMetadata()
+    metadata.ParseFromString(f.read(layout.metadata_length))
+    return metadata
+
+
+def _read_varint(buf: "mmap.mmap", pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_mappings(
+    f: BinaryIO, layout: ManifestLayout
+) -> Iterator[ContentManifestPayload.FileMapping]:
+    """Yields the payload's file mappings one at a time. Walks the protobuf
+    wire format over an mmap, so only one mapping is ever parsed at once
+    instead of the whole payload"""
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = layout.payload_offset
+        end = pos + layout.payload_length
+        while pos < end:
+            key, pos = _read_varint(mm, pos)
+            field, wire_type = key >> 3, key & 7
+            if wire_type == 2:  # Length-delimited
+                length, pos = _read_varint(mm, pos)
+                if field == _MAPPINGS_FIELD:
+                    yield ContentManifestPayload.FileMapping.FromString(
+                        mm[pos : pos + length]
+                    )
+                pos += length
+            elif wire_type == 0:  # Varint
+                _, pos = _read_varint(mm, pos)
+            elif wire_type == 1:  # 64-bit
+                pos += 8
+            elif wire_type == 5:  # 32-bit
+                pos += 4
+            else:
+                raise ValueError(f"Unexpected wire type {wire_type} in payload")
@@ -0,0 +1,272 @@
+"""Index of the manifests in depotcache, built from their metadata only.
+
+Each file's metadata section is read by seeking past the payload, so indexing
+a folder of large manifests reads a few hundred bytes per file. The table is
+saved between runs and refreshed incrementally: nothing is read if neither
+folder changed, and only new or modified files are parsed when one did.
+Manifests SMD writes itself are added in place with `add`, so downloading
+doesn't make the next lookup rescan the folder.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple, Optional, Union
+
+import msgpack  # type: ignore
+
+from smd.manifest.format import read_layout, read_metadata
+from smd.steam_tools_compat import CONFIG_DEPOTCACHE_SUBDIR
+from smd.storage.packed import load_packed
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = root_folder(outside_internal=True) / "manifest_index.bin"
+INDEX_VERSION = 1
+
+
+class ManifestEntry(NamedTuple):
+    depot_id: int
+    manifest_id: int
+    "The manifest GID"
+    creation_time: int
+    cb_disk_original: int
+    "Size of the depot's files, uncompressed"
+    cb_disk_compressed: int
+    unique_chunks: int
+    encrypted: bool
+    "Whether the filenames are still encrypted"
+    path: str
+    file_size: int
+    mtime_ns: int
+
+
+class ManifestIndex:
+    """In-memory table of every manifest in depotcache and config/depotcache"""
+
+    def __init__(self, steam_path: Path, index_file: Path = INDEX_FILE):
+        self.steam_path = steam_path
+        self.index_file = index_file
+        self.entries: dict[str, ManifestEntry] = {}
+        "Path -> entry"
+        self._by_id: dict[tuple[int, int], list[ManifestEntry]] = {}
+        "Only ever replaced, never changed in place, so lookups don't need the lock"
+        self._folder_mtimes: dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.load()
+
+    @property
+    def folders(self) -> list[Path]:
+        """Primary folder first, lookups prefer it"""
+        return [
+            self.steam_path / "depotcache",
+            self.steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR),
+        ]
+
+    def load(self):
+        data = load_packed(self.index_file, "Manifest index")
+        if data is None:
+            return
+        if data.get("version") != INDEX_VERSION or data.get("steam_path") != str(self.steam_path):
+            return
+        with self._lock:
+            self.entries = {x[7]: ManifestEntry(*x) for x in data.get("rows", [])}
+            self._folder_mtimes = data.get("folder_mtimes", {})
+            self._rebuild_lookup()
+
+    def save(self):
+        with self._lock:
+            data = {
+                "version": INDEX_VERSION,
+                "steam_path": str(self.steam_path),
+                "folder_mtimes": dict(self._folder_mtimes),
+                "rows": [list(x) for x in self.entries.values()],
+            }
+        try:
+            temp_file = self.index_file.with_suffix(".tmp")
+            with temp_file.open("wb") as f:
+                f.write(msgpack.packb(data))  # type: ignore
+            temp_file.replace(self.index_file)
+        except OSError as e:
+            logger.error(f"Failed to save manifest index: {e}", exc_info=True)
+
+    def _sort_key(self, entry: ManifestEntry) -> bool:
+        return not entry.path.startswith(str(self.folders[0]) + os.sep)
+
+    def _rebuild_lookup(self):
+        by_id: dict[tuple[int, int], list[ManifestEntry]] = {}
+        for entry in self.entries.values():
+            by_id.setdefault((entry.depot_id, entry.manifest_id), []).append(entry)
+        for entries in by_id.values():
+            entries.sort(key=self._sort_key)
+        self._by_id = by_id
+
+    @staticmethod
+    def read_entry(path: Path, stat: os.stat_result) -> Optional[ManifestEntry]:
+        """Builds an entry from the metadata section. None if it can't be read"""
+        try:
+            with path.open("rb") as f:
+                metadata = read_metadata(f, read_layout(f))
+        except Exception as e:
+            logger.debug(f"Not indexing {path.name}: {e}")
+            return None
+        return ManifestEntry(
+            metadata.depot_id,
+            metadata.gid_manifest,
+            metadata.creation_time,
+            metadata.cb_disk_original,
+            metadata.cb_disk_compressed,
+            metadata.unique_chunks,
+            metadata.filenames_encrypted,
+            str(path),
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+    def refresh(self, force: bool = False) -> bool:
+        """Brings the index up to date. Folders whose mtime didn't change are
+        skipped, and files whose size and mtime didn't change aren't read.
+        Returns True if a folder was rescanned"""
+        with self._lock:
+            changed = False
+            for folder in self.folders:
+                try:
+                    folder_mtime = folder.stat().st_mtime_ns
+                except OSError:
+                    folder_mtime = None
+                key = str(folder)
+                if not force and self._folder_mtimes.get(key) == folder_mtime:
+                    continue
+                self._scan(folder)
+                if folder_mtime is None:
+                    self._folder_mtimes.pop(key, None)
+                else:
+                    self._folder_mtimes[key] = folder_mtime
+                changed = True
+            if changed:
+                self._rebuild_lookup()
+                self.save()
+            return changed
+
+    def add(self, *paths: Path):
+        """Indexes manifests that were just written, without a rescan. The
+        index isn't saved, call `save` once a batch of writes is done"""
+        with self._lock:
+            by_id = dict(self._by_id)
+            folders = set()
+            for path in paths:
+                try:
+                    entry = self.read_entry(path, path.stat())
+                except OSError:
+                    entry = None
+                if entry is None:
+                    continue
+                folders.add(path.parent)
+                old = self.entries.get(entry.path)
+                self.entries[entry.path] = entry
+                key = (entry.depot_id, entry.manifest_id)
+                same = [x for x in by_id.get(key, []) if x.path != entry.path]
+                if old is not None and (old.depot_id, old.manifest_id) != key:
+                    old_key = (old.depot_id, old.manifest_id)
+                    by_id[old_key] = [x for x in by_id[old_key] if x.path != old.path]
+                by_id[key] = sorted(same + [entry], key=self._sort_key)
+            self._by_id = by_id
+            # The write changed the folder's mtime, don't let it trigger a rescan
+            for folder in folders:
+                if str(folder) not in self._folder_mtimes:
+                    continue
+                try:
+                    self._folder_mtimes[str(folder)] = folder.stat().st_mtime_ns
+                except OSError:
+                    pass
+
+    def _scan(self, folder: Path):
+        prefix = str(folder) + os.sep
+        old = {k: v for k, v in self.entries.items() if k.startswith(prefix)}
+        seen: set[str] = set()
+        added = 0
+        if folder.exists():
+            for dir_entry in os.scandir(folder):
+                if not dir_entry.name.endswith(".manifest") or not dir_entry.is_file():
+                    continue
+                path = str(folder / dir_entry.name)
+                stat = dir_entry.stat()
+                seen.add(path)
+                cached = old.get(path)
+                if (
+                    cached is not None
+                    and cached.file_size == stat.st_size
+                    and cached.mtime_ns == stat.st_mtime_ns
+                ):
+                    continue
+                entry = self.read_entry(Path(path), stat)
+                if entry is None:
+                    self.entries.pop(path, None)
+                else:
+                    self.entries[path] = entry
+                    added += 1
+        removed = [x for x in old if x not in seen]
+        for path in removed:
+            del self.entries[path]
+        logger.debug(
+            f"Indexed {folder}: {added} new or changed, {len(removed)} removed"
+        )
+
+    def find(
+        self, depot_id: Union[int, str], manifest_id: Union[int, str]
+    ) -> Optional[ManifestEntry]:
+        """The indexed manifest with this depot and manifest ID, preferring
+        the main depotcache folder"""
+        self.refresh()
+        entries = self._by_id.get((int(depot_id), int(manifest_id)))
+        return entries[0] if entries else None
+
+    def has(
+        self,
+        depot_id: Union[int, str],
+        manifest_id: Union[int, str],
+        primary_only: bool = True,
+    ) -> bool:
+        """Whether that manifest is in depotcache (or either folder if not `primary_only`)"""
+        entry = self.find(depot_id, manifest_id)
+        if entry is None:
+            return False
+        return not primary_only or entry.path.startswith(str(self.folders[0]) + os.sep)
+
+    def manifests_for(self, depot_id: Union[int, str]) -> list[ManifestEntry]:
+        """Every indexed manifest of a depot, newest first"""
+        self.refresh()
+        depot_id = int(depot_id)
+        found = {
+            entries[0].manifest_id: entries[0]
+            for (depot, _), entries in self._by_id.items()
+            if depot == depot_id
+        }
+        return sorted(found.values(), key=lambda x: x.creation_time, reverse=True)
+
+    def stale_depots(
+        self, expected: dict[Union[int, str], Union[int, str]]
+    ) -> list[int]:
+        """Depots whose expected (usually latest) manifest isn't in depotcache
+
+        Args:
+            expected: Depot IDs mapped to the manifest IDs they should have
+        """
+        return [
+            int(depot_id) for depot_id, manifest_id in expected.items()
+            if not self.has(depot_id, manifest_id)
+        ]
+
+
+# Global index instance
+_manifest_index: Optional[ManifestIndex] = None
+
+
+def get_manifest_index(steam_path: Path) -> ManifestIndex:
+    """Get or create the global index for this Steam path"""
+    global _manifest_index
+    if _manifest_index is None or _manifest_index.steam_path != steam_path:
+        _manifest_index = ManifestIndex(steam_path)
+    return _manifest_index
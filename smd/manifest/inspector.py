@@ -0,0 +1,252 @@
+"""Summaries and exports of manifest contents.
+
+Mappings are streamed one at a time (see format.iter_mappings), so a summary
+of a huge manifest costs one pass and a bit of memory per unique chunk, and
+exports are written row by row instead of built up front.
+"""
+
+import csv
+import fnmatch
+import heapq
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Sequence, TextIO
+
+from steam.protobufs.content_manifest_pb2 import ContentManifestPayload  # type: ignore
+
+from smd.manifest.crypto import decrypt_filename
+from smd.manifest.diff import format_bytes
+from smd.manifest.format import iter_mappings, read_layout, read_metadata
+
+logger = logging.getLogger(__name__)
+
+DIRECTORY_FLAG = 0x40
+"EDepotFileFlag.Directory"
+
+SIZE_BUCKETS: list[tuple[str, int]] = [
+    ("< 1 KiB", 1 << 10),
+    ("< 64 KiB", 64 << 10),
+    ("< 1 MiB", 1 << 20),
+    ("< 16 MiB", 16 << 20),
+    ("< 256 MiB", 256 << 20),
+    ("< 1 GiB", 1 << 30),
+]
+LARGEST_BUCKET = ">= 1 GiB"
+
+EXPORT_FIELDS = [
+    "filename", "size", "flags", "chunks", "compressed_size", "sha_content",
+]
+
+
+class FileRecord(NamedTuple):
+    filename: str
+    size: int
+    flags: int
+    chunks: int
+    compressed_size: int
+    "Sum of the file's chunks, compressed"
+    sha_content: str
+
+    @property
+    def is_directory(self) -> bool:
+        return bool(self.flags & DIRECTORY_FLAG)
+
+
+@dataclass
+class ManifestSummary:
+    depot_id: int
+    manifest_id: int
+    creation_time: int
+    encrypted: bool
+    files: int = 0
+    directories: int = 0
+    total_size: int = 0
+    chunks: int = 0
+    "Chunk references, counting duplicates"
+    unique_chunks: int = 0
+    unique_original: int = 0
+    "Uncompressed size of the unique chunks"
+    unique_compressed: int = 0
+    size_histogram: dict[str, int] = field(default_factory=dict)
+    largest: list[tuple[int, str]] = field(default_factory=list)
+    "(size, filename), biggest first"
+
+    @property
+    def compression_ratio(self) -> float:
+        if not self.unique_compressed:
+            return 1.0
+        return self.unique_original / self.unique_compressed
+
+
+def _size_bucket(size: int) -> str:
+    for label, limit in SIZE_BUCKETS:
+        if size < limit:
+            return label
+    return LARGEST_BUCKET
+
+
+def _matches(filename: str, patterns: Sequence[str]) -> bool:
+    """Case-insensitive glob match on either path separator"""
+    name = filename.replace("\\", "/").lower()
+    return any(fnmatch.fnmatchcase(name, x.replace("\\", "/").lower()) for x in patterns)
+
+
+def _filtered_mappings(
+    path: Path, patterns: Sequence[str], dec_key: Optional[str]
+) -> Iterator[tuple[str, ContentManifestPayload.FileMapping]]:
+    with path.open("rb") as f:
+        layout = read_layout(f)
+        encrypted = read_metadata(f, layout).filenames_encrypted
+        key_bytes = bytes.fromhex(dec_key) if dec_key and encrypted else None
+        for mapping in iter_mappings(f, layout):
+            filename = mapping.filename
+            if key_bytes is not None:
+                filename = decrypt_filename(filename, key_bytes)
+            if patterns and not _matches(filename, patterns):
+                continue
+            yield filename, mapping
+
+
+def iter_files(
+    path: Path,
+    patterns: Sequence[str] = (),
+    dec_key: Optional[str] = None,
+) -> Iterator[FileRecord]:
+    """
+    Yields the files (and directories) of a manifest
+
+    Args:
+        path: The manifest file
+        patterns: Glob patterns on the filename. Any match is kept, no patterns keeps all
+        dec_key: Depot decryption key (hex), for manifests with encrypted filenames
+    """
+    for filename, mapping in _filtered_mappings(path, patterns, dec_key):
+        yield FileRecord(
+            filename,
+            mapping.size,
+            mapping.flags,
+            len(mapping.chunks),
+            sum(x.cb_compressed for x in mapping.chunks),
+            mapping.sha_content.hex(),
+        )
+
+
+def summarize(
+    path: Path,
+    patterns: Sequence[str] = (),
+    top: int = 10,
+    dec_key: Optional[str] = None,
+) -> ManifestSummary:
+    """Statistics of a manifest, or of the files matching `patterns`"""
+    with path.open("rb") as f:
+        metadata = read_metadata(f, read_layout(f))
+    summary = ManifestSummary(
+        metadata.depot_id,
+        metadata.gid_manifest,
+        metadata.creation_time,
+        metadata.filenames_encrypted,
+    )
+    largest: list[tuple[int, str]] = []
+    histogram = dict.fromkeys([x[0] for x in SIZE_BUCKETS] + [LARGEST_BUCKET], 0)
+    seen_chunks: set[int] = set()
+    for filename, mapping in _filtered_mappings(path, patterns, dec_key):
+        for chunk in mapping.chunks:
+            summary.chunks += 1
+            sha = int.from_bytes(chunk.sha[:8], "little")
+            if sha in seen_chunks:
+                continue
+            seen_chunks.add(sha)
+            summary.unique_chunks += 1
+            summary.unique_original += chunk.cb_original
+            summary.unique_compressed += chunk.cb_compressed
+
+        if mapping.flags & DIRECTORY_FLAG:
+            summary.directories += 1
+            continue
+        summary.files += 1
+        summary.total_size += mapping.size
+        histogram[_size_bucket(mapping.size)] += 1
+        if top > 0:
+            if len(largest) < top:
+                heapq.heappush(largest, (mapping.size, filename))
+            elif mapping.size > largest[0][0]:
+                heapq.heapreplace(largest, (mapping.size, filename))
+    summary.size_histogram = histogram
+    summary.largest = sorted(largest, reverse=True)
+    return summary
+
+
+def format_summary(summary: ManifestSummary) -> str:
+    lines = [
+        f"Depot {summary.depot_id}, manifest {summary.manifest_id}"
+        + (" (filenames encrypted)" if summary.encrypted else ""),
+        f"  Files: {summary.files} ({format_bytes(summary.total_size)}), "
+        f"directories: {summary.directories}",
+        f"  Chunks: {summary.chunks} ({summary.unique_chunks} unique, "
+        f"{format_bytes(summary.unique_compressed)} compressed)",
+        f"  Compression ratio: {summary.compression_ratio:.2f}",
+        "  Size histogram:",
+    ]
+    width = max((len(x) for x in summary.size_histogram), default=0)
+    for label, count in summary.size_histogram.items():
+        lines.append(f"    {label:>{width}}: {count}")
+    if summary.largest:
+        lines.append("  Largest files:")
+        for size, filename in summary.largest:
+            lines.append(f"    {format_bytes(size):>10}  {filename}")
+    return "\n".join(lines)
+
+
+def export_files(
+    path: Path,
+    out: TextIO,
+    fmt: str = "jsonl",
+    patterns: Sequence[str] = (),
+    dec_key: Optional[str] = None,
+) -> int:
+    """
+    Writes one row per file to `out` as it's read
+
+    Args:
+        fmt: "jsonl" or "csv"
+
+    Returns:
+        int: Number of rows written
+    """
+    if fmt not in ("jsonl", "csv"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    writer = None
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(EXPORT_FIELDS)
+    count = 0
+    for record in iter_files(path, patterns, dec_key):
+        if writer is not None:
+            writer.writerow(record)
+        else:
+            out.write(json.dumps(record._asdict()) + "\n")
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Inspect a manifest file")
+    parser.add_argument("manifest", type=Path)
+    parser.add_argument(
+        "-f", "--filter", action="append", default=[], metavar="GLOB",
+        help="Only files matching this glob (repeatable)",
+    )
+    parser.add_argument("--top", type=int, default=10, help="Largest files to list")
+    parser.add_argument("--export", choices=["jsonl", "csv"], help="Stream files to stdout")
+    parser.add_argument("--key", help="Depot decryption key, for encrypted filenames")
+    args = parser.parse_args()
+
+    if args.export:
+        export_files(args.manifest, sys.stdout, args.export, args.filter, args.key)
+    else:
+        print(format_summary(summarize(args.manifest, args.filter, args.top, args.key)))
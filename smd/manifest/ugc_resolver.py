@@ -1,5 +1,4 @@
 import logging
-import time
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Any, List, Optional, Union
@@ -106,7 +105,7 @@ class StandardUgcIdStrategy(IUgcIdStrategy):
                         ctx.client.anonymous_login()
                     except RuntimeError:
                         pass
-                    time.sleep(2)
+                    gevent.sleep(2)
                 else:
                     print(
                         "Request timed out after several attempts. "
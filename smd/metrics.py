@@ -0,0 +1,261 @@
+"""In-process metrics for the current session.
+
+Counters, gauges and histograms, optionally split by labels, kept in memory
+and dumped in Prometheus text format or JSON (see `--metrics` and the
+analytics menu). Unlike analytics, nothing is kept between runs: the point
+is to compare one run against another.
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+"Seconds"
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> Iterator[tuple[str, LabelKey, Any]]:
+        """(name suffix, labels, value) for the text format"""
+
+    @abstractmethod
+    def to_dict(self) -> dict[str, Any]: ...
+
+
+class Counter(Metric):
+    """Only goes up"""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield "", key, value
+
+    def to_dict(self):
+        return {"type": self.type, "help": self.help, "values": [
+            {"labels": dict(k), "value": v} for k, v in list(self._values.items())
+        ]}
+
+
+class Gauge(Counter):
+    """Goes up and down"""
+
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: Any):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets, like Prometheus does"""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: dict[LabelKey, list[int]] = {}
+        "Per bucket (not cumulative), plus one for +Inf"
+        self._sums: dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observes how long the block took, even if it raised"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: Any) -> int:
+        return sum(self._counts.get(_label_key(labels), []))
+
+    def samples(self):
+        for key, counts in list(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", key + (("le", _format_value(bound)),), cumulative
+            yield "_sum", key, self._sums.get(key, 0.0)
+            yield "_count", key, cumulative
+
+    def to_dict(self):
+        values = []
+        for key, counts in list(self._counts.items()):
+            total = sum(counts)
+            values.append({
+                "labels": dict(key),
+                "count": total,
+                "sum": self._sums.get(key, 0.0),
+                "buckets": {
+                    _format_value(bound): count
+                    for bound, count in zip(self.buckets + (math.inf,), counts)
+                },
+            })
+        return {"type": self.type, "help": self.help, "values": values}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def _get(self, cls: type, name: str, help: str, *args: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, *args)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already a {metric.type}")
+            return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(
+        self, name: str, help: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help, buckets)
+
+    def to_prometheus(self) -> str:
+        lines: list[str] = []
+        for name, metric in sorted(self._metrics.items()):
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for suffix, key, value in metric.samples():
+                lines.append(f"{name}{suffix}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "dumped_at": time.time(),
+            "metrics": {k: v.to_dict() for k, v in sorted(self._metrics.items())},
+        }
+
+    def dump(self, path: Path, fmt: Optional[str] = None) -> bool:
+        """
+        Writes every metric to `path`
+
+        Args:
+            fmt: "prometheus" or "json". By default it's JSON for .json files
+        """
+        if fmt is None:
+            fmt = "json" if path.suffix.lower() == ".json" else "prometheus"
+        if fmt not in ("prometheus", "json"):
+            raise ValueError(f"Unknown metrics format: {fmt}")
+        try:
+            text = (
+                json.dumps(self.to_dict(), indent=2)
+                if fmt == "json"
+                else self.to_prometheus()
+            )
+            temp_file = path.with_name(path.name + ".tmp")
+            temp_file.write_text(text, encoding="utf-8")
+            temp_file.replace(path)
+            logger.debug(f"Dumped {len(self._metrics)} metrics to {path}")
+            return True
+        except OSError as e:
+            logger.error(f"Failed to dump metrics: {e}", exc_info=True)
+            return False
+
+
+def record_latency(
+    endpoint: str, seconds: float, histogram: str, help: str = "", **labels: Any
+):
+    """Observes a network call in `histogram` and records it for analytics
+    under `endpoint`, so both come from the same timing"""
+    # analytics reads its file on first use, keep it out of import time
+    from smd.analytics import get_analytics_tracker
+
+    get_metrics().histogram(histogram, help).observe(seconds, **labels)
+    get_analytics_tracker().record_latency(endpoint, seconds)
+
+
+# Global registry instance
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get or create global registry instance"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
@@ -0,0 +1,96 @@
+"""Keeps the product info of every AppList / SLSSteam ID cached.
+
+Opt-in (see Settings.PREFETCH_PRODUCT_INFO). A daemon thread waits for the
+Steam session to log in, asks which apps changed, and fetches whatever isn't
+cached in small batches with a pause between them, so it never holds up a
+request made from a menu for long. It runs again every PREFETCH_INTERVAL.
+"""
+
+import logging
+import threading
+from typing import Callable, Optional
+
+from smd.steam_client import SteamInfoProvider
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_BATCH_SIZE = 50
+PREFETCH_BATCH_DELAY = 1.0
+"Seconds between batches"
+PREFETCH_INTERVAL = 30 * 60
+"Seconds between runs"
+RETRY_DELAY = 60
+"Seconds before trying again when Steam couldn't be reached"
+
+
+class ProductInfoPrefetcher:
+    def __init__(
+        self,
+        provider: SteamInfoProvider,
+        get_ids: Callable[[], Optional[list[int]]],
+        batch_size: int = PREFETCH_BATCH_SIZE,
+        interval: float = PREFETCH_INTERVAL,
+    ):
+        """
+        Args:
+            get_ids: Returns the IDs to keep cached, called on every run
+        """
+        self.provider = provider
+        self.get_ids = get_ids
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="smd-prefetch", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def run_once(self) -> Optional[int]:
+        """Fetches the info of every ID that isn't cached.
+        Returns how many were fetched, None if Steam couldn't be reached"""
+        if not self.provider.session.wait_ready(quiet=True):
+            return None
+        self.provider.refresh_changes()
+        try:
+            ids = self.get_ids() or []
+        except Exception as e:
+            logger.warning(f"Couldn't read the IDs to prefetch: {e}")
+            return 0
+        missing = self.provider.uncached(list(dict.fromkeys(ids)))
+        fetched = 0
+        try:
+            for i in range(0, len(missing), self.batch_size):
+                if self._stopping.is_set():
+                    break
+                batch = missing[i : i + self.batch_size]
+                try:
+                    self.provider.fetch_app_info(batch, quiet=True, save=False)
+                except Exception as e:
+                    logger.debug(f"Prefetching {len(batch)} apps failed: {e}")
+                    return None
+                fetched += len(batch)
+                self._stopping.wait(PREFETCH_BATCH_DELAY)
+        finally:
+            # Rewriting the cache file per batch adds up on big libraries
+            if fetched:
+                self.provider.save_cache()
+        logger.debug(f"Prefetched {fetched} of {len(ids)} apps")
+        return fetched
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                result = self.run_once()
+            except Exception as e:
+                logger.error(f"Product info prefetch failed: {e}", exc_info=True)
+                result = None
+            self._stopping.wait(RETRY_DELAY if result is None else self.interval)
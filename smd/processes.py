@@ -72,7 +72,7 @@ class SteamProcess:
         # or we couldn't kill it (user will need to do it manually)
         pass
 
-    def resolve_injector_path(self):
+    def resolve_injector_path(self, interactive: bool = True):
         candidates = ["DLLInjector.exe", "steam.exe"]
         matches = [
             x for x in map(lambda x: (self.injector_dir / x), candidates) if x.exists()
@@ -81,6 +81,9 @@ class SteamProcess:
             return str(matches[0].resolve())
         if len(matches) == 0:
             return None
+        if not interactive:
+            # Assume Normal Mode rather than renaming files without asking
+            return str(matches[0].resolve())
         print(f"The following were found: {', '.join(x.name for x in matches)}")
         if prompt_confirm("Is your GreenLuma installation in Normal Mode right now?"):
             return str(matches[0].resolve())
@@ -101,7 +104,11 @@ class SteamProcess:
         watcher.stop()
         if not do_start:
             return False
-        
+        return self.launch_or_restart()
+
+    def launch_or_restart(self, interactive: bool = True):
+        """Restarts Steam (or starts it if it's closed).
+        When not interactive, a stuck Steam gets force closed without asking"""
         if is_proc_running(self.exe_name):
             print("Killing Steam...", flush=True, end="")
             self.kill()
@@ -113,7 +120,7 @@ class SteamProcess:
             while is_proc_running(self.exe_name):
                 if time.time() - wait_start > max_wait:
                     print("\nSteam is taking too long to close.")
-                    if prompt_confirm("Force close Steam?"):
+                    if not interactive or prompt_confirm("Force close Steam?"):
                         # Force kill with taskkill
                         subprocess.run(
                             ["taskkill", "/F", "/IM", self.exe_name],
@@ -123,6 +130,8 @@ class SteamProcess:
                         time.sleep(2)
                         if is_proc_running(self.exe_name):
                             print("Could not close Steam. Please close it manually.")
+                            if not interactive:
+                                return False
                             input("Press Enter after closing Steam...")
                         break
                     else:
@@ -133,7 +142,7 @@ class SteamProcess:
             if not is_proc_running(self.exe_name):
                 print(" Done!")
         
-        injector = self.resolve_injector_path()
+        injector = self.resolve_injector_path(interactive)
         if injector is None:
             print("Could not find any matching executables. Launch it yourself.")
             return False
@@ -177,11 +186,13 @@ class SteamProcess:
                 error_msg = error_messages.get(ret, f"Unknown error (code {ret})")
                 print(f"\nFailed to launch Steam: {error_msg}")
                 print("Please launch Steam manually from your Start Menu or Desktop.")
-                input("Press Enter after launching Steam...")
+                if interactive:
+                    input("Press Enter after launching Steam...")
                 return False
                 
         except Exception as e:
             print(f"\nError launching Steam: {e}")
             print("Please launch Steam manually from your Start Menu or Desktop.")
-            input("Press Enter after launching Steam...")
+            if interactive:
+                input("Press Enter after launching Steam...")
             return False
@@ -0,0 +1,96 @@
+"""CPU and memory profiles of menu actions.
+
+With `--profile` or the "Profile Menu Actions" setting, each action picked
+from the main menu runs under cProfile and tracemalloc. The results go to the
+profiles folder as a .pstats file (open with `python -m pstats` or snakeviz)
+and a .txt summary with the slowest functions and the top allocation sites.
+cProfile only sees the thread the action runs on, so time spent in worker
+threads shows up as waiting. When off, nothing is imported or started.
+"""
+
+import io
+import logging
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+from typing import ContextManager, Iterator
+
+from smd.storage.settings import get_setting
+from smd.structs import Settings
+from smd.utils import root_folder
+
+logger = logging.getLogger(__name__)
+
+PROFILES_FOLDER = root_folder(outside_internal=True) / "profiles"
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+TRACEMALLOC_FRAMES = 10
+
+
+def profiling_enabled(forced: bool = False) -> bool:
+    return forced or bool(get_setting(Settings.PROFILE_ACTIONS))
+
+
+def profile_action(
+    name: str, forced: bool = False, folder: Path = PROFILES_FOLDER
+) -> ContextManager[None]:
+    """Profiles the block if profiling is on. `forced` is the --profile flag"""
+    if not profiling_enabled(forced):
+        return nullcontext()
+    return _profile(name, folder)
+
+
+@contextmanager
+def _profile(name: str, folder: Path) -> Iterator[None]:
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiler is already active
+        logger.warning(f"Couldn't start the CPU profiler: {e}")
+        profiler = None
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        stem = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name.lower()}"
+        summary = io.StringIO()
+        summary.write(f"{name}: {elapsed:.3f}s\n")
+        summary.write(
+            f"Traced memory: {current / 2**20:.1f} MiB at the end, "
+            f"{peak / 2**20:.1f} MiB peak\n\n"
+        )
+        summary.write(f"Top {TOP_ALLOCATIONS} allocation sites:\n")
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            summary.write(f"  {stat}\n")
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            if profiler is not None:
+                profiler.dump_stats(folder / f"{stem}.pstats")
+                summary.write(f"\nTop {TOP_FUNCTIONS} functions by cumulative time:\n")
+                stats = pstats.Stats(profiler, stream=summary)
+                stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+            (folder / f"{stem}.txt").write_text(summary.getvalue(), encoding="utf-8")
+            logger.info(f"Saved profile of {name} to {folder / stem}.*")
+        except OSError as e:
+            logger.error(f"Failed to save profile of {name}: {e}", exc_info=True)
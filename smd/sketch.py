@@ -0,0 +1,99 @@
+"""Streaming quantile sketch for latencies.
+
+Values go into logarithmic buckets, so any quantile is within `accuracy`
+(relative) of the true value no matter how many values were added. Memory
+only grows with the range of values seen, and sketches can be merged, which
+makes them cheap to keep per time bucket (same idea as DDSketch).
+"""
+
+import math
+from typing import Any, Iterable, Optional
+
+DEFAULT_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """Mergeable sketch of positive values (seconds, bytes, ...)"""
+
+    def __init__(self, accuracy: float = DEFAULT_ACCURACY):
+        self.accuracy = accuracy
+        self._gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+        "Values too small to have a bucket (<= 0)"
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        if other.accuracy != self.accuracy:
+            raise ValueError("Can't merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated value at quantile `q` (0 to 1). None if empty"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                estimate = 2 * self._gamma**index / (self._gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "accuracy": self.accuracy,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "zero_count": self.zero_count,
+            "bins": {str(k): v for k, v in self.bins.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(data.get("accuracy", DEFAULT_ACCURACY))
+        sketch.count = data.get("count", 0)
+        sketch.total = data.get("total", 0.0)
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.bins = {int(k): v for k, v in data.get("bins", {}).items()}
+        return sketch
+
+    @classmethod
+    def merged(cls, sketches: Iterable["QuantileSketch"]) -> "QuantileSketch":
+        result = cls()
+        for sketch in sketches:
+            result.merge(sketch)
+        return result
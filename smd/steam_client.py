@@ -1,11 +1,11 @@
 import json
+import threading
 import time
-from typing import Any, Union
-
-import gevent
-from steam.client import SteamClient  # type: ignore
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, Optional, TypeVar, Union
 
 from smd.cache import get_cache
+from smd.metrics import get_metrics, record_latency
+from smd.steam_session import SteamSession, get_steam_session
 from smd.structs import DLCTypes, ProductInfo  # type: ignore
 import logging
 
@@ -13,6 +13,13 @@ from smd.utils import enter_path
 
 logger = logging.getLogger(__name__)
 
+if TYPE_CHECKING:
+    # steam.client pulls in gevent, which is slow to import. The session
+    # thread imports it for real
+    from steam.client import SteamClient  # type: ignore
+
+_T = TypeVar("_T")
+
 
 def get_product_info(provider: "SteamInfoProvider", app_ids: list[int]) -> ProductInfo:
     """Here for backwards compatibility"""
@@ -21,38 +28,90 @@ def get_product_info(provider: "SteamInfoProvider", app_ids: list[int]) -> Produ
 
 _MAX_APP_INFO_RETRIES = 3
 
+APP_INFO_TTL = 7 * 24 * 3600
+"""Change numbers catch updates, so this only matters when Steam
+can't be asked what changed"""
+UNCHECKED_APP_INFO_TTL = 3600
+"Max age of cached info used while Steam couldn't be asked what changed"
+CHANGE_CHECK_INTERVAL = 60
+"Seconds between asking Steam for changes"
+CHANGE_CHECK_TIMEOUT = 15
+CHANGE_NUMBER_KEY = "pics_change_number"
+
+
+class PICSChanges(NamedTuple):
+    change_number: int
+    "The current PICS change number"
+    apps: dict[int, int]
+    "App ID -> change number, for every app that changed since the one asked for"
+    full_update: bool
+    "Steam doesn't know the changes since then, so anything might have changed"
+
+
+def _get_changes_since(client: "SteamClient", change_number: int) -> Optional[PICSChanges]:
+    """Runs on the session thread. None on timeout"""
+    response = client.get_changes_since(change_number, app_changes=True, package_changes=False)
+    if response is None:
+        return None
+    return PICSChanges(
+        response.current_change_number,
+        {x.appid: x.change_number for x in response.app_changes},
+        response.force_full_update or response.force_full_app_update,
+    )
+
+
+def _get_product_info(
+    client: "SteamClient", app_ids: list[int], quiet: bool = False
+) -> ProductInfo:
+    """Runs on the session thread (see SteamSession.call)"""
+    import gevent
+
+    say = print if not quiet else lambda *args, **kwargs: None
 
-def _get_product_info(client: SteamClient, app_ids: list[int]) -> ProductInfo:
     if len(app_ids) == 0:
         raise ValueError("app_ids cannot be empty.")
     if not client.logged_on:
-        print("Logging in anonymously...", end="", flush=True)
+        say("Logging in anonymously...", end="", flush=True)
         client.anonymous_login()
-        print(" Done!")
+        say(" Done!")
     last_error = None
     for attempt in range(1, _MAX_APP_INFO_RETRIES + 1):
         try:
-            print("Getting app info...")
+            say("Getting app info...")
             logger.debug(f"Getting info for {', '.join([str(x) for x in app_ids])}")
             start = time.time()
-            info = client.get_product_info(  # pyright: ignore[reportUnknownMemberType]
-                app_ids
-            )
+            try:
+                info = client.get_product_info(  # pyright: ignore[reportUnknownMemberType]
+                    app_ids
+                )
+            finally:
+                record_latency(
+                    "product_info",
+                    time.time() - start,
+                    "smd_product_info_seconds",
+                    "Duration of get_product_info requests",
+                )
             # only none when app_ids is empty, which never happens
             assert info is not None
             logger.debug(f"Product info request took: {time.time() - start}s")
+            get_metrics().counter(
+                "smd_product_info_apps_total", "Apps requested in get_product_info"
+            ).inc(len(app_ids))
             return ProductInfo(info)
         except gevent.Timeout as e:
             last_error = e
+            get_metrics().counter(
+                "smd_product_info_timeouts_total", "Timed out get_product_info requests"
+            ).inc()
             if attempt < _MAX_APP_INFO_RETRIES:
-                print(f"Request timed out. Trying again ({attempt}/{_MAX_APP_INFO_RETRIES})...")
+                say(f"Request timed out. Trying again ({attempt}/{_MAX_APP_INFO_RETRIES})...")
                 try:
                     client.anonymous_login()
                 except RuntimeError:
                     pass
-                time.sleep(2)
+                gevent.sleep(2)
             else:
-                print(
+                say(
                     "Request timed out after several attempts. "
                     "Check your internet connection and Steam status, then try again later."
                 )
@@ -62,50 +121,153 @@ def _get_product_info(client: SteamClient, app_ids: list[int]) -> ProductInfo:
 class SteamInfoProvider:
     """Wrapper for SteamClient to handle API calls and caching."""
 
-    def __init__(self, client: SteamClient):
-        self.client = client
+    def __init__(self, client: Optional["SteamClient"] = None):
+        self.session = get_steam_session() if client is None else SteamSession(client)
         self._cache: dict[int, Any] = {}
         """A cache of app IDs and their data taken
         from the `apps` key of `get_product_info`.
         Values are False if it's not a base app ID"""
+        self._cache_lock = threading.Lock()
+        "The prefetch thread fills `_cache` while menus read it"
         self._persistent_cache = get_cache()
+        self._last_change_check: Optional[float] = None
+        self._changes_checked = False
+        """Whether the last change check reached Steam. Otherwise cached info
+        older than UNCHECKED_APP_INFO_TTL is fetched again"""
+
+    @property
+    def client(self) -> "SteamClient":
+        """Only touch it through `call`, it belongs to the session thread"""
+        return self.session.client
+
+    def warm_up(self):
+        """Starts logging in to Steam in the background"""
+        self.session.warm_up()
+
+    def call(self, fn: Callable[..., _T], *args: Any) -> _T:
+        """Runs `fn(client, *args)` once logged in. See SteamSession.call"""
+        return self.session.call(fn, *args)
+
+    def refresh_changes(self) -> Optional[int]:
+        """Asks Steam which apps changed since the last known PICS change
+        number and invalidates their cached info. Everything is invalidated
+        if Steam says to do a full update. Without a known change number
+        (first run), the current one is only recorded.
+
+        Returns:
+            How many apps were invalidated, None if Steam couldn't be asked
+        """
+        self._last_change_check = time.monotonic()
+        since = self._persistent_cache.get(CHANGE_NUMBER_KEY) or 0
+        try:
+            changes = self.session.call(
+                _get_changes_since, since, timeout=CHANGE_CHECK_TIMEOUT
+            )
+        except Exception as e:
+            logger.debug(f"Couldn't get PICS changes since {since}: {e}")
+            changes = None
+        self._changes_checked = changes is not None
+        if changes is None:
+            return None
+
+        if not since:
+            # Nothing to compare against yet. Entries older than this still
+            # expire by APP_INFO_TTL
+            invalidated = 0
+        elif changes.full_update:
+            invalidated = self._persistent_cache.invalidate_prefix("app_info_")
+            with self._cache_lock:
+                self._cache.clear()
+        else:
+            stale: list[int] = []
+            for app_id, change_number in changes.apps.items():
+                cached = self._persistent_cache.get(f"app_info_{app_id}")
+                if cached is None:
+                    continue
+                if not isinstance(cached, dict) or cached.get("_change_number", 0) < change_number:
+                    stale.append(app_id)
+            self._persistent_cache.invalidate_many([f"app_info_{x}" for x in stale])
+            with self._cache_lock:
+                for app_id in stale:
+                    self._cache.pop(app_id, None)
+            invalidated = len(stale)
+        self._persistent_cache.set(CHANGE_NUMBER_KEY, changes.change_number, APP_INFO_TTL)
+        logger.debug(
+            f"PICS change number {since} -> {changes.change_number}, "
+            f"{len(changes.apps)} apps changed, {invalidated} cached apps invalidated"
+        )
+        return invalidated
 
     def get_app_info(self, app_ids: list[int]) -> dict[int, Any]:
-        # Check persistent cache first
+        if (
+            self._last_change_check is None
+            or time.monotonic() - self._last_change_check >= CHANGE_CHECK_INTERVAL
+        ):
+            # Cached info is only trusted once Steam said what changed. If
+            # nothing is cached, the fetch logs in anyway
+            if self.session.ready or len(self.uncached(app_ids)) < len(app_ids):
+                if self.session.wait_ready(CHANGE_CHECK_TIMEOUT):
+                    self.refresh_changes()
+                else:
+                    self._last_change_check = time.monotonic()
+                    self._changes_checked = False
+
+        missing = self.uncached(app_ids)
+        if missing:
+            self.fetch_app_info(missing)
+        else:
+            print("Reading app info from cache...")
+
+        with self._cache_lock:
+            return {
+                app_id: self._cache[app_id]
+                for app_id in app_ids
+                if self._cache.get(app_id)
+            }
+
+    def uncached(self, app_ids: list[int]) -> list[int]:
+        """The apps whose info isn't cached. Cached ones are loaded into memory.
+        Until a change check reaches Steam, info older than
+        UNCHECKED_APP_INFO_TTL counts as not cached"""
+        max_age = None if self._changes_checked else UNCHECKED_APP_INFO_TTL
         missing = []
-        for app_id in app_ids:
-            if app_id not in self._cache:
-                # Try persistent cache
+        with self._cache_lock:
+            for app_id in app_ids:
+                in_memory = self._cache.get(app_id)
+                if in_memory is False or (in_memory is not None and max_age is None):
+                    continue
+                # Try persistent cache, which also knows how old it is
                 cache_key = f"app_info_{app_id}"
-                cached_data = self._persistent_cache.get(cache_key)
+                cached_data = self._persistent_cache.get(cache_key, max_age)
                 if cached_data is not None:
                     self._cache[app_id] = cached_data
                     logger.debug(f"Loaded app {app_id} from persistent cache")
                 else:
                     missing.append(app_id)
-        
-        if missing:
-            info = _get_product_info(self.client, missing)
-            apps: dict[int, Any] = info.get("apps", {})
-            valid_ids = set(apps.keys())
-            invalid_ids = set(missing) - valid_ids
-            
-            # Update both in-memory and persistent cache
+        return missing
+
+    def fetch_app_info(
+        self, app_ids: list[int], quiet: bool = False, save: bool = True
+    ):
+        """Gets the info from Steam, whether cached or not, and caches it.
+        With `save=False` the persistent cache is left for the caller to save"""
+        info = self.session.call(_get_product_info, app_ids, quiet)
+        apps: dict[int, Any] = info.get("apps", {})
+        invalid_ids = set(app_ids) - set(apps.keys())
+
+        # Update both in-memory and persistent cache
+        with self._cache_lock:
             for app_id, app_data in apps.items():
                 self._cache[app_id] = app_data
-                cache_key = f"app_info_{app_id}"
-                self._persistent_cache.set(cache_key, app_data)
-            
             for app_id in invalid_ids:
                 self._cache[app_id] = False
-        else:
-            print("Reading app info from cache...")
+        self._persistent_cache.set_many(
+            {f"app_info_{k}": v for k, v in apps.items()}, APP_INFO_TTL, save
+        )
 
-        return {
-            app_id: self._cache.get(app_id, {})
-            for app_id in app_ids
-            if self._cache.get(app_id, {})
-        }
+    def save_cache(self):
+        """Writes the persistent cache, see `fetch_app_info(save=False)`"""
+        self._persistent_cache.save()
 
     def get_single_app_info(self, app_id: int) -> dict[str, Any]:
         result = self.get_app_info([app_id])
@@ -0,0 +1,285 @@
+"""An anonymous Steam session that lives on its own thread.
+
+SteamClient is built on gevent, so it only makes progress while its hub runs.
+The main thread spends most of its time blocked in prompts, so the client gets
+a daemon thread that keeps the hub running. That thread logs in ahead of time,
+heartbeats, and reconnects when the connection drops. gevent objects can't be
+shared between threads, so anything that touches the client runs on that
+thread through `call`.
+"""
+
+import atexit
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
+
+from smd.event_loop import wait_for_future
+from smd.tracing import span, traced
+
+if TYPE_CHECKING:
+    from steam.client import SteamClient  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+POLL_INTERVAL = 0.05
+"How long the hub runs between checks for new jobs"
+KEEPALIVE_INTERVAL = 30
+"Seconds between checks that the session is still logged on"
+CONNECT_RETRIES = 3
+MAX_BACKOFF = 60
+
+
+class SessionState(Enum):
+    IDLE = "Not connected"
+    CONNECTING = "Connecting to Steam"
+    LOGGING_IN = "Logging in anonymously"
+    READY = "Logged in"
+    RECONNECTING = "Reconnecting to Steam"
+    FAILED = "Couldn't log in"
+
+
+class SteamSession:
+    """Owns a SteamClient and the thread its hub runs on. Started on first use"""
+
+    def __init__(self, client: Optional["SteamClient"] = None):
+        self._client = client
+        self._jobs: "queue.Queue[tuple[Callable[..., Any], tuple[Any, ...], concurrent.futures.Future[Any]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._client_created = threading.Event()
+        self._ready = threading.Event()
+        self._stopping = threading.Event()
+        self._attempt_done = threading.Condition()
+        self._attempts = 0
+        "Finished login attempts, so waiters can tell a fresh failure from an old one"
+        self._state = SessionState.IDLE
+        self._want_login = False
+        self._next_attempt = 0.0
+        self._failures = 0
+        self.last_error: Optional[BaseException] = None
+
+    @property
+    def state(self) -> SessionState:
+        return self._state
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def _set_state(self, state: SessionState):
+        if state != self._state:
+            logger.debug(f"Steam session: {state.value}")
+        self._state = state
+
+    def start(self):
+        """Starts the thread if it isn't running. Doesn't log in by itself"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="smd-steam-session", daemon=True
+            )
+            self._thread.start()
+
+    def warm_up(self):
+        """Starts connecting and logging in in the background. Returns right away"""
+        self._want_login = True
+        self.start()
+
+    def wait_ready(self, timeout: Optional[float] = None, quiet: bool = False) -> bool:
+        """Blocks until logged in, only for whatever part of the login is
+        still outstanding. Returns False as soon as a login attempt fails,
+        or on timeout"""
+        if self._ready.is_set():
+            return True
+        with self._attempt_done:
+            attempts = self._attempts
+        self._next_attempt = 0.0  # Don't sit out a backoff while someone waits
+        self.warm_up()
+        if not quiet:
+            state = self._state
+            if state in (SessionState.IDLE, SessionState.FAILED):
+                state = SessionState.LOGGING_IN
+            print(f"{state.value}...", end="", flush=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._attempt_done:
+            while not self._ready.is_set() and self._attempts == attempts:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                # Wake up regularly so Ctrl+C works
+                self._attempt_done.wait(0.1 if remaining is None else min(0.1, remaining))
+        ready = self._ready.is_set()
+        if not quiet:
+            print(" Done!" if ready else " Failed!")
+        return ready
+
+    @property
+    def client(self) -> "SteamClient":
+        """The client. Only touch it from inside `call`"""
+        self.start()
+        self._client_created.wait()
+        assert self._client is not None
+        return self._client
+
+    def in_session(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(
+        self, fn: Callable[..., _T], *args: Any
+    ) -> "concurrent.futures.Future[_T]":
+        """Schedules `fn(client, *args)` on the session thread"""
+        self.start()
+        future: "concurrent.futures.Future[_T]" = concurrent.futures.Future()
+        self._jobs.put((fn, args, future))
+        return future
+
+    def call(
+        self,
+        fn: Callable[..., _T],
+        *args: Any,
+        login: bool = True,
+        timeout: Optional[float] = None,
+    ) -> _T:
+        """Runs `fn(client, *args)` on the session thread and returns its result.
+        Exceptions, including gevent.Timeout, are raised here
+
+        Args:
+            login: Wait for the login first
+
+        Raises:
+            ConnectionError: If `login` and logging in failed
+        """
+        if self.in_session():
+            return fn(self.client, *args)
+        if login and not self.wait_ready():
+            raise ConnectionError(f"Couldn't log in to Steam: {self.last_error}")
+        return wait_for_future(self.submit(fn, *args), timeout)
+
+    def stop(self):
+        """Logs out and stops the thread"""
+        with self._lock:
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._stopping.set()
+        thread.join(timeout=3)
+
+    def _run(self):
+        import gevent
+        from steam.client import SteamClient  # type: ignore
+
+        if self._client is None:
+            self._client = SteamClient()
+        client = self._client
+        client.on(SteamClient.EVENT_DISCONNECTED, self._on_disconnected)
+        self._client_created.set()
+
+        login: Optional[gevent.Greenlet] = None
+        last_check = time.monotonic()
+        while not self._stopping.is_set():
+            while True:
+                try:
+                    fn, args, future = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                gevent.spawn(self._run_job, client, fn, args, future)
+
+            now = time.monotonic()
+            logging_in = login is not None and not login.dead
+            if (
+                self._want_login
+                and not self._ready.is_set()
+                and not logging_in
+                and now >= self._next_attempt
+            ):
+                login = gevent.spawn(self._login, client)
+            elif self._ready.is_set() and now - last_check >= KEEPALIVE_INTERVAL:
+                # The client heartbeats by itself while the hub runs. This
+                # catches sessions that died quietly
+                last_check = now
+                if not (client.connected and client.logged_on):
+                    logger.debug("Steam session went stale, logging in again")
+                    self._ready.clear()
+                    self._set_state(SessionState.RECONNECTING)
+            gevent.sleep(POLL_INTERVAL)
+
+        try:
+            if client.logged_on:
+                client.logout()
+            client.disconnect()
+        except Exception as e:
+            logger.debug(f"Error closing Steam session: {e}")
+        self._ready.clear()
+        self._set_state(SessionState.IDLE)
+
+    @staticmethod
+    def _run_job(client: "SteamClient", fn, args, future: "concurrent.futures.Future[Any]"):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with span(f"steam:{getattr(fn, '__name__', 'job')}"):
+                result = fn(client, *args)
+            future.set_result(result)
+        except BaseException as e:
+            future.set_exception(e)
+
+    @traced("steam_login")
+    def _login(self, client: "SteamClient"):
+        from steam.enums import EResult  # type: ignore
+
+        try:
+            if not client.connected:
+                if self._state != SessionState.RECONNECTING:
+                    self._set_state(SessionState.CONNECTING)
+                if not client.connect(retry=CONNECT_RETRIES):
+                    raise ConnectionError("Couldn't connect to a Steam server")
+            self._set_state(SessionState.LOGGING_IN)
+            if not client.logged_on:
+                result = client.anonymous_login()
+                if result != EResult.OK:
+                    raise ConnectionError(f"Anonymous login failed: {result!r}")
+            self._failures = 0
+            self.last_error = None
+            self._ready.set()
+            self._set_state(SessionState.READY)
+        except Exception as e:
+            self._failures += 1
+            self.last_error = e
+            self._next_attempt = time.monotonic() + min(MAX_BACKOFF, 2**self._failures)
+            self._set_state(SessionState.FAILED)
+            logger.debug(f"Steam login failed ({self._failures} in a row): {e}")
+        finally:
+            with self._attempt_done:
+                self._attempts += 1
+                self._attempt_done.notify_all()
+
+    def _on_disconnected(self):
+        was_ready = self._ready.is_set()
+        self._ready.clear()
+        if self._want_login and not self._stopping.is_set():
+            self._set_state(SessionState.RECONNECTING)
+            if was_ready:
+                self._next_attempt = 0.0
+        else:
+            self._set_state(SessionState.IDLE)
+
+
+# Global session instance
+_steam_session: Optional[SteamSession] = None
+
+
+def get_steam_session() -> SteamSession:
+    """Get or create global session instance"""
+    global _steam_session
+    if _steam_session is None:
+        _steam_session = SteamSession()
+        atexit.register(_steam_session.stop)
+    return _steam_session
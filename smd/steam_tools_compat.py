@@ -8,9 +8,10 @@ so games and DLCs work with or without GreenLuma's DLLInjector.
 """
 
 import logging
-import shutil
 from pathlib import Path
 
+from smd.file_sync import SyncResult, copy_if_changed, get_hash_cache, sync_folder
+
 logger = logging.getLogger(__name__)
 
 STPLUGIN_DIR = "stplug-in"
@@ -37,8 +38,11 @@ def install_lua_to_steam(steam_path: Path, app_id: str, lua_source_path: Path) -
     try:
         dest_dir.mkdir(parents=True, exist_ok=True)
         dest_file = dest_dir / f"{app_id}.lua"
-        shutil.copy2(lua_source_path, dest_file)
-        logger.info("Installed LUA to Steam config: %s", dest_file)
+        if copy_if_changed(lua_source_path, dest_file):
+            logger.info("Installed LUA to Steam config: %s", dest_file)
+        else:
+            logger.debug("LUA already up to date in Steam config: %s", dest_file)
+        get_hash_cache().save()
         return True
     except OSError as e:
         logger.warning("Could not install LUA to Steam config: %s", e)
@@ -63,41 +67,45 @@ def sync_manifest_to_config_depotcache(steam_path: Path, manifest_path: Path) ->
         config_depot = steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR)
         config_depot.mkdir(parents=True, exist_ok=True)
         dest = config_depot / manifest_path.name
-        if dest != manifest_path:
-            shutil.copy2(manifest_path, dest)
+        if dest != manifest_path and copy_if_changed(manifest_path, dest):
             logger.debug("Synced manifest to config/depotcache: %s", dest.name)
+        # Only writes if comparing them had to hash something new
+        get_hash_cache().save()
         return True
     except OSError as e:
         logger.debug("Could not sync manifest to config/depotcache: %s", e)
         return False
 
 
-def sync_all_saved_lua_to_steam(steam_path: Path, saved_lua_dir: Path) -> int:
+def sync_all_saved_lua_to_steam(
+    steam_path: Path, saved_lua_dir: Path, remove_orphans: bool = False
+) -> SyncResult:
     """
-    Copy all .lua files from saved_lua into Steam config/stplug-in.
+    Copy the .lua files from saved_lua that changed into Steam config/stplug-in.
     Use this to make all previously backed-up games work without DLLInjector.
 
+    Args:
+        remove_orphans: Also delete {app_id}.lua files in stplug-in that
+            saved_lua doesn't have
+
     Returns:
-        Number of LUAs copied.
+        Copied, skipped and removed counts.
     """
-    if not saved_lua_dir.exists():
-        return 0
-    count = 0
-    dest_dir = steam_path / "config" / STPLUGIN_DIR
-    try:
-        dest_dir.mkdir(parents=True, exist_ok=True)
-        for lua_file in saved_lua_dir.glob("*.lua"):
-            app_id = lua_file.stem
-            if not app_id.isdigit():
-                continue
-            dest_file = dest_dir / f"{app_id}.lua"
-            shutil.copy2(lua_file, dest_file)
-            count += 1
-        if count:
-            logger.info("Synced %d LUA(s) to Steam config/stplug-in", count)
-    except OSError as e:
-        logger.warning("Could not sync saved LUAs to Steam: %s", e)
-    return count
+    result = sync_folder(
+        saved_lua_dir,
+        steam_path / "config" / STPLUGIN_DIR,
+        "*.lua",
+        include=lambda x: x.stem.isdigit(),
+        remove_orphans=remove_orphans,
+    )
+    if result.changed:
+        logger.info(
+            "Synced LUAs to Steam config/stplug-in: %d copied, %d removed",
+            result.copied, result.removed,
+        )
+    for path, error in result.failed:
+        logger.warning("Could not sync %s to Steam: %s", path.name, error)
+    return result
 
 
 def remove_lua_from_steam(steam_path: Path, app_id: str | int) -> bool:
@@ -119,28 +127,21 @@ def remove_lua_from_steam(steam_path: Path, app_id: str | int) -> bool:
         return False
 
 
-def sync_all_manifests_to_config_depotcache(steam_path: Path) -> int:
+def sync_all_manifests_to_config_depotcache(steam_path: Path) -> SyncResult:
     """
-    Copy all manifests from Steam/depotcache to Steam/config/depotcache
-    so both locations are populated (for Steam Tools compatibility).
+    Copy the manifests from Steam/depotcache that config/depotcache doesn't
+    have yet, so both locations are populated (for Steam Tools compatibility).
 
     Returns:
-        Number of manifest files copied.
+        Copied and skipped counts.
     """
-    depotcache = steam_path / "depotcache"
-    config_depot = steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR)
-    if not depotcache.exists():
-        return 0
-    count = 0
-    try:
-        config_depot.mkdir(parents=True, exist_ok=True)
-        for manifest_file in depotcache.glob("*.manifest"):
-            dest = config_depot / manifest_file.name
-            if not dest.exists() or dest.stat().st_mtime < manifest_file.stat().st_mtime:
-                shutil.copy2(manifest_file, dest)
-                count += 1
-        if count:
-            logger.info("Synced %d manifest(s) to config/depotcache", count)
-    except OSError as e:
-        logger.warning("Could not sync manifests to config/depotcache: %s", e)
-    return count
+    result = sync_folder(
+        steam_path / "depotcache",
+        steam_path.joinpath(*CONFIG_DEPOTCACHE_SUBDIR),
+        "*.manifest",
+    )
+    if result.copied:
+        logger.info("Synced %d manifest(s) to config/depotcache", result.copied)
+    for path, error in result.failed:
+        logger.warning("Could not sync %s to config/depotcache: %s", path.name, error)
+    return result
@@ -78,6 +78,18 @@ class ACFParser:
         )
         return raw_install_dir if raw_install_dir else ""
 
+    @property
+    def installed_manifests(self) -> dict[str, str]:
+        """Depot ID -> manifest ID of every depot that's installed"""
+        depots = enter_path(self.data, "AppState", "InstalledDepots", default=None)
+        if not depots:
+            return {}
+        return {
+            str(depot_id): str(info["manifest"])
+            for depot_id, info in depots.items()
+            if isinstance(info, dict) and info.get("manifest")
+        }
+
     def needs_update(self):
         state = self.state
         if state and AppState.StateUpdateRequired in state:
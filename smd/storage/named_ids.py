@@ -1,9 +1,28 @@
 import json
+import logging
+import time
 from pathlib import Path
+from typing import Optional
 
-from smd.http_utils import get_game_name
+from colorama import Fore, Style
+
+from smd.cache import get_cache
+from smd.event_loop import run_sync
+from smd.http_utils import get_game_names, placeholder_game_name
+from smd.prompts import prompt_text
+from smd.storage.acf import ACFParser
+from smd.storage.vdf import get_steam_libs
 from smd.structs import NamedIDs
 
+logger = logging.getLogger(__name__)
+
+NAME_RETRY_INTERVAL = 24 * 3600
+"Seconds before looking up a game that only has a placeholder name again"
+
+
+def _retry_key(app_id: str) -> str:
+    return f"name_attempt_{app_id}"
+
 
 def _load_named_ids(file: Path) -> NamedIDs:
     if not file.exists():
@@ -17,13 +36,92 @@ def _save_named_ids(file: Path, data: NamedIDs):
         json.dump(data, f, indent=2)
 
 
-def get_named_ids(folder: Path) -> NamedIDs:
+def _names_from_acfs(steam_path: Path, app_ids: list[str]) -> dict[str, str]:
+    """Names from the .acf files of installed games. No network"""
+    libs: list[Path] = []
+    try:
+        libs = get_steam_libs(steam_path)
+    except Exception as e:
+        logger.debug(f"get_steam_libs failed, using steam path only: {e}")
+    if not libs:
+        libs = [steam_path]
+    names: dict[str, str] = {}
+    for app_id in app_ids:
+        for lib in libs:
+            acf_path = lib / "steamapps" / f"appmanifest_{app_id}.acf"
+            if not acf_path.exists():
+                continue
+            try:
+                if name := ACFParser(acf_path).name:
+                    names[app_id] = name
+                    break
+            except Exception as e:
+                logger.debug(f"ACF parse failed for {acf_path}: {e}")
+    return names
+
+
+def _names_from_product_info_cache(app_ids: list[str]) -> dict[str, str]:
+    """Names from product info that SteamInfoProvider already cached. No network"""
+    cache = get_cache()
+    names: dict[str, str] = {}
+    for app_id in app_ids:
+        app_info = cache.get(f"app_info_{app_id}")
+        if isinstance(app_info, dict):
+            if name := app_info.get("common", {}).get("name"):
+                names[app_id] = name
+    return names
+
+
+def resolve_game_names(
+    app_ids: list[str], steam_path: Optional[Path] = None, interactive: bool = True
+) -> dict[str, str]:
+    """Finds names for many App IDs at once. Local ACFs and cached product info
+    go first, everything else is requested from the store concurrently.
+    Names that still can't be found are asked for, or get a placeholder
+    when not interactive
+
+    Returns:
+        dict: a dict in the format (game_id, game_name)
+    """
+    names: dict[str, str] = {}
+    if steam_path is not None:
+        names.update(_names_from_acfs(steam_path, app_ids))
+    remaining = [x for x in app_ids if x not in names]
+    names.update(_names_from_product_info_cache(remaining))
+    remaining = [x for x in app_ids if x not in names]
+    logger.debug(
+        f"{len(app_ids) - len(remaining)}/{len(app_ids)} names found locally"
+    )
+
+    if remaining:
+        print(f"Getting names for {len(remaining)} game(s)...")
+        fetched = run_sync(get_game_names(remaining))
+        for app_id in remaining:
+            if name := fetched.get(app_id):
+                names[app_id] = name
+            elif interactive:
+                names[app_id] = prompt_text(
+                    f"Couldn't get the name of {app_id}. Type the name of the game: "
+                )
+            else:
+                names[app_id] = placeholder_game_name(app_id)
+    return names
+
+
+def get_named_ids(
+    folder: Path, steam_path: Optional[Path] = None, interactive: bool = True
+) -> NamedIDs:
     """Gets names of games from lua files.
     Try to read saved names first, then request names of newer files.
     If there are untracked files, update `names.json` accordingly
 
     Args:
         folder (Path): Folder with .lua files in it
+        steam_path (Optional[Path]): Steam install path. Used to read names
+            from local .acf files before going online
+        interactive (bool): Whether to prompt for names that can't be found.
+            Placeholders are saved otherwise, and retried after
+            NAME_RETRY_INTERVAL
 
     Returns:
         dict: a dict in the format (game_id, game_name)
@@ -35,13 +133,36 @@ def get_named_ids(folder: Path) -> NamedIDs:
     id_names_file = folder / "names.json"
     named_ids: NamedIDs = _load_named_ids(id_names_file)
 
-    new_ids = False
     saved_ids = [x.stem for x in folder.glob("*.lua")]
-    for saved_id in saved_ids:
-        if saved_id not in named_ids:
-            new_ids = True
-            named_ids[saved_id] = get_game_name(saved_id)
+    cache = get_cache()
+    # A placeholder is kept until its retry entry expires, so IDs the store
+    # doesn't know don't cost a request on every menu action
+    unnamed = [
+        x for x in saved_ids
+        if x not in named_ids
+        or (
+            named_ids[x] == placeholder_game_name(x)
+            and cache.get(_retry_key(x)) is None
+        )
+    ]
+    if not unnamed:
+        return named_ids
 
-    if new_ids:
+    new_names = resolve_game_names(unnamed, steam_path, interactive)
+    unresolved = [k for k, v in new_names.items() if v == placeholder_game_name(k)]
+    if unresolved:
+        cache.set_many(
+            {_retry_key(x): time.time() for x in unresolved}, NAME_RETRY_INTERVAL
+        )
+    changed = {k: v for k, v in new_names.items() if named_ids.get(k) != v}
+    if changed:
+        named_ids.update(changed)
         _save_named_ids(id_names_file, named_ids)
+        missing = sum(1 for k, v in changed.items() if v == placeholder_game_name(k))
+        if missing:
+            print(
+                Fore.YELLOW
+                + f"Couldn't find names for {missing} game(s). They'll be retried tomorrow."
+                + Style.RESET_ALL
+            )
     return named_ids
@@ -0,0 +1,35 @@
+"""The msgpack files the caches (app catalog, manifest index, lua catalog,
+sync hashes) keep next to the executable"""
+
+import logging
+from pathlib import Path
+from typing import Any, Optional
+
+import msgpack  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def load_packed(path: Path, name: str) -> Optional[dict[str, Any]]:
+    """
+    Reads a dict saved with msgpack
+
+    Args:
+        name: What's in the file, for the log message
+
+    Returns:
+        None if the file is missing or unreadable, so the cache starts over
+    """
+    if not path.exists():
+        return None
+    try:
+        with path.open("rb") as f:
+            data = msgpack.unpackb(f.read())  # type: ignore
+    # FormatError, ExtraData, StackError and bad UTF-8 are all ValueErrors
+    except (OSError, ValueError, msgpack.UnpackException) as e:
+        logger.warning(f"{name} is unreadable, starting over: {e}")
+        return None
+    if not isinstance(data, dict):
+        logger.warning(f"{name} is unreadable, starting over: not a map")
+        return None
+    return data
@@ -26,7 +26,7 @@ def load_all_settings() -> dict[Any, Any]:
             if data
             else {}
         )
-    except (ValueError, msgpack.ExcessiveDataError, msgpack.FormatError):
+    except (ValueError, msgpack.UnpackException):
         settings = {}
     
     # Perform migration if needed
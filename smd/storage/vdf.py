@@ -5,11 +5,15 @@ from typing import Any, Optional, TypeVar, overload
 
 import vdf  # type: ignore
 
+from smd.metrics import get_metrics
+
 _DictType = TypeVar("_DictType", bound=dict[Any, Any])
 
 
 def vdf_dump(vdf_file: Path, obj: dict[str, Any]):
-    with vdf_file.open("w", encoding="utf-8") as f:
+    with get_metrics().histogram(
+        "smd_vdf_dump_seconds", "Duration of vdf_dump"
+    ).time(file=vdf_file.name), vdf_file.open("w", encoding="utf-8") as f:
         vdf.dump(obj, f, pretty=True)  # type: ignore
 
 
@@ -28,7 +32,9 @@ def vdf_load(vdf_file: Path) -> dict[Any, Any]: ...
 
 
 def vdf_load(vdf_file: Path, mapper: type[_DictType] = dict) -> _DictType:
-    with vdf_file.open(encoding="utf-8") as f:
+    with get_metrics().histogram(
+        "smd_vdf_load_seconds", "Duration of vdf_load"
+    ).time(file=vdf_file.name), vdf_file.open(encoding="utf-8") as f:
         data: _DictType = vdf.load(f, mapper=mapper)  # type: ignore
     return data
 
@@ -27,6 +27,7 @@ class MainMenu(Enum):
     RECENT_FILES = "Process recent .lua file"
     UPDATE_ALL_MANIFESTS = "Update manifests for all outdated games"
     SCAN_LIBRARY = "Scan game library"
+    VERIFY_DEPOTCACHE = "Verify manifests in depotcache"
     if sys.platform == "win32":
         DL_MANIFEST_ONLY = "Download manifests ONLY from a .lua file"
     else:
@@ -162,6 +163,12 @@ class Settings(Enum):
     USE_SMOKEAPI = SettingItem("use_smokeapi", "Prefer SmokeAPI over CreamAPI (Steam)", False, bool)
     USE_KOALOADER_PROXY = SettingItem("use_koaloader_proxy", "Use Koaloader Proxy Mode (optional)", False, bool)
     APPLIST_ID_LIMIT = SettingItem("applist_id_limit", "AppList ID Limit (0 = unlimited)", False, str)
+    PREFETCH_PRODUCT_INFO = SettingItem(
+        "prefetch_product_info", "Prefetch AppList App Info in the Background", False, bool
+    )
+    PROFILE_ACTIONS = SettingItem(
+        "profile_actions", "Profile Menu Actions (CPU and Memory)", False, bool
+    )
 
     @property
     def key_name(self) -> str:
@@ -192,6 +199,7 @@ class SettingsManagementOptions(Enum):
     EDIT_SETTINGS = "Edit Settings"
     EXPORT_SETTINGS = "Export Settings to JSON"
     IMPORT_SETTINGS = "Import Settings from JSON"
+    RESTORE_BACKUP = "Restore a Backup"
     BACK = "Back to Main Menu"
 
 
@@ -271,6 +279,8 @@ class LuaParsedInfo(RawLua):
     app_id: str
     "The base app ID"
     depots: list[DepotKeyPair]
+    manifests: dict[str, str] = field(default_factory=dict)
+    "Depot IDs mapped to the manifest IDs the lua pins with setManifestid"
 
 
 NamedIDs = NewType("NamedIDs", dict[str, str])
@@ -0,0 +1,163 @@
+"""Opt-in span tracing, exported as Chrome trace events.
+
+With `--trace`, every `span(...)` block is recorded with the thread (and
+greenlet, on the Steam session thread) it ran on, and written on exit as a
+JSON file that chrome://tracing or https://ui.perfetto.dev can open. Spans on
+one thread or greenlet nest by time, and workers show up as their own rows,
+so overlap is visible. When tracing is off, `span` returns a shared no-op
+context manager and costs next to nothing.
+"""
+
+import atexit
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_FILE = "smd_trace.json"
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+_NULL_SPAN = nullcontext()
+
+
+def _current_greenlet() -> Optional[Any]:
+    """The running greenlet, unless it's a thread's main one. greenlet is only
+    looked up if something else already imported it"""
+    greenlet = sys.modules.get("greenlet")
+    if greenlet is None:
+        return None
+    current = greenlet.getcurrent()
+    return current if current.parent is not None else None
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self._events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._tids: dict[tuple[int, int], int] = {}
+        "(thread ident, greenlet id) -> trace tid"
+        self._pid = os.getpid()
+        self._origin = time.perf_counter()
+
+    def _tid(self) -> int:
+        thread = threading.current_thread()
+        greenlet = _current_greenlet()
+        key = (thread.ident or 0, id(greenlet) if greenlet is not None else 0)
+        tid = self._tids.get(key)
+        if tid is not None:
+            return tid
+        with self._lock:
+            tid = self._tids.setdefault(key, len(self._tids) + 1)
+            name = thread.name
+            if greenlet is not None:
+                name += f" / greenlet {key[1]:#x}"
+            self._events.append({
+                "name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid,
+                "args": {"name": name},
+            })
+        return tid
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1_000_000
+
+    @contextmanager
+    def _span(self, name: str, args: dict[str, Any]) -> Iterator[None]:
+        tid = self._tid()
+        start = self._now_us()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            event: dict[str, Any] = {
+                "name": name, "ph": "X", "pid": self._pid, "tid": tid,
+                "ts": start, "dur": self._now_us() - start,
+            }
+            if error is not None:
+                args = {**args, "error": error}
+            if args:
+                event["args"] = {k: str(v) for k, v in args.items()}
+            with self._lock:
+                self._events.append(event)
+
+    def span(self, name: str, **args: Any) -> ContextManager[None]:
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, args)
+
+    def instant(self, name: str, **args: Any):
+        """A point in time, e.g. a cache miss"""
+        if not self.enabled:
+            return
+        event: dict[str, Any] = {
+            "name": name, "ph": "i", "s": "t", "pid": self._pid, "tid": self._tid(),
+            "ts": self._now_us(),
+        }
+        if args:
+            event["args"] = {k: str(v) for k, v in args.items()}
+        with self._lock:
+            self._events.append(event)
+
+    def write(self, path: Path) -> bool:
+        with self._lock:
+            events = list(self._events)
+        try:
+            temp_file = path.with_name(path.name + ".tmp")
+            with temp_file.open("w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            temp_file.replace(path)
+        except OSError as e:
+            logger.error(f"Failed to write trace: {e}", exc_info=True)
+            return False
+        logger.debug(f"Wrote {len(events)} trace events to {path}")
+        return True
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, **args: Any) -> ContextManager[None]:
+    """`with span("acf_write", app_id=...):` records the block when tracing"""
+    return _tracer.span(name, **args)
+
+
+def traced(name: Optional[str] = None) -> Callable[[_F], _F]:
+    """Decorator version of `span`, named after the function by default"""
+
+    def decorator(fn: _F) -> _F:
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _tracer.enabled:
+                return fn(*args, **kwargs)
+            with _tracer.span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore
+
+    return decorator
+
+
+def start_tracing(path: Path):
+    """Records spans from now on and writes them to `path` on exit"""
+    if _tracer.enabled:
+        return
+    _tracer.enabled = True
+    atexit.register(_tracer.write, path)
+    logger.debug(f"Tracing to {path}")
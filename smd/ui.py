@@ -17,15 +17,8 @@ from colorama import Fore, Style
 from smd.app_injector.applist import AppListManager
 from smd.app_injector.sls import SLSManager
 from smd.analytics import get_analytics_tracker
-from smd.game_specific import GameHandler
-from smd.http_utils import download_to_path
-from smd.library_scanner import LibraryScanner
-from smd.lua.manager import LuaManager
-from smd.lua.writer import ACFWriter, ConfigVDFWriter
-from smd.manifest.downloader import ManifestDownloader
-from smd.midi import MidiPlayer
+from smd.backup import backup_before_operation, get_backup_manager
 from smd.notifications import get_notification_service
-from smd.processes import SteamProcess
 from smd.prompts import (
     prompt_confirm,
     prompt_dir,
@@ -35,16 +28,8 @@ from smd.prompts import (
     prompt_text,
 )
 from smd.recent_files import get_recent_files_manager
-from smd.steam_patch import (
-    find_dll_dir,
-    get_patch_status,
-    patch_steam,
-    unpatch_steam,
-)
 from smd.storage.acf import ACFParser, get_app_name_from_acf
 from smd.storage.vdf import ensure_library_has_app
-from smd.steam_client import get_product_info, SteamInfoProvider
-from smd.steam_store import get_app_name_from_store
 from smd.steam_tools_compat import (
     install_lua_to_steam,
     remove_lua_from_steam,
@@ -60,6 +45,7 @@ from smd.storage.settings import (
     set_setting,
 )
 from smd.storage.vdf import get_steam_libs, vdf_dump, vdf_load
+from smd.steam_client import SteamInfoProvider
 from smd.strings import LINUX_RELEASE_PREFIX, RELEASE_PAGE_URL, VERSION, WINDOWS_RELEASE_PREFIX
 from smd.structs import (
     ContextMenuOptions,
@@ -74,9 +60,8 @@ from smd.structs import (
     Settings,
     SettingsManagementOptions,
 )
-from smd.updater import Updater, is_newer_version
-from smd.utils import enter_path, root_folder
-from smd.zip import zip_folder
+from smd.tracing import span
+from smd.utils import root_folder
 
 logger = logging.getLogger(__name__)
 
@@ -137,6 +122,17 @@ class UI:
         self.analytics_tracker = get_analytics_tracker()
 
         self.init_midi_player()
+        self.prefetcher = None
+
+    def start_prefetch(self):
+        """Keeps app info for the AppList/SLSSteam IDs cached in the
+        background, if turned on in settings"""
+        if not get_setting(Settings.PREFETCH_PRODUCT_INFO) or self.prefetcher is not None:
+            return
+        from smd.prefetch import ProductInfoPrefetcher
+
+        self.prefetcher = ProductInfoPrefetcher(self.provider, self._get_applist_ids)
+        self.prefetcher.start()
 
     def init_midi_player(self):
         if (play_music := get_setting(Settings.PLAY_MUSIC)) is None:
@@ -146,6 +142,8 @@ class UI:
         if any([not x.value.exists() for x in list(MidiFiles)]) or not play_music:
             self.midi_player = None
         else:
+            from smd.midi import MidiPlayer
+
             self.midi_player = MidiPlayer(MidiFiles.MIDI_PLAYER_DLL.value)
             self.midi_player.start()
 
@@ -174,6 +172,8 @@ class UI:
                 self._export_settings_submenu()
             elif choice == SettingsManagementOptions.IMPORT_SETTINGS:
                 self._import_settings_submenu()
+            elif choice == SettingsManagementOptions.RESTORE_BACKUP:
+                self._restore_backup_submenu()
         
         return MainReturnCode.LOOP_NO_PROMPT
     
@@ -323,6 +323,38 @@ class UI:
         else:
             print(Fore.RED + "✗ Failed to export settings. Check debug.log for details." + Style.RESET_ALL)
     
+    def _restore_backup_submenu(self) -> None:
+        """Restore a snapshot made before config.vdf edits, AppList deletions
+        or LUA syncs to where it was taken from"""
+        print(Fore.CYAN + "\n=== Restore a Backup ===" + Style.RESET_ALL)
+        manager = get_backup_manager()
+        snapshots: list[tuple[str, tuple[Path, dict]]] = []
+        for path in manager.list_backups():
+            snapshot = manager.load_snapshot(path) if path.suffix == ".json" else None
+            if snapshot is None:
+                continue
+            snapshots.append((
+                f"{snapshot['created']}  {snapshot['name']} ({len(snapshot['files'])} files)",
+                (path, snapshot),
+            ))
+        if not snapshots:
+            print("There are no backups to restore.")
+            return
+        choice: Optional[tuple[Path, dict]] = prompt_select(
+            "Select a backup to restore:", snapshots, cancellable=True
+        )
+        if choice is None:
+            return
+        path, snapshot = choice
+        destination = Path(snapshot["source"])
+        print(Fore.YELLOW + f"This will replace {destination}" + Style.RESET_ALL)
+        if not prompt_confirm("Continue?", false_msg="Cancel"):
+            return
+        if manager.restore_backup(path, destination):
+            print(Fore.GREEN + f"✓ Restored {destination}" + Style.RESET_ALL)
+        else:
+            print(Fore.RED + "✗ Failed to restore. Check debug.log for details." + Style.RESET_ALL)
+
     def _import_settings_submenu(self) -> None:
         """Import settings from JSON file"""
         print(Fore.CYAN + "\n=== Import Settings ===" + Style.RESET_ALL)
@@ -413,6 +445,13 @@ class UI:
 
     def steam_patch_menu(self) -> MainReturnCode:
         """Patch or unpatch Steam with DLLs so client reads stplug-in."""
+        from smd.steam_patch import (
+            find_dll_dir,
+            get_patch_status,
+            patch_steam,
+            unpatch_steam,
+        )
+
         status = get_patch_status(self.steam_path)
         status_msg = {
             "patched": Fore.GREEN + "Steam is patched (DLLs installed)." + Style.RESET_ALL,
@@ -451,13 +490,24 @@ class UI:
     def sync_lua_to_steam_menu(self) -> MainReturnCode:
         """Sync saved LUAs and manifests into Steam config so games work without DLLInjector (Steam Tools style)."""
         saved_lua_dir = Path.cwd() / "saved_lua"
-        n_lua = sync_all_saved_lua_to_steam(self.steam_path, saved_lua_dir)
-        n_man = sync_all_manifests_to_config_depotcache(self.steam_path)
         stplug = self.steam_path / "config" / "stplug-in"
         config_depot = self.steam_path / "config" / "depotcache"
-        if n_lua > 0 or n_man > 0:
+        remove_orphans = stplug.exists() and prompt_confirm(
+            "Also remove LUAs from stplug-in that aren't in saved_lua?",
+            default=False,
+        )
+        if remove_orphans:
+            backup_before_operation(stplug, "lua_sync")
+        lua_result = sync_all_saved_lua_to_steam(
+            self.steam_path, saved_lua_dir, remove_orphans
+        )
+        man_result = sync_all_manifests_to_config_depotcache(self.steam_path)
+        if lua_result.copied + lua_result.skipped + man_result.copied + man_result.skipped:
             print(
-                Fore.GREEN + f"Synced {n_lua} LUA(s) to {stplug}, {n_man} manifest(s) to {config_depot}. "
+                Fore.GREEN + f"LUAs in {stplug}: {lua_result.copied} copied, "
+                f"{lua_result.skipped} already up to date, {lua_result.removed} removed\n"
+                f"Manifests in {config_depot}: {man_result.copied} copied, "
+                f"{man_result.skipped} already up to date\n"
                 "Games should now appear and work when launching Steam with or without DLLInjector."
                 + Style.RESET_ALL
             )
@@ -467,10 +517,17 @@ class UI:
                 "Process a .lua file first, then run this again."
                 + Style.RESET_ALL
             )
+        failed = lua_result.failed + man_result.failed
+        if failed:
+            print(Fore.RED + f"{len(failed)} file(s) couldn't be synced:" + Style.RESET_ALL)
+            for path, error in failed:
+                print(Fore.RED + f"  {path.name}: {error}" + Style.RESET_ALL)
         return MainReturnCode.LOOP
 
     def remove_game_menu(self) -> MainReturnCode:
         """Remove a game from library: delete stplug-in LUA and optionally AppList entry. User can choose from list or type App ID."""
+        from smd.steam_store import get_app_name_from_store
+
         stplug_in = self.steam_path / "config" / "stplug-in"
         if not stplug_in.exists():
             print(
@@ -595,6 +652,8 @@ class UI:
 
     @music_toggle_decorator
     def handle_game_specific(self, choice: GameSpecificChoices) -> MainReturnCode:
+        from smd.game_specific import GameHandler
+
         injection_manager = self.app_list_man or self.sls_man
         if injection_manager is None:
             print("Unsupported OS for this action.")
@@ -611,6 +670,10 @@ class UI:
     def process_lua_minimal(self) -> MainReturnCode:
         """Processes a .lua file but only does the lua input, lua backup, and manifest
         download steps"""
+        from smd.lua.manager import LuaManager
+        from smd.manifest.downloader import ManifestDownloader
+        from smd.processes import SteamProcess
+        from smd.zip import zip_folder
 
         if self.os_type == OSType.WINDOWS:
             print(
@@ -622,7 +685,7 @@ class UI:
             if not prompt_confirm("Continue?"):
                 return MainReturnCode.LOOP_NO_PROMPT
 
-        lua_manager = LuaManager(self.os_type)
+        lua_manager = LuaManager(self.os_type, self.steam_path)
         downloader = ManifestDownloader(self.provider, self.steam_path)
         steam_proc = (
             SteamProcess(self.steam_path, self.app_list_man.applist_folder)
@@ -712,13 +775,20 @@ class UI:
     @music_toggle_decorator
     def process_lua_full(self, file: Optional[Path] = None) -> MainReturnCode:
         """Processes a .lua file and goes through all the usual steps"""
+        from smd.lua.manager import LuaManager
+        from smd.lua.writer import ACFWriter, ConfigVDFWriter
+        from smd.manifest.downloader import ManifestDownloader
+        from smd.processes import SteamProcess
+
         import time
         start_time = time.time()
         
-        if (lib_path := self.select_steam_library()) is None:
+        with span("select_library"):
+            lib_path = self.select_steam_library()
+        if lib_path is None:
             return MainReturnCode.LOOP_NO_PROMPT
 
-        lua_manager = LuaManager(self.os_type)
+        lua_manager = LuaManager(self.os_type, self.steam_path)
         downloader = ManifestDownloader(self.provider, self.steam_path)
         config = ConfigVDFWriter(self.steam_path)
         acf = ACFWriter(lib_path)
@@ -727,9 +797,10 @@ class UI:
             if self.app_list_man
             else None
         )
-        parsed_lua = lua_manager.fetch_lua(
-            LuaChoice.ADD_LUA if file else None, override_path=file
-        )
+        with span("fetch_lua"):
+            parsed_lua = lua_manager.fetch_lua(
+                LuaChoice.ADD_LUA if file else None, override_path=file
+            )
         if parsed_lua is None:
             return MainReturnCode.LOOP_NO_PROMPT
         
@@ -741,33 +812,39 @@ class UI:
         self.analytics_tracker.record_feature_usage("process_lua_full")
         
         set_stats_and_achievements(int(parsed_lua.app_id))
-        if self.app_list_man:
-            print(Fore.YELLOW + "\nAdding to AppList folder:" + Style.RESET_ALL)
-            self.app_list_man.add_ids(parsed_lua)
-            self.app_list_man.dlc_check(self.provider, int(parsed_lua.app_id))
-        elif self.sls_man:
-            print(Fore.YELLOW + "\nAdding to SLSSteam config:" + Style.RESET_ALL)
-            self.sls_man.add_ids(parsed_lua)
-            self.sls_man.dlc_check(self.provider, int(parsed_lua.app_id))
+        injector = self.app_list_man or self.sls_man
+        if injector:
+            if self.app_list_man:
+                print(Fore.YELLOW + "\nAdding to AppList folder:" + Style.RESET_ALL)
+            else:
+                print(Fore.YELLOW + "\nAdding to SLSSteam config:" + Style.RESET_ALL)
+            with span("injector_add", app_id=parsed_lua.app_id):
+                injector.add_ids(parsed_lua)
+            with span("dlc_check", app_id=parsed_lua.app_id):
+                injector.dlc_check(self.provider, int(parsed_lua.app_id))
         print(Fore.YELLOW + "\nAdding Decryption Keys:" + Style.RESET_ALL)
-        config.add_decryption_keys_to_config(parsed_lua)
-        lua_manager.backup_lua(parsed_lua)
-        install_lua_to_steam(
-            self.steam_path,
-            str(parsed_lua.app_id),
-            lua_manager.saved_lua / f"{parsed_lua.app_id}.lua",
-        )
+        with span("config_vdf_write", depots=len(parsed_lua.depots)):
+            config.add_decryption_keys_to_config(parsed_lua)
+        with span("lua_install"):
+            lua_manager.backup_lua(parsed_lua)
+            install_lua_to_steam(
+                self.steam_path,
+                str(parsed_lua.app_id),
+                lua_manager.saved_lua / f"{parsed_lua.app_id}.lua",
+            )
         print(Fore.YELLOW + "\nACF Writing:" + Style.RESET_ALL)
-        acf.write_acf(parsed_lua)
-        ensure_library_has_app(self.steam_path, lib_path, str(parsed_lua.app_id))
+        with span("acf_write"):
+            acf.write_acf(parsed_lua)
+            ensure_library_has_app(self.steam_path, lib_path, str(parsed_lua.app_id))
         print(Fore.YELLOW + "\nDownloading Manifests:" + Style.RESET_ALL)
         
         # Check if parallel downloads are enabled
         use_parallel = get_setting(Settings.USE_PARALLEL_DOWNLOADS)
-        if use_parallel:
-            downloader.download_manifests_parallel(parsed_lua, auto_manifest=True)
-        else:
-            downloader.download_manifests(parsed_lua, auto_manifest=True)
+        with span("download_manifests", parallel=bool(use_parallel)):
+            if use_parallel:
+                downloader.download_manifests_parallel(parsed_lua, auto_manifest=True)
+            else:
+                downloader.download_manifests(parsed_lua, auto_manifest=True)
         
         # Record successful operation
         duration = time.time() - start_time
@@ -815,6 +892,9 @@ class UI:
         return MainReturnCode.LOOP_NO_PROMPT
 
     def check_updates(self, os_type: OSType, test: bool = False) -> MainReturnCode:
+        from smd.http_utils import download_to_path
+        from smd.updater import Updater
+
         print("Checking for updates (GitHub releases)...", end="", flush=True)
         is_newer, resp = Updater.update_available()
         print(" Done!")
@@ -865,6 +945,12 @@ class UI:
                     download_url = url
                     asset_name = name
                     break
+        # GitHub lists a "sha256:..." digest per asset, checked after download
+        asset_sha256 = None
+        for asset in assets:
+            digest = asset.get("digest") or ""
+            if asset.get("browser_download_url") == download_url and digest.startswith("sha256:"):
+                asset_sha256 = digest.removeprefix("sha256:")
 
         app_dir = root_folder(outside_internal=True)
         update_zip = app_dir / "update.zip"
@@ -875,7 +961,7 @@ class UI:
             if not download_url or not asset_name:
                 return False
             print(f"Downloading {asset_name}...")
-            if not download_to_path(download_url, update_zip):
+            if not download_to_path(download_url, update_zip, sha256=asset_sha256):
                 return False
             print("Extracting...")
             if tmp_update.exists():
@@ -1031,13 +1117,17 @@ class UI:
         return MainReturnCode.LOOP_NO_PROMPT
 
     def update_all_manifests(self) -> MainReturnCode:
+        from smd.lua.manager import LuaManager
+        from smd.manifest.downloader import ManifestDownloader
+        from smd.processes import SteamProcess
+
         applist_ids = self._get_applist_ids()
         if applist_ids is None:
             print("This OS is not supported for this action.")
             return MainReturnCode.LOOP_NO_PROMPT
         steam_libs = get_steam_libs(self.steam_path)
 
-        lua_manager = LuaManager(self.os_type)
+        lua_manager = LuaManager(self.os_type, self.steam_path)
         downloader = ManifestDownloader(self.provider, self.steam_path)
         steam_proc = (
             SteamProcess(self.steam_path, self.app_list_man.applist_folder)
@@ -1045,6 +1135,8 @@ class UI:
             else None
         )
         explored_ids: list[int] = []
+        # Once for the whole loop, lookups below don't touch saved_lua
+        lua_manager.catalog.refresh()
         for lib in steam_libs:
             steamapps = lib / "steamapps"
             acf_files = steamapps.glob("*.acf")
@@ -1060,11 +1152,12 @@ class UI:
                     Fore.YELLOW + f"\n{acf.name} needs an update!\n" + Style.RESET_ALL
                 )
                 explored_ids.append(acf.id)
-                in_backup = str(acf.id) in lua_manager.named_ids
+                backup = lua_manager.catalog.for_app(acf.id)
+                in_backup = backup is not None
                 # TODO: DRY this
                 parsed_lua = lua_manager.fetch_lua(
                     LuaChoice.ADD_LUA,
-                    lua_manager.saved_lua / f"{acf.id}.lua" if in_backup else None,
+                    Path(backup.path) if backup is not None else None,
                 )
                 if parsed_lua is None:
                     return MainReturnCode.LOOP_NO_PROMPT
@@ -1080,7 +1173,11 @@ class UI:
                     + "\nDownloading Manifests:"
                     + Style.RESET_ALL
                 )
-                downloader.download_manifests(parsed_lua, auto_manifest=True)
+                # Updating means getting the latest manifests, whatever the lua pins
+                new_manifests = downloader.download_manifests(
+                    parsed_lua, auto_manifest=True, use_pinned=False
+                )
+                self._print_update_size(acf, new_manifests)
         if steam_proc:
             steam_proc.prompt_launch_or_restart()
         print(
@@ -1110,58 +1207,109 @@ class UI:
             logger.error(f"Failed to export IDs: {e}", exc_info=True)
             return MainReturnCode.EXIT
     
-    def process_batch_lua_files(self, file_paths: list[str], dry_run: bool = False) -> MainReturnCode:
-        """Process multiple lua files in batch mode"""
+    def process_batch_lua_files(
+        self,
+        file_paths: list[str],
+        dry_run: bool = False,
+        library: Optional[str] = None,
+        overwrite_acf: bool = False,
+        restart_steam: bool = False,
+        report_path: Optional[str] = None,
+    ) -> MainReturnCode:
+        """Process multiple lua files in batch mode, without any prompts"""
+        from smd.batch import BatchPolicy, BatchProcessor
+        from smd.processes import SteamProcess
+
         print(Fore.CYAN + f"\n=== Batch Processing {len(file_paths)} files ===" + Style.RESET_ALL)
-        
+
         if dry_run:
             print(Fore.YELLOW + "DRY RUN MODE: No changes will be made" + Style.RESET_ALL)
-        
-        success_count = 0
-        failed_files = []
-        
-        for i, file_path_str in enumerate(file_paths, 1):
-            file_path = Path(file_path_str)
-            print(Fore.CYAN + f"\n[{i}/{len(file_paths)}] Processing: {file_path.name}" + Style.RESET_ALL)
-            
-            if not file_path.exists():
-                print(Fore.RED + f"✗ File not found: {file_path}" + Style.RESET_ALL)
-                failed_files.append((file_path, "File not found"))
-                continue
-            
-            if dry_run:
-                print(Fore.YELLOW + f"Would process: {file_path}" + Style.RESET_ALL)
-                success_count += 1
-                continue
-            
-            try:
-                result = self.process_lua_full(file_path)
-                if result == MainReturnCode.EXIT:
-                    print(Fore.RED + f"✗ Failed to process: {file_path.name}" + Style.RESET_ALL)
-                    failed_files.append((file_path, "Processing failed"))
-                else:
-                    print(Fore.GREEN + f"✓ Successfully processed: {file_path.name}" + Style.RESET_ALL)
-                    success_count += 1
-            except Exception as e:
-                print(Fore.RED + f"✗ Error processing {file_path.name}: {e}" + Style.RESET_ALL)
-                logger.error(f"Batch processing error for {file_path}: {e}", exc_info=True)
-                failed_files.append((file_path, str(e)))
-        
+
+        if library is not None:
+            lib_path = Path(library)
+            if not (lib_path / "steamapps").exists():
+                print(Fore.RED + f"✗ Not a Steam library: {lib_path}" + Style.RESET_ALL)
+                return MainReturnCode.EXIT
+        else:
+            steam_libs = get_steam_libs(self.steam_path)
+            lib_path = steam_libs[0] if steam_libs else self.steam_path
+        print(f"Steam library: {Fore.YELLOW}{lib_path}{Style.RESET_ALL}")
+
+        policy = BatchPolicy(
+            library=lib_path,
+            overwrite_acf=overwrite_acf,
+            restart_steam=restart_steam,
+        )
+        if report_path:
+            policy.report_path = Path(report_path)
+        steam_proc = (
+            SteamProcess(self.steam_path, self.app_list_man.applist_folder)
+            if self.app_list_man
+            else None
+        )
+        processor = BatchProcessor(
+            self.provider,
+            self.steam_path,
+            self.app_list_man or self.sls_man,
+            steam_proc,
+            policy,
+        )
+        start_time = time.time()
+        results = processor.run([Path(x) for x in file_paths], dry_run)
+        self.analytics_tracker.record_feature_usage("batch")
+
         # Summary
+        succeeded = [x for x in results if x.status in ("success", "dry_run")]
+        partial = [x for x in results if x.status == "partial"]
+        failed = [x for x in results if x.status == "failed"]
         print(Fore.CYAN + "\n=== Batch Processing Summary ===" + Style.RESET_ALL)
-        print(f"Total files: {len(file_paths)}")
-        print(Fore.GREEN + f"Successful: {success_count}" + Style.RESET_ALL)
-        print(Fore.RED + f"Failed: {len(failed_files)}" + Style.RESET_ALL)
-        
-        if failed_files:
+        print(f"Total files: {len(results)} ({time.time() - start_time:.2f}s)")
+        print(Fore.GREEN + f"Successful: {len(succeeded)}" + Style.RESET_ALL)
+        if partial:
+            print(Fore.YELLOW + f"Partial: {len(partial)}" + Style.RESET_ALL)
+        print(Fore.RED + f"Failed: {len(failed)}" + Style.RESET_ALL)
+
+        for result in partial:
+            print(f"  - {Path(result.path).name}: depots {', '.join(result.failed_depots)} failed")
+        if failed:
             print(Fore.RED + "\nFailed files:" + Style.RESET_ALL)
-            for file_path, reason in failed_files:
-                print(f"  - {file_path.name}: {reason}")
-        
+            for result in failed:
+                print(f"  - {Path(result.path).name}: {result.message}")
+        if processor.report_written:
+            print(f"Report written to: {policy.report_path}")
+        else:
+            print(Fore.RED + f"Couldn't write the report to {policy.report_path}" + Style.RESET_ALL)
+
         return MainReturnCode.EXIT
-    
+
+    def _print_update_size(self, acf: ACFParser, new_manifests: list[Path]):
+        """Says how much Steam will download to update to the new manifests,
+        from the chunks they don't share with the installed ones"""
+        from smd.manifest.diff import diff_update, format_bytes
+        from smd.manifest.index import get_manifest_index
+
+        diffs = diff_update(
+            get_manifest_index(self.steam_path), acf.installed_manifests, new_manifests
+        )
+        if not diffs:
+            return
+        for diff in diffs:
+            logger.debug(
+                f"Depot {diff.depot_id} update: {diff.added} added, {diff.removed} removed, "
+                f"{diff.changed} changed, {diff.download_bytes} bytes to download"
+            )
+        print(
+            Fore.CYAN
+            + f"Update size: {format_bytes(sum(x.download_bytes for x in diffs))} "
+            f"to download for {len(diffs)} depot(s)"
+            + Style.RESET_ALL
+        )
+
     def auto_update_manifests(self) -> MainReturnCode:
         """Automatically update manifests without user interaction"""
+        from smd.lua.manager import LuaManager
+        from smd.manifest.downloader import ManifestDownloader
+
         print(Fore.CYAN + "\n=== Auto-Update Manifests ===" + Style.RESET_ALL)
 
         applist_ids = self._get_applist_ids()
@@ -1171,11 +1319,13 @@ class UI:
 
         steam_libs = get_steam_libs(self.steam_path)
 
-        lua_manager = LuaManager(self.os_type)
+        lua_manager = LuaManager(self.os_type, self.steam_path, interactive=False)
         downloader = ManifestDownloader(self.provider, self.steam_path)
         
         updated_count = 0
         explored_ids: list[int] = []
+        # Once for the whole loop, lookups below don't touch saved_lua
+        lua_manager.catalog.refresh()
         
         for lib in steam_libs:
             steamapps = lib / "steamapps"
@@ -1191,11 +1341,12 @@ class UI:
                 
                 print(f"Updating {acf.name}...")
                 explored_ids.append(acf.id)
-                in_backup = str(acf.id) in lua_manager.named_ids
+                backup = lua_manager.catalog.for_app(acf.id)
+                in_backup = backup is not None
                 
                 parsed_lua = lua_manager.fetch_lua(
                     LuaChoice.ADD_LUA,
-                    lua_manager.saved_lua / f"{acf.id}.lua" if in_backup else None,
+                    Path(backup.path) if backup is not None else None,
                 )
                 if parsed_lua is None:
                     print(Fore.RED + f"✗ Failed to fetch lua for {acf.name}" + Style.RESET_ALL)
@@ -1208,7 +1359,10 @@ class UI:
                     str(parsed_lua.app_id),
                     lua_manager.saved_lua / f"{parsed_lua.app_id}.lua",
                 )
-                downloader.download_manifests(parsed_lua, auto_manifest=True)
+                new_manifests = downloader.download_manifests(
+                    parsed_lua, auto_manifest=True, use_pinned=False
+                )
+                self._print_update_size(acf, new_manifests)
                 updated_count += 1
         
         print(Fore.GREEN + f"\n✓ Updated {updated_count} games" + Style.RESET_ALL)
@@ -1253,10 +1407,16 @@ class UI:
     @music_toggle_decorator
     def scan_library_menu(self) -> MainReturnCode:
         """Scan game library and generate report"""
+        from smd.library_scanner import LibraryScanner
+        from smd.lua.manager import LuaManager
+
         print(Fore.CYAN + "\n=== Library Scanner ===" + Style.RESET_ALL)
         
-        lua_manager = LuaManager(self.os_type)
-        scanner = LibraryScanner(self.steam_path, lua_manager.saved_lua)
+        lua_manager = LuaManager(self.os_type, self.steam_path)
+        lua_manager.catalog.refresh()
+        scanner = LibraryScanner(
+            self.steam_path, lua_manager.saved_lua, lua_catalog=lua_manager.catalog
+        )
         
         # Scan all games
         games = scanner.scan_all_games()
@@ -1298,6 +1458,39 @@ class UI:
         
         return MainReturnCode.LOOP_NO_PROMPT
     
+    @music_toggle_decorator
+    def verify_depotcache_menu(self) -> MainReturnCode:
+        """Verify every manifest in depotcache and config/depotcache"""
+        from smd.integrity import DepotcacheVerifier, IntegrityVerifier
+
+        print(Fore.CYAN + "\n=== Depotcache Verification ===" + Style.RESET_ALL)
+
+        start_time = time.time()
+        results = DepotcacheVerifier(self.steam_path).verify_all()
+        if not results:
+            print(Fore.YELLOW + "No manifests found." + Style.RESET_ALL)
+            return MainReturnCode.LOOP_NO_PROMPT
+
+        bad = [x for x in results if not x.ok]
+        cached = sum(1 for x in results if x.cached)
+        for result in bad:
+            print(Fore.RED + f"✗ {result.path}: {result.message}" + Style.RESET_ALL)
+        print(
+            (Fore.GREEN if not bad else Fore.YELLOW)
+            + f"\n{len(results) - len(bad)}/{len(results)} manifests OK "
+            f"({cached} unchanged since last check) in {time.time() - start_time:.2f}s"
+            + Style.RESET_ALL
+        )
+
+        if bad and prompt_confirm(
+            f"Delete the {len(bad)} broken manifest(s)? "
+            "They'll be downloaded again next time the game is processed.",
+            default=False,
+        ):
+            for result in bad:
+                IntegrityVerifier.handle_verification_failure(result.path)
+        return MainReturnCode.LOOP_NO_PROMPT
+
     @music_toggle_decorator
     def analytics_dashboard_menu(self) -> MainReturnCode:
         """Display analytics dashboard"""
@@ -1310,6 +1503,8 @@ class UI:
             "\nWhat would you like to do?",
             [
                 ("Export analytics to JSON", "export"),
+                ("Export this session's metrics (Prometheus text)", "metrics_prom"),
+                ("Export this session's metrics (JSON)", "metrics_json"),
             ],
             cancellable=True
         )
@@ -1318,5 +1513,13 @@ class UI:
             output_path = root_folder(outside_internal=True) / "analytics_export.json"
             if self.analytics_tracker.export_to_json(output_path):
                 print(Fore.GREEN + f"✓ Analytics exported to: {output_path}" + Style.RESET_ALL)
+        elif choice in ("metrics_prom", "metrics_json"):
+            from smd.metrics import get_metrics
+
+            output_path = root_folder(outside_internal=True) / (
+                "metrics.json" if choice == "metrics_json" else "metrics.prom"
+            )
+            if get_metrics().dump(output_path):
+                print(Fore.GREEN + f"✓ Metrics exported to: {output_path}" + Style.RESET_ALL)
         
         return MainReturnCode.LOOP_NO_PROMPT
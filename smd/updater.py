@@ -1,9 +1,9 @@
-import asyncio
 import re
 from typing import Any, Optional
 import httpx
 import json
 
+from smd.event_loop import run_sync
 from smd.http_utils import get_request
 from smd.strings import (
     GITHUB_UPDATE_USERNAME,
@@ -51,7 +51,7 @@ class Updater:
     @staticmethod
     def get_latest_stable() -> Optional[dict[str, Any]]:
         """Fetch the latest stable release from Midrags/SMD_2. Returns None on error."""
-        resp = asyncio.run(
+        resp = run_sync(
             get_request(
                 Updater._LATEST_URL,
                 "json",
@@ -61,7 +61,7 @@ class Updater:
         if resp is not None:
             return resp
         # Fallback: /releases/latest can 404 if latest is draft; fetch list and take first non-draft
-        list_resp = asyncio.run(
+        list_resp = run_sync(
             get_request(
                 Updater._RELEASES_URL,
                 "json",
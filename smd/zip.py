@@ -1,7 +1,11 @@
-from io import BytesIO
-from typing import Literal, Union, overload
+import os
 import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
+from typing import Literal, Optional, Union, overload
 
 from colorama import Fore, Style
 
@@ -67,13 +71,99 @@ def read_nth_file_from_zip_bytes(nth: int, bytes: bytes):
         return
 
 
-def zip_folder(folder_path: Path, output_path: Path):
-    """ZIPs to a BytesIO then to the actual file to prevent infinite recursion"""
-    tmp = BytesIO()
-    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as zipf:
-        for file in folder_path.rglob('*'):
-            if file.is_file():
-                zipf.write(file, arcname=file.relative_to(folder_path))
-    tmp.seek(0)
-    with output_path.open("wb") as f:
-        f.write(tmp.read())
+# Already compressed, deflating these again only costs time
+STORED_SUFFIXES = {
+    ".7z", ".bz2", ".gz", ".jpeg", ".jpg", ".mp3", ".mp4", ".ogg",
+    ".png", ".rar", ".webm", ".webp", ".xz", ".zip", ".zst",
+}
+# Members bigger than this are streamed by zipfile on the writer thread
+# instead of being compressed to memory by a worker
+MAX_BUFFERED_MEMBER = 64 * 1024 * 1024
+
+
+def _deflate_file(file: Path, level: int) -> tuple[bytes, int]:
+    """Raw-deflates a whole file. Returns the data and the CRC32 of the input"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = 0
+    parts: list[bytes] = []
+    with file.open("rb") as f:
+        while chunk := f.read(1024 * 1024):
+            crc = zlib.crc32(chunk, crc)
+            parts.append(compressor.compress(chunk))
+    parts.append(compressor.flush())
+    return b"".join(parts), crc
+
+
+def _write_deflated_member(
+    zipf: zipfile.ZipFile, zinfo: zipfile.ZipInfo, data: bytes, crc: int
+):
+    """Appends a member compressed elsewhere. Does what ZipFile.write does
+    after compressing, which zipfile has no public API for"""
+    zinfo.compress_type = zipfile.ZIP_DEFLATED
+    zinfo.CRC = crc
+    zinfo.compress_size = len(data)
+    zip64 = max(zinfo.file_size, zinfo.compress_size) > zipfile.ZIP64_LIMIT
+    assert zipf.fp is not None
+    zinfo.header_offset = zipf.fp.tell()
+    zipf.fp.write(zinfo.FileHeader(zip64))
+    zipf.fp.write(data)
+    zipf.filelist.append(zinfo)
+    zipf.NameToInfo[zinfo.filename] = zinfo
+    zipf.start_dir = zipf.fp.tell()
+    zipf._didModify = True  # pyright: ignore[reportAttributeAccessIssue]
+
+
+def zip_folder(
+    folder_path: Path,
+    output_path: Path,
+    workers: Optional[int] = None,
+    compresslevel: int = 6,
+):
+    """ZIPs a folder. The archive is written to a temp file next to
+    `output_path` and renamed when done, and both are left out of the archive
+    if they're inside the folder. Members are compressed by a worker pool;
+    files that are already compressed are stored as-is"""
+    output_path = output_path.resolve()
+    temp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    excluded = {output_path, temp_path}
+    files = [
+        file for file in sorted(folder_path.rglob("*"))
+        if file.is_file() and file.resolve() not in excluded
+    ]
+    workers = workers or min(8, os.cpu_count() or 1)
+
+    try:
+        with temp_path.open("wb") as f, zipfile.ZipFile(
+            f, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel
+        ) as zipf, ThreadPoolExecutor(max_workers=workers) as executor:
+            # Only a few members are held in memory at once: results are
+            # written in order and submissions never get far ahead
+            pending: deque[tuple[zipfile.ZipInfo, Future[tuple[bytes, int]]]] = deque()
+
+            def write_oldest():
+                zinfo, future = pending.popleft()
+                _write_deflated_member(zipf, zinfo, *future.result())
+
+            for file in files:
+                arcname = file.relative_to(folder_path).as_posix()
+                zinfo = zipfile.ZipInfo.from_file(file, arcname)
+                if file.suffix.lower() in STORED_SUFFIXES or zinfo.file_size == 0:
+                    while pending:
+                        write_oldest()
+                    zipf.write(file, arcname, compress_type=zipfile.ZIP_STORED)
+                elif zinfo.file_size > MAX_BUFFERED_MEMBER:
+                    while pending:
+                        write_oldest()
+                    zipf.write(file, arcname)
+                else:
+                    pending.append(
+                        (zinfo, executor.submit(_deflate_file, file, compresslevel))
+                    )
+                    if len(pending) >= workers * 2:
+                        write_oldest()
+            while pending:
+                write_oldest()
+        os.replace(temp_path, output_path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
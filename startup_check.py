@@ -0,0 +1,153 @@
+"""
+Startup time budget check for SMD
+Measures imports with `-X importtime` and exits with 1 if a budget is blown,
+so slow imports creeping back into the startup path get noticed
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from colorama import Fore, Style, init as color_init
+
+ROOT = Path(__file__).resolve().parent
+
+BUDGETS = {
+    "version": 0.5,
+    "first_prompt": 1.0,
+    "smd.ui": 0.6,
+}
+"Seconds. `version` and `first_prompt` are wall times of a fresh interpreter"
+
+FORBIDDEN_AT_STARTUP = ["steam.client", "gevent", "smd.manifest.downloader", "smd.midi"]
+"Modules that should only load once a menu action needs them"
+
+FIRST_PROMPT_SCRIPT = """
+import atexit, shutil, sys, tempfile
+from pathlib import Path
+import smd.utils
+
+# Settings, caches and analytics go to a throwaway folder, next to a fake
+# Steam install with everything the UI would otherwise prompt for
+root = Path(tempfile.mkdtemp(prefix="smd_startup_"))
+atexit.register(shutil.rmtree, root, ignore_errors=True)
+smd.utils.root_folder = lambda outside_internal=False: root
+steam = root / "Steam"
+(steam / "steamapps").mkdir(parents=True)
+(steam / "AppList").mkdir()
+(root / "config.yaml").touch()
+
+from smd.storage.settings import set_setting
+from smd.structs import OSType, Settings
+for setting, value in [
+    (Settings.STEAM_PATH, str(steam.resolve())),
+    (Settings.APPLIST_FOLDER, str(steam / "AppList")),
+    (Settings.SLS_CONFIG_LOCATION, str(root / "config.yaml")),
+    (Settings.PLAY_MUSIC, False),
+]:
+    set_setting(setting, value)
+
+import smd.ui
+from smd.steam_client import SteamInfoProvider
+from smd.steam_path import init_steam_path
+from smd.prompts import prompt_select
+os_type = (
+    OSType.WINDOWS if sys.platform == "win32"
+    else OSType.LINUX if sys.platform == "linux" else OSType.OTHER
+)
+provider = SteamInfoProvider()
+ui = smd.ui.UI(provider, init_steam_path(os_type), os_type)
+print("LOADED:" + ",".join(x for x in {forbidden!r} if x in sys.modules))
+"""
+"Everything Main.py does before the first menu, short of logging in to Steam"
+
+
+def print_check(name, passed, details=""):
+    status = f"{Fore.GREEN}✓{Style.RESET_ALL}" if passed else f"{Fore.RED}✗{Style.RESET_ALL}"
+    print(f"{status} {name}")
+    if details:
+        print(f"  {Fore.YELLOW}{details}{Style.RESET_ALL}")
+
+
+def run_python(*args: str) -> tuple[float, subprocess.CompletedProcess]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *args], cwd=ROOT, capture_output=True, text=True
+    )
+    return time.perf_counter() - start, result
+
+
+def best_of(runs: int, *args: str) -> tuple[float, subprocess.CompletedProcess]:
+    """Fastest of a few runs. The first one warms the bytecode and disk caches"""
+    return min((run_python(*args) for _ in range(runs)), key=lambda x: x[0])
+
+
+def parse_importtime(stderr: str) -> dict[str, float]:
+    """Module -> cumulative import time in seconds"""
+    times: dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1_000_000
+        except ValueError:
+            pass  # Header line
+    return times
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check SMD startup time budgets")
+    parser.add_argument(
+        "--scale", type=float, default=1.0,
+        help="Multiply every budget, for slow machines or CI",
+    )
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list")
+    args = parser.parse_args()
+    budgets = {k: v * args.scale for k, v in BUDGETS.items()}
+    color_init()
+    passed = True
+
+    elapsed, _ = best_of(args.runs, "Main.py", "--version")
+    ok = elapsed <= budgets["version"]
+    passed &= ok
+    print_check(f"--version: {elapsed:.3f}s (budget {budgets['version']:.2f}s)", ok)
+
+    script = FIRST_PROMPT_SCRIPT.format(forbidden=FORBIDDEN_AT_STARTUP)
+    elapsed, result = best_of(args.runs, "-c", script)
+    if result.returncode != 0:
+        print_check("First prompt", False, result.stderr.strip())
+        return 1
+    ok = elapsed <= budgets["first_prompt"]
+    passed &= ok
+    print_check(
+        f"Time to first prompt: {elapsed:.3f}s (budget {budgets['first_prompt']:.2f}s)", ok
+    )
+    loaded = next(
+        (x[len("LOADED:"):] for x in result.stdout.splitlines() if x.startswith("LOADED:")), ""
+    )
+    passed &= not loaded
+    print_check(
+        "Nothing heavy imported before the menu", not loaded,
+        f"Loaded early: {loaded}" if loaded else "",
+    )
+
+    _, result = best_of(args.runs, "-X", "importtime", "-c", "import smd.ui")
+    times = parse_importtime(result.stderr)
+    ui_time = times.get("smd.ui", 0.0)
+    ok = ui_time <= budgets["smd.ui"]
+    passed &= ok
+    slowest = sorted(times.items(), key=lambda x: x[1], reverse=True)[1 : args.top + 1]
+    print_check(
+        f"import smd.ui: {ui_time:.3f}s (budget {budgets['smd.ui']:.2f}s)", ok,
+        "" if ok else "Slowest imports under it:\n  "
+        + "\n  ".join(f"{t:.3f}s  {name}" for name, t in slowest),
+    )
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())